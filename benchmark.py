@@ -0,0 +1,510 @@
+#!/usr/bin/env python
+"""
+Benchmark the commit hooks on synthetic git repositories.
+
+Every scenario runs in a fresh Python process against a generated repo,
+with a local stand-in for the Commits API, and reports its wall time,
+the number of subprocesses it started, the bytes of temporary files it
+wrote and its peak RSS (including the linters it ran). Results are
+written as JSON, pass an older result file to --compare to see how a
+change moved the numbers.
+
+    python benchmark.py --files 20 --lines 200 --depth 5 --output new.json
+    python benchmark.py --compare old.json --output new.json
+
+The collector scenario measures the throughput of the bundled score
+collector instead: --clients processes post --records records through
+/api/Commits and the bulk endpoint, then look every commit up.
+"""
+
+import argparse
+import BaseHTTPServer
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from StringIO import StringIO
+
+SCENARIOS = ['commit', 'push', 'golint-push', 'collector']
+
+METRICS = ['wall_time', 'subprocesses', 'tmp_bytes', 'peak_rss_kb',
+           'uploaded_records', 'api_requests', 'records_per_sec',
+           'bulk_records_per_sec', 'lookups_per_sec']
+
+# Files per commit of the records the collector scenario posts
+RECORD_FILES = 5
+
+
+class CommitsApi(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Stand-in for the Commits API, counts requests and records"""
+
+    protocol_version = 'HTTP/1.1'
+    requests = 0
+    records = 0
+
+    def respond(self, data):
+        CommitsApi.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.respond(json.dumps({'isExists': ''}))
+
+    def do_POST(self):
+        length = int(self.headers.getheader('Content-Length'))
+        body = json.loads(self.rfile.read(length))
+        CommitsApi.records += len(body) if isinstance(body, list) else 1
+        self.respond('[]')
+
+    def log_message(self, *args):
+        pass
+
+
+def _python_source(rand, lines):
+    """
+        A Python module of about lines lines, with a few lint messages
+    """
+
+    out = ['"""Generated module {}"""'.format(rand.randint(0, 1 << 30)),
+           'import os', '']
+    while len(out) < lines:
+        name = 'func_{}'.format(rand.randint(0, 1 << 20))
+        out.extend(['', 'def {}(value, unused={}):'.format(name,
+                    rand.randint(0, 9)),
+                    '    """Return a number"""',
+                    '    total=value',
+                    '    for index in range(value):',
+                    '        total += index * {}'.format(rand.randint(1, 9)),
+                    '    return total'])
+    return '\n'.join(out[:lines]) + '\n'
+
+
+def _go_source(rand, lines):
+    """
+        A Go file of about lines lines, with a few golint warnings
+    """
+
+    out = ['package main', '']
+    while len(out) < lines:
+        out.extend(['', 'func Func{}(value int) int {{'.format(
+                    rand.randint(0, 1 << 20)),
+                    '    return value * {}'.format(rand.randint(1, 9)),
+                    '}'])
+    return '\n'.join(out[:lines]) + '\n'
+
+
+def _git(repo, *args):
+    return subprocess.check_output(('git', ) + args, cwd=repo)
+
+
+def make_repo(path, files, lines, depth, go_ratio, seed=0):
+    """Create a git repo at path with depth commits
+
+    Every commit rewrites the same files files, go_ratio of them Go and
+    the rest Python, of lines lines each. The working tree is left with
+    all Python files modified for the commit scenario. Returns the
+    (base, tip) commits of the history after the first commit.
+
+    """
+
+    rand = random.Random(seed)
+    os.makedirs(path)
+    _git(path, 'init', '-q')
+    n_go = int(round(files * go_ratio))
+    names = ['pkg{}/mod_{}.py'.format(index % 4, index)
+             for index in range(files - n_go)]
+    names += ['gopkg/file_{}.go'.format(index) for index in range(n_go)]
+
+    def write_all(python_only=False):
+        for name in names:
+            if python_only and not name.endswith('.py'):
+                continue
+            file_path = os.path.join(path, name)
+            if not os.path.isdir(os.path.dirname(file_path)):
+                os.makedirs(os.path.dirname(file_path))
+            with open(file_path, 'w') as file_handle:
+                if name.endswith('.py'):
+                    file_handle.write(_python_source(rand, lines))
+                else:
+                    file_handle.write(_go_source(rand, lines))
+
+    commits = []
+    for number in range(max(depth, 2)):
+        write_all()
+        _git(path, 'add', '-A')
+        _git(path, '-c', 'user.name=bench', '-c',
+             'user.email=bench@example.com', 'commit', '-q', '-m',
+             'commit {}'.format(number))
+        commits.append(_git(path, 'rev-parse', 'HEAD').strip())
+    write_all(python_only=True)
+    return (commits[0], commits[-1])
+
+
+def _which(command):
+    for directory in os.environ.get('PATH', '').split(os.pathsep):
+        if os.access(os.path.join(directory, command), os.X_OK):
+            return True
+    return False
+
+
+def _instrument(counter_file):
+    """
+        Count subprocesses and temporary file bytes of this process and
+        of the workers it forks in counter_file
+    """
+
+    from git_pylint_commit_hook import git_blobs
+
+    def count(kind, amount):
+        with open(counter_file, 'a') as file_handle:
+            file_handle.write('{} {}\n'.format(kind, amount))
+
+    popen = subprocess.Popen
+
+    class CountingPopen(popen):
+        def __init__(self, *args, **kwargs):
+            count('popen', 1)
+            popen.__init__(self, *args, **kwargs)
+
+    subprocess.Popen = CountingPopen
+
+    write_temp_file = git_blobs.write_temp_file
+    write_temp_tree = git_blobs.write_temp_tree
+
+    def counting_write_temp_file(path, data):
+        count('tmp', len(data))
+        return write_temp_file(path, data)
+
+    def counting_write_temp_tree(files):
+        files = list(files)
+        count('tmp', sum(len(data) for (_, data) in files))
+        return write_temp_tree(files)
+
+    git_blobs.write_temp_file = counting_write_temp_file
+    git_blobs.write_temp_tree = counting_write_temp_tree
+
+
+def run_scenario(args):
+    """
+        Child side: run one scenario in this process
+    """
+
+    _instrument(args.counter_file)
+    from git_pylint_commit_hook import commit_hook
+    from git_pylint_commit_hook import score_api
+    from git_golint_commit_hook import commit_hook as golint_hook
+
+    score_api.configure(args.server)
+    os.chdir(args.repo)
+    datfile = os.path.join(args.work_dir, 'git.dat')
+    scorefile = os.path.join(args.work_dir, 'scores.dat')
+    sys.stdin = StringIO('{} {} refs/heads/master\n'.format(args.base,
+                                                            args.tip))
+    start = time.time()
+    try:
+        if args.scenario == 'commit':
+            commit_hook.check_repo(
+                args.limit, 'pylint', '.pylintrc', '', False, datfile,
+                scorefile, jobs=args.jobs, batch=args.batch,
+                cache_dir=args.cache_dir, lint_server_socket=None)
+        elif args.scenario == 'push':
+            commit_hook.push_commit_score(
+                args.limit, 'pylint', '.pylintrc', '', False, datfile,
+                scorefile, jobs=args.jobs, batch=args.batch,
+                cache_dir=args.cache_dir, lint_server_socket=None,
+                spool_path=None)
+        else:
+            golint_hook.check_repo(args.limit, 'golint', datfile, scorefile,
+                                   cache_dir=args.cache_dir,
+                                   spool_path=None, batch=args.batch)
+    except SystemExit:
+        pass
+    with open(args.result_file, 'w') as file_handle:
+        json.dump({'hook_time': time.time() - start}, file_handle)
+
+
+def _measure(scenario, repo, base, tip, server, args):
+    """
+        Parent side: run scenario in a child process and collect its
+        metrics
+    """
+
+    work_dir = tempfile.mkdtemp(prefix='bench_run_')
+    counter_file = os.path.join(work_dir, 'counters')
+    result_file = os.path.join(work_dir, 'result.json')
+    command = [sys.executable, os.path.abspath(__file__), '--run-scenario',
+               scenario, '--repo', repo, '--base', base, '--tip', tip,
+               '--server', server, '--work-dir', work_dir,
+               '--counter-file', counter_file, '--result-file', result_file,
+               '--jobs', str(args.jobs), '--limit', str(args.limit),
+               '--cache-dir', args.cache_dir or '']
+    if args.batch:
+        command.append('--batch')
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.abspath(__file__))] +
+        ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    (CommitsApi.requests, CommitsApi.records) = (0, 0)
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        proc = subprocess.Popen(command, stdout=devnull, stderr=devnull,
+                                env=env)
+        (_, status, rusage) = os.wait4(proc.pid, 0)
+        wall_time = time.time() - start
+        proc.returncode = status
+    subprocesses = 0
+    tmp_bytes = 0
+    if os.path.exists(counter_file):
+        with open(counter_file) as file_handle:
+            for line in file_handle:
+                (kind, amount) = line.split()
+                if kind == 'popen':
+                    subprocesses += int(amount)
+                else:
+                    tmp_bytes += int(amount)
+    with open(result_file) as file_handle:
+        hook_time = json.load(file_handle)['hook_time']
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'wall_time': round(wall_time, 3),
+        'hook_time': round(hook_time, 3),
+        'subprocesses': subprocesses,
+        'tmp_bytes': tmp_bytes,
+        'peak_rss_kb': rusage.ru_maxrss,
+        'uploaded_records': CommitsApi.records,
+        'api_requests': CommitsApi.requests,
+        }
+
+
+def _record(number):
+    """
+        The score record number of the collector scenario
+    """
+
+    return {'commitid': '{:040x}'.format(number // RECORD_FILES),
+            'repo': 'bench', 'file': 'mod_{}.py'.format(number % RECORD_FILES),
+            'email': 'bench@example.com', 'score': 7.5, 'status': 'PASSED',
+            'insert': 10, 'delete': 2}
+
+
+def _collector_client(job):
+    """
+        One client process of the collector scenario, runs mode on the
+        records numbered first to last
+    """
+
+    from git_pylint_commit_hook import score_api
+    (address, mode, first, last) = job
+    client = score_api.ScoreClient(address)
+    try:
+        if mode == 'post':
+            client.post_commits(_record(number) for number in
+                                range(first, last))
+        elif mode == 'bulk':
+            for start in range(first, last, 1000):
+                client.post_bulk(_record(number) for number in
+                                 range(start, min(start + 1000, last)))
+        else:
+            for number in range(first, last, RECORD_FILES):
+                if not client.is_commit_already_exist(
+                        _record(number)['commitid'], 'bench'):
+                    raise AssertionError('record {} is missing'.format(
+                        number))
+    finally:
+        client.close()
+
+
+def measure_collector(bench_dir, args):
+    """Throughput of a collector over a fresh database
+
+    The server runs in its own process, args.clients client processes
+    share args.records records per mode between them. Returns records
+    (or commit lookups) per second of every mode.
+
+    """
+
+    from git_pylint_commit_hook import collector
+    db_path = os.path.join(bench_dir, 'collector-{}.sqlite'.format(
+        time.time()))
+    server = collector.CollectorServer('127.0.0.1:0', db_path)
+    process = multiprocessing.Process(target=server.serve_forever)
+    process.start()
+    server.server_close()
+    address = '127.0.0.1:{}'.format(server.server_port)
+    pool = multiprocessing.Pool(args.clients)
+    results = {}
+    try:
+        share = -(-args.records // args.clients)
+        for (mode, offset, metric) in (
+                ('post', 0, 'records_per_sec'),
+                ('bulk', args.records, 'bulk_records_per_sec'),
+                ('lookup', 0, 'lookups_per_sec')):
+            jobs = [(address, mode, offset + first,
+                     offset + min(first + share, args.records))
+                    for first in range(0, args.records, share)]
+            start = time.time()
+            pool.map(_collector_client, jobs)
+            count = args.records
+            if mode == 'lookup':
+                count = -(-args.records // RECORD_FILES)
+            results[metric] = int(count / (time.time() - start))
+        store = collector.CommitStore(db_path)
+        if len(store) != 2 * args.records:
+            raise AssertionError('{} of {} records stored'.format(
+                len(store), 2 * args.records))
+        store.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        process.terminate()
+        process.join()
+    return results
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def _compare(old, new):
+    """
+        Print how every metric moved between two result files
+    """
+
+    print '{:14s} {:18s} {:>12s} {:>12s} {:>8s}'.format(
+        'scenario', 'metric', 'old', 'new', 'change')
+    for (scenario, metrics) in sorted(new['scenarios'].items()):
+        old_metrics = old.get('scenarios', {}).get(scenario)
+        if not old_metrics or 'skipped' in metrics or \
+                'skipped' in old_metrics:
+            continue
+        for metric in METRICS:
+            (before, after) = (old_metrics.get(metric), metrics.get(metric))
+            if before is None or after is None:
+                continue
+            change = '{:+.0%}'.format(float(after - before) / before) \
+                if before else ''
+            print '{:14s} {:18s} {:>12} {:>12} {:>8s}'.format(
+                scenario, metric, before, after, change)
+
+
+def main():
+    """ Build the repos, run the scenarios and write the results """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the git commit hooks')
+    parser.add_argument('--files', default=20, type=int,
+                        help='Files changed per commit. Default: 20')
+    parser.add_argument('--lines', default=200, type=int,
+                        help='Lines per file. Default: 200')
+    parser.add_argument('--depth', default=5, type=int,
+                        help='Commits in the generated history. Default: 5')
+    parser.add_argument('--go-ratio', default=0.25, type=float,
+                        help='Share of Go files. Default: 0.25')
+    parser.add_argument('--seed', default=0, type=int,
+                        help='Seed of the generated content. Default: 0')
+    parser.add_argument('--repeat', default=1, type=int,
+                        help='Runs per scenario, the median is reported. '
+                             'Default: 1')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='Comma separated scenarios to run. '
+                             'Default: %(default)s')
+    parser.add_argument('--jobs', default=1, type=int,
+                        help='--jobs passed to the hooks. Default: 1')
+    parser.add_argument('--batch', action='store_true',
+                        help='Run the hooks in batch mode')
+    parser.add_argument('--warm-cache', action='store_true',
+                        help='Measure with a score cache warmed by a first '
+                             'run, the cache is off otherwise')
+    parser.add_argument('--clients', default=4, type=int,
+                        help='collector: client processes. Default: 4')
+    parser.add_argument('--records', default=20000, type=int,
+                        help='collector: records posted per mode. '
+                             'Default: 20000')
+    parser.add_argument('--limit', default=5.0, type=float,
+                        help='Score limit passed to the hooks. Default: 5.0')
+    parser.add_argument('--output', default='benchmark.json',
+                        help='Result file. Default: benchmark.json')
+    parser.add_argument('--compare',
+                        help='Earlier result file to compare against')
+    parser.add_argument('--run-scenario', help=argparse.SUPPRESS)
+    for hidden in ('--repo', '--base', '--tip', '--server', '--work-dir',
+                   '--counter-file', '--result-file', '--cache-dir'):
+        parser.add_argument(hidden, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        args.scenario = args.run_scenario
+        args.cache_dir = args.cache_dir or None
+        run_scenario(args)
+        return
+
+    bench_dir = tempfile.mkdtemp(prefix='bench_')
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), CommitsApi)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        repo = os.path.join(bench_dir, 'repo')
+        (base, tip) = make_repo(repo, args.files, args.lines, args.depth,
+                                args.go_ratio, args.seed)
+        address = '127.0.0.1:{}'.format(server.server_port)
+        results = {}
+        for scenario in args.scenarios.split(','):
+            if scenario == 'collector':
+                runs = [measure_collector(bench_dir, args)
+                        for _ in range(args.repeat)]
+                results[scenario] = dict((metric, _median(
+                    [run[metric] for run in runs])) for metric in runs[0])
+                print scenario, json.dumps(results[scenario], sort_keys=True)
+                continue
+            if scenario == 'golint-push' and not _which('golint'):
+                results[scenario] = {'skipped': 'golint is not installed'}
+                continue
+            args.cache_dir = None
+            if args.warm_cache:
+                args.cache_dir = os.path.join(bench_dir, 'cache-' + scenario)
+                _measure(scenario, repo, base, tip, address, args)
+            runs = [_measure(scenario, repo, base, tip, address, args)
+                    for _ in range(args.repeat)]
+            results[scenario] = dict((metric, _median([run[metric] for run
+                                     in runs])) for metric in runs[0])
+            print scenario, json.dumps(results[scenario], sort_keys=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(bench_dir, ignore_errors=True)
+
+    try:
+        revision = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = ''
+    output = {
+        'revision': revision,
+        'params': {'files': args.files, 'lines': args.lines,
+                   'depth': args.depth, 'go_ratio': args.go_ratio,
+                   'seed': args.seed, 'repeat': args.repeat,
+                   'jobs': args.jobs, 'batch': args.batch,
+                   'warm_cache': args.warm_cache, 'clients': args.clients,
+                   'records': args.records},
+        'scenarios': results,
+        }
+    with open(args.output, 'w') as file_handle:
+        json.dump(output, file_handle, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as file_handle:
+            _compare(json.load(file_handle), output)
+
+
+if __name__ == '__main__':
+    main()
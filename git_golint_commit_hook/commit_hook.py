@@ -2,14 +2,17 @@
 """ commit hook for golint """
 import decimal
 import os
-import re
+import shutil
 import sys
 import subprocess
 import collections
-import ConfigParser
-import tempfile
-import urllib2
-import json
+
+from git_pylint_commit_hook import git_blobs
+from git_pylint_commit_hook import git_push
+from git_pylint_commit_hook import profiling
+from git_pylint_commit_hook import score_api
+from git_pylint_commit_hook import score_cache
+from git_pylint_commit_hook import score_spool
 
 
 ExecutionResult = collections.namedtuple(
@@ -31,14 +34,17 @@ def get_changed_files(base, commit):
 
 def git(args):
     environ = os.environ.copy()
-    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=environ)
-    stdout, stderr = process.communicate()
+    with profiling.span(' '.join(args[:2]), 'git', cmd=' '.join(args)):
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=environ)
+        stdout, stderr = process.communicate()
     status = process.poll()
     return ExecutionResult(status, stdout, stderr)
 
 def get_file_content(filename, commit):
-    results = git(('git', 'show', '%s:%s' % (commit, filename))).stdout
-    return results
+    blob = git_blobs.blob_reader().read(commit, filename)
+    if blob is None:
+        return ''
+    return blob.data
 
 def _current_commit():
     if git('git rev-parse --verify HEAD'.split()).status:
@@ -87,27 +93,152 @@ def getNumberOfLines(file_n):
                         totalLines += 1
     return totalLines
 
-def runGolint(file_n,golint):
-    """ Runs golint on a file, and returns its score. """
-    totalLines = getNumberOfLines(file_n)
+def getGolintWarnings(file_n,golint):
+    """ Runs golint on a file, and returns its warning lines. """
     try:
         command = [golint]
         penv = os.environ.copy()
         command.append(file_n)
-        proc = subprocess.Popen(command,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=penv)
-        outp, _ = proc.communicate()
-        warnings = 0
-        for line in outp:
-                if line=='\n':
-                        warnings += 1
+        with profiling.span('golint', 'lint',
+                            file=git_blobs.original_path(file_n)):
+            proc = subprocess.Popen(command,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=penv)
+            outp, _ = proc.communicate()
     except OSError:
             print("\nAn error occurred. Is golint installed?")
             sys.exit(1)
+    return outp.splitlines()
+
+def runGolint(file_n,golint):
+    """ Runs golint on a file, and returns its score. """
+    totalLines = getNumberOfLines(file_n)
+    warnings = len(getGolintWarnings(file_n,golint))
     score = computeGoScore(warnings,totalLines)
     return score
 
+def golintCacheKey(filename,filecontent,golint,cache,params=()):
+    """ Returns the score cache key of linting a go file's content. """
+    return cache.key(score_cache.blob_sha(filecontent),
+                     os.path.basename(filename),
+                     score_cache.config_hash(golint, params),
+                     score_cache.linter_version(golint, version_flag=None))
+
+def runGolintCached(filename,filecontent,golint,cache):
+    """ Returns the score of a go file's content from the score cache,
+        running golint on a temporary copy only when it is not cached.
+    """
+    cache_key = None
+    if cache is not None:
+        cache_key = golintCacheKey(filename,filecontent,golint,cache)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached['score']
+    tmpfile = git_blobs.write_temp_file(filename, filecontent)
+    try:
+        warnings = getGolintWarnings(tmpfile,golint)
+        score = computeGoScore(len(warnings),getNumberOfLines(tmpfile))
+    finally:
+        git_blobs.remove_temp_file(tmpfile)
+    if cache_key is not None:
+        cache.put(cache_key, {'score': score, 'messages': warnings})
+    return score
+
+def countLines(filecontent):
+    """ Returns the number of non blank lines of a go file's content. """
+    return sum(1 for line in filecontent.splitlines() if line.strip())
+
+def attributeWarnings(lines, filenames):
+    """ Splits golint's output lines into the warnings of each of filenames
+        in one pass. Warnings on other files are dropped.
+    """
+    warnings = dict((filename, []) for filename in filenames)
+    for line in lines:
+        filename = os.path.normpath(line.split(':', 1)[0])
+        if filename in warnings:
+            warnings[filename].append(line.rstrip('\n'))
+    return warnings
+
+def getPackageFiles(directory, commit):
+    """ Returns (path, content) of every go file of the package in
+        directory at commit.
+    """
+    tree = commit + ':' + directory if directory else commit
+    entries = git(('git', 'ls-tree', '-z', tree)).stdout
+    files = []
+    for entry in entries.split('\0'):
+        if not entry:
+            continue
+        (info, name) = entry.split('\t', 1)
+        if info.split()[1] == 'blob' and _is_go_file(name):
+            path = os.path.join(directory, name)
+            files.append((path, get_file_content(path, commit)))
+    return files
+
+def getGolintPackageWarnings(lint_dir, directories, filenames, golint):
+    """ Runs golint once over the package directories below lint_dir,
+        returns the warning lines of each of filenames.
+    """
+    command = [golint] + ['./' + directory if directory else '.'
+                          for directory in directories]
+    try:
+        with open(os.devnull, 'w') as devnull, \
+                profiling.span('golint', 'lint', files=len(filenames)):
+            proc = subprocess.Popen(command,stdout=subprocess.PIPE,stderr=devnull,cwd=lint_dir)
+            warnings = attributeWarnings(iter(proc.stdout.readline, ''), filenames)
+            proc.wait()
+    except OSError:
+            print("\nAn error occurred. Is golint installed?")
+            sys.exit(1)
+    return warnings
+
+def runGolintPackages(lint_jobs,golint,cache):
+    """ Scores (filename, blob, commit, filecontent) jobs, running golint
+        once per round over the package directories of all the files, with
+        every go file of each package in place. A directory is linted at
+        one commit per round. Returns {(filename, blob): score}.
+    """
+    scores = {}
+    packages = collections.OrderedDict()
+    for (filename, blob, commit, filecontent) in lint_jobs:
+        cache_key = None
+        if cache is not None:
+            cache_key = golintCacheKey(filename,filecontent,golint,cache,['package'])
+            cached = cache.get(cache_key)
+            if cached is not None:
+                scores[(filename, blob)] = cached['score']
+                continue
+        packages.setdefault((os.path.dirname(filename), commit), []).append(
+            (filename, blob, filecontent, cache_key))
+    rounds = []
+    for (directory, commit) in packages:
+        for lint_round in rounds:
+            if directory not in lint_round:
+                break
+        else:
+            lint_round = collections.OrderedDict()
+            rounds.append(lint_round)
+        lint_round[directory] = commit
+    for lint_round in rounds:
+        lint_dir = git_blobs.write_temp_tree(
+            package_file for (directory, commit) in lint_round.items()
+            for package_file in getPackageFiles(directory, commit))
+        filenames = [filename for (directory, commit) in lint_round.items()
+                     for (filename, _, _, _) in packages[(directory, commit)]]
+        try:
+            warnings = getGolintPackageWarnings(lint_dir, list(lint_round), filenames, golint)
+        finally:
+            shutil.rmtree(lint_dir, ignore_errors=True)
+        for (directory, commit) in lint_round.items():
+            for (filename, blob, filecontent, cache_key) in packages[(directory, commit)]:
+                score = computeGoScore(len(warnings[filename]),countLines(filecontent))
+                scores[(filename, blob)] = score
+                if cache_key is not None:
+                    cache.put(cache_key, {'score': score, 'messages': warnings[filename]})
+    return scores
+
 def check_repo(
-        limit, golint='golint', datfile="/tmp/git.dat", scorefile="/tmp/scores.dat"):
+        limit, golint='golint', datfile="/tmp/git.dat", scorefile="/tmp/scores.dat",
+        cache_dir=None, upload_timeout=score_api.DEFAULT_TIMEOUT,
+        spool_path=None, batch=False):
     """ Main function doing the checks
 
     :type limit: float
@@ -116,79 +247,125 @@ def check_repo(
     :param golint: Path to golint executable
     :type suppress_report: bool
     :param suppress_report: Suppress report if score is below limit
+    :type cache_dir: str
+    :param cache_dir: Directory of the score cache, None disables it
+    :type upload_timeout: float
+    :param upload_timeout: Seconds to wait for the scoring server
+    :type spool_path: str
+    :param spool_path: Spool scores there and upload them in the background,
+        None uploads them right away
+    :type batch: bool
+    :param batch: Run golint once over the package directories of all
+        changed files instead of once per file
     """
-    line = sys.stdin.read()
-    (base, commit, ref) = line.strip().split()
+    cache = score_cache.ScoreCache(cache_dir) if cache_dir else None
+    updates = git_push.read_ref_updates(sys.stdin)
     reponame = get_repo_name()
-    url_get_commit = 'http://10.70.210.192:4000/api/Commits/%s/%s/isExists' % (commit,reponame)
-    request = urllib2.Request(url_get_commit) 
-    json_data = urllib2.urlopen(url_get_commit).read()
-    commit_data = json.loads(json_data) 
-    commit_exists = commit_data['isExists']
-    if commit_exists :
-        sys.exit(0)
-     
-    modified = get_changed_files(base, commit)
-    files=[]
-    for fname in modified:
-	if _is_go_file(fname):
-		file_content = get_file_content(fname, commit)
-		files.append((fname,file_content,None))	
-  
-    # Don't do anything if there are no Go files
-    if len(modified) == 0:
+    if spool_path:
+        spool = score_spool.ScoreSpool(spool_path)
+        commit_exists = lambda commit: spool.has_commit(commit, reponame)
+    else:
+        client = score_api.ScoreClient(timeout=upload_timeout)
+        commit_exists = lambda commit: \
+            client.is_commit_already_exist(commit, reponame)
+    push_commits = [push_commit for push_commit in
+                    git_push.push_commits(updates)
+                    if not commit_exists(push_commit.commit)]
+
+    # Don't do anything if there are no new commits
+    if not push_commits:
         sys.exit(0)
 
-    # Golint files
-    i = 1
-    skipped_filecount=0
-    n_files = len(modified)
-    user = _get_user(commit)
-    url ='http://10.70.210.192:4000/api/Commits'
-    for filename, filecontent, score in files:
-	tmpfile = tempfile.NamedTemporaryFile(delete=False)	
-	tmpfile.write(filecontent)
-	tmpfile.close()
-
-        if os.stat(tmpfile.name).st_size == 0:
-        	print(
-                    'Skipping {} (empty file)..'
-                    '\tSKIPPED'.format(filename))
-		skipped_filecount += 1
-		os.unlink(tmpfile.name)
-                # Bump parsed files
-                i += 1
-                continue
+    commits = [push_commit.commit for push_commit in push_commits]
+    with profiling.span('read changes', 'phase'):
+        changes = git_push.commit_changes(commits)
+        users = git_push.commit_authors(commits)
 
-        # Start golinting
-        sys.stdout.write("Processing {} (file {}/{})..\t".format(filename, i, n_files ))
-        sys.stdout.flush()    
-        score = runGolint(tmpfile.name,golint)
-	os.unlink(tmpfile.name)
-        status = ""
+    # Golint files, each (path, blob) once
+    blob_scores = {}
+    package_scores = {}
+    if batch:
+        lint_jobs = collections.OrderedDict()
+        for commit in commits:
+            for change in changes[commit]:
+                if _is_go_file(change.path) and \
+                        (change.path, change.blob) not in lint_jobs:
+                    filecontent = get_file_content(change.path, commit)
+                    if filecontent:
+                        lint_jobs[(change.path, change.blob)] = \
+                            (change.path, change.blob, commit, filecontent)
+        package_scores = runGolintPackages(lint_jobs.values(),golint,cache)
+    committed_datas = collections.OrderedDict()
+    for (_, commit, ref) in push_commits:
+        files = [change for change in changes[commit]
+                 if _is_go_file(change.path)]
+        i = 1
+        skipped_filecount = 0
+        n_files = len(files)
+        user = users.get(commit) or _get_user(commit)
+        committed_datas[commit] = []
+        if len(push_commits) > 1:
+            print('Commit {} on {}'.format(commit, ref))
+        for change in files:
+            filename = change.path
+            if (filename, change.blob) not in blob_scores:
+                filecontent = get_file_content(filename, commit)
+                if not filecontent:
+                    print(
+                        'Skipping {} (empty file)..'
+                        '\tSKIPPED'.format(filename))
+                    skipped_filecount += 1
+                    # Bump parsed files
+                    i += 1
+                    continue
 
-        # Verify the score
-        if score >= float(limit):
-            status = 'PASSED'
-        else:
-            status = 'FAILED'
-        
-        committed_data={}
-	committed_data.update({"email":user})
- 	committed_data.update({"repo":reponame})
-	committed_data.update({"score":score})
-	committed_data.update({"status":status})
-	committed_data.update({"file":filename})
-        committed_data.update({"commitid":commit}) 
-        jsondata = json.dumps(committed_data)
-        req = urllib2.Request(url,jsondata)
-        req.add_header('Content-Type', 'application/json')
-        urllib2.urlopen(req).read()
-        # Add some output
-        print('{:.2}/10.00'.format(decimal.Decimal(score)))
-        # Bump parsed files
-        i += 1
-   
-        with open(datfile, "a+") as f:
-        	f.write('{:40s} COMMIT SCORE {:5.2f} IMPACT ON REPO  AGAINST {} STATUS {} \n'.format(user, score, commit, status))
+                # Start golinting
+                sys.stdout.write("Processing {} (file {}/{})..\t".format(filename, i, n_files ))
+                sys.stdout.flush()
+                with profiling.span('score file', 'phase', file=filename):
+                    if (filename, change.blob) in package_scores:
+                        blob_scores[(filename, change.blob)] = \
+                            package_scores[(filename, change.blob)]
+                    else:
+                        blob_scores[(filename, change.blob)] = \
+                            runGolintCached(filename,filecontent,golint,cache)
+            score = blob_scores[(filename, change.blob)]
+            status = ""
+
+            # Verify the score
+            if score >= float(limit):
+                status = 'PASSED'
+            else:
+                status = 'FAILED'
+
+            committed_data={}
+            committed_data.update({"email":user})
+            committed_data.update({"repo":reponame})
+            committed_data.update({"score":score})
+            committed_data.update({"status":status})
+            committed_data.update({"file":filename})
+            committed_data.update({"commitid":commit})
+            committed_datas[commit].append(committed_data)
+            # Add some output
+            print('{:.2}/10.00'.format(decimal.Decimal(score)))
+            # Bump parsed files
+            i += 1
+
+            with open(datfile, "a+") as f:
+                f.write('{:40s} COMMIT SCORE {:5.2f} IMPACT ON REPO  AGAINST {} STATUS {} \n'.format(user, score, commit, status))
+
+    # Upload all scores of the push at once
+    if spool_path:
+        try:
+            for (commit, datas) in committed_datas.items():
+                spool.append(commit, reponame, datas)
+        finally:
+            spool.close()
+        score_spool.spawn_flush(spool_path, upload_timeout)
+        return
+    try:
+        client.post_commits(data for datas in committed_datas.values()
+                            for data in datas)
+    finally:
+        client.close()
       
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Checkpoint of a history backfill, so an interrupted one resumes """
+
+import json
+import os
+import subprocess
+
+CHECKPOINT_FILE = 'pylint-backfill.json'
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def default_path():
+    """
+        Where the checkpoint of the current repository lives, inside its
+        git directory. None outside a repository.
+    """
+
+    process = subprocess.Popen(['git', 'rev-parse', '--git-dir'],
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    (stdout, _) = process.communicate()
+    if process.returncode:
+        return None
+    return os.path.join(stdout.strip(), CHECKPOINT_FILE)
+
+
+class Checkpoint(object):
+    """Last commit of a range whose scores are safely stored
+
+    The checkpoint of every range backfilled is kept in one JSON file,
+    replaced atomically on every save, so a backfill killed at any point
+    leaves a readable checkpoint behind. A range backfilled again starts
+    after its last saved commit, which also scores only the commits added
+    to the range since.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._ranges = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as file_handle:
+                    self._ranges = json.load(file_handle)
+            except ValueError:
+                self._ranges = {}
+
+    def start(self, rev_range, commits):
+        """
+            Index in commits, oldest first, of the first commit of
+            rev_range left to backfill
+        """
+
+        last = self._ranges.get(rev_range)
+        if last in commits:
+            return commits.index(last) + 1
+        return 0
+
+    def save(self, rev_range, commit):
+        """
+            Record that the commits of rev_range up to commit are done
+        """
+
+        self._ranges[rev_range] = commit
+        if not self.path:
+            return
+        temp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(temp_path, 'w') as file_handle:
+            json.dump(self._ranges, file_handle)
+        os.rename(temp_path, self.path)
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Decide which engine lints each file of a change set, all at once """
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+from git_pylint_commit_hook import engines
+from git_pylint_commit_hook import git_blobs
+from git_pylint_commit_hook import profiling
+
+LINT_ATTRIBUTE = 'lint'
+
+# Values of the lint attribute naming an engine, besides the engine names
+ATTRIBUTE_ENGINES = {'python': 'pylint', 'go': 'golint'}
+
+HEAD_SIZE = 256
+
+NULL_SHA = '0' * 40
+
+_FIRST_LINES = {}
+
+
+def _git(args, stdin_data=None, env=None):
+    """
+        Output of a git command, empty if it fails
+    """
+
+    with profiling.span(' '.join(args[:2]), 'git', cmd=' '.join(args)):
+        process = subprocess.Popen(args, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, env=env)
+        (stdout, _) = process.communicate(stdin_data)
+    if process.returncode:
+        return ''
+    return stdout
+
+
+def lint_attributes(paths, commit=None):
+    """Value of the lint attribute of every path, from one git call
+
+    The attributes are those of the working tree, or of commit when
+    given, which also works in bare repositories. Returns {path: value},
+    with 'unset' for `-lint` and 'unspecified' when no rule matches.
+
+    """
+
+    if not paths:
+        return {}
+    stdin_data = ''.join(path + '\0' for path in paths)
+    args = ['git', 'check-attr', '-z', '--stdin', LINT_ATTRIBUTE]
+    if commit is None:
+        output = _git(args, stdin_data)
+    else:
+        # check-attr only reads attributes of a commit from an index
+        index_dir = tempfile.mkdtemp(prefix='lint_index_')
+        env = os.environ.copy()
+        env['GIT_INDEX_FILE'] = os.path.join(index_dir, 'index')
+        try:
+            _git(['git', 'read-tree', commit], env=env)
+            output = _git(args[:2] + ['--cached'] + args[2:], stdin_data, env)
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+    fields = output.split('\0')
+    return dict((fields[i], fields[i + 2])
+                for i in range(0, len(fields) - 2, 3))
+
+
+def _first_line(path, blob, cache=None):
+    """
+        First line of the blob, of the working tree file path when blob
+        is None, read no further than HEAD_SIZE bytes
+    """
+
+    if blob is None or blob == NULL_SHA:
+        try:
+            with open(path, 'r') as file_handle:
+                return file_handle.readline(HEAD_SIZE)
+        except IOError:
+            return ''
+    if blob in _FIRST_LINES:
+        return _FIRST_LINES[blob]
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key('first-line', blob)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            _FIRST_LINES[blob] = cached['line']
+            return cached['line']
+    head = git_blobs.blob_reader().read_head(blob, HEAD_SIZE)
+    line = (head or '').split('\n', 1)[0]
+    _FIRST_LINES[blob] = line
+    if cache_key is not None:
+        cache.put(cache_key, {'line': line})
+    return line
+
+
+def classify(files, commit=None, cache=None):
+    """Name of the engine in use for every (path, blob) of files
+
+    blob is None, or the null SHA, for a file that is only in the working
+    tree. A lint attribute naming an engine wins, `-lint` turns linting
+    off, then the extension decides and last the #! line, read once per
+    blob and kept in cache. Attributes are looked up at commit, see
+    lint_attributes. Returns {(path, blob): engine name, empty when the
+    file is not linted}.
+
+    """
+
+    files = list(files)
+    attributes = lint_attributes(sorted(set(path for (path, _) in files)),
+                                 commit)
+    lint_types = {}
+    for (path, blob) in files:
+        value = attributes.get(path, 'unspecified')
+        if value == 'unset':
+            lint_types[(path, blob)] = ''
+            continue
+        name = ATTRIBUTE_ENGINES.get(value, value)
+        if name in engines.ENGINE_TYPES:
+            # Files an attribute assigns to an engine not in use are skipped
+            lint_types[(path, blob)] = name if name in engines.names() else ''
+            continue
+        engine = engines.engine_for(path) or engines.engine_for_first_line(
+            _first_line(path, blob, cache))
+        lint_types[(path, blob)] = engine.name if engine else ''
+    return lint_types
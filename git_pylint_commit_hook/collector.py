@@ -0,0 +1,247 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Local score collector serving the Commits API from SQLite """
+
+import BaseHTTPServer
+import errno
+import json
+import os
+import sqlite3
+import SocketServer
+import sys
+import time
+import urllib
+
+DEFAULT_ADDRESS = '127.0.0.1:4000'
+
+DEFAULT_DB = os.path.join(os.path.expanduser('~'), '.local', 'share',
+                          'git-pylint-commit-hook', 'collector.sqlite')
+
+# Largest request body taken, in bytes
+MAX_BODY = 64 * 1024 * 1024
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS commits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    commitid TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    file TEXT NOT NULL,
+    email TEXT,
+    score REAL,
+    status TEXT,
+    created REAL NOT NULL,
+    record TEXT NOT NULL,
+    UNIQUE (commitid, repo, file)
+);
+CREATE INDEX IF NOT EXISTS commits_email ON commits (email);
+CREATE INDEX IF NOT EXISTS commits_repo ON commits (repo, created);
+'''
+
+_API_PREFIX = '/api/Commits'
+
+
+class InvalidRecord(ValueError):
+    """ A posted record is not an object with a commitid, repo and file """
+    pass
+
+
+def _make_parent(path):
+    try:
+        os.makedirs(os.path.dirname(path))
+    except OSError as error:
+        if error.errno != errno.EEXIST:
+            raise
+
+
+def _row(record, created):
+    """
+        Columns of the commits table for a posted record
+    """
+
+    if not isinstance(record, dict):
+        raise InvalidRecord('records must be objects')
+    for field in ('commitid', 'repo', 'file'):
+        if not isinstance(record.get(field), basestring) or \
+                not record[field]:
+            raise InvalidRecord('record without {}'.format(field))
+    return (record['commitid'], record['repo'], record['file'],
+            record.get('email'), record.get('score'), record.get('status'),
+            created, json.dumps(record))
+
+
+class CommitStore(object):
+    """Score records of the Commits API in SQLite
+
+    A record is identified by (commitid, repo, file), posting it again
+    replaces the stored copy, so uploads can be retried safely. The
+    unique index on those columns answers isExists with one index
+    lookup. The database is in WAL mode and every write takes the write
+    lock up front, so any number of threads and processes, each with its
+    own CommitStore, can write to it at the same time.
+
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        _make_parent(path)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def add(self, records):
+        """
+            Store the records in one transaction, returns how many. Raises
+            InvalidRecord, storing none of them, if one is not valid
+        """
+
+        created = time.time()
+        rows = [_row(record, created) for record in records]
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO commits (commitid, repo, file, '
+                'email, score, status, created, record) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        except Exception:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+        return len(rows)
+
+    def exists(self, commit, repo):
+        """
+            Whether records of commit in repo are stored
+        """
+
+        return self._db.execute(
+            'SELECT 1 FROM commits WHERE commitid = ? AND repo = ? LIMIT 1',
+            (commit, repo)).fetchone() is not None
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM commits').fetchone()[0]
+
+    def close(self):
+        """
+            Close the database
+        """
+
+        self._db.close()
+
+
+class CollectorHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """The Commits API the hooks upload to
+
+    GET /api/Commits/<commit>/<repo>/isExists answers {"isExists": bool}.
+    POST /api/Commits stores a record or an array of records and returns
+    them. POST /api/Commits/bulk stores an array of records, or one
+    record per line, and returns {"count": n}. Connections are kept
+    alive and each has its own CommitStore.
+
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'git-pylint-collector'
+    # Send each response in one write, Nagle's algorithm would hold back
+    # the later writes of a response on a kept-alive connection
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.store = CommitStore(self.server.db_path)
+
+    def finish(self):
+        try:
+            BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+        finally:
+            self.store.close()
+
+    def _respond(self, status, data):
+        body = json.dumps(data)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._respond(status, {'error': {'statusCode': status,
+                                         'message': message}})
+
+    def _body(self):
+        length = int(self.headers.getheader('Content-Length') or 0)
+        if length > MAX_BODY:
+            raise InvalidRecord('request body over {} bytes'.format(MAX_BODY))
+        return self.rfile.read(length)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        parts = path[len(_API_PREFIX) + 1:].split('/')
+        if not path.startswith(_API_PREFIX + '/') or len(parts) != 3 or \
+                parts[2] != 'isExists':
+            self._error(404, 'no route for GET {}'.format(path))
+            return
+        self._respond(200, {'isExists': self.store.exists(
+            urllib.unquote(parts[0]), urllib.unquote(parts[1]))})
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path not in (_API_PREFIX, _API_PREFIX + '/bulk'):
+            self._error(404, 'no route for POST {}'.format(path))
+            return
+        try:
+            body = self._body()
+            if path == _API_PREFIX:
+                data = json.loads(body)
+                self.store.add(data if isinstance(data, list) else [data])
+                self._respond(200, data)
+                return
+            if body.lstrip().startswith('['):
+                records = json.loads(body)
+            else:
+                records = [json.loads(line) for line in body.splitlines()
+                           if line.strip()]
+            self._respond(200, {'count': self.store.add(records)})
+        except ValueError as error:
+            self._error(400, str(error))
+        except sqlite3.Error as error:
+            self._error(503, str(error))
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, *args)
+
+
+class CollectorServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """ Serve the Commits API of db_path, a thread per connection """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, db_path=DEFAULT_DB, verbose=False):
+        (host, _, port) = address.rpartition(':')
+        self.db_path = db_path
+        self.verbose = verbose
+        # Create the database once, before any connection comes in
+        CommitStore(db_path).close()
+        BaseHTTPServer.HTTPServer.__init__(self, (host or '127.0.0.1',
+                                                  int(port)),
+                                           CollectorHandler)
+
+
+def serve(address=DEFAULT_ADDRESS, db_path=DEFAULT_DB, verbose=False):
+    """
+        Run the collector on address, host:port, until interrupted
+    """
+
+    server = CollectorServer(address, db_path, verbose)
+    print 'Collecting scores on {}:{} into {}'.format(
+        server.server_address[0], server.server_address[1], db_path)
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -3,24 +3,64 @@
 
 """ Commit hook for pylint """
 
+import ast
 import decimal
 import os
 import re
+import shlex
 import sys
+import shutil
+import signal
 import subprocess
 import collections
 import ConfigParser
 import json
-import urllib2
+import multiprocessing
+import Queue
+import threading
+import time
+
+from git_pylint_commit_hook import backfill
+from git_pylint_commit_hook import classify
+from git_pylint_commit_hook import deferred
+from git_pylint_commit_hook import engines
+from git_pylint_commit_hook import equivalence
+from git_pylint_commit_hook import git_blobs
+from git_pylint_commit_hook import git_push
+from git_pylint_commit_hook import lint_server
+from git_pylint_commit_hook import profiling
+from git_pylint_commit_hook import score_api
+from git_pylint_commit_hook import score_cache
+from git_pylint_commit_hook import score_index
+from git_pylint_commit_hook import score_spool
+from git_pylint_commit_hook import watcher
 
 ExecutionResult = collections.namedtuple('ExecutionResult',
         'status, stdout, stderr')
 
+LintMessage = collections.namedtuple('LintMessage',
+        'path, line, msg_id, symbol, obj, text')
+
+LintResult = collections.namedtuple('LintResult',
+        'score, messages, statements')
+
+CheckedFile = collections.namedtuple('CheckedFile',
+        'current, previous, status, report')
+
+Tier = collections.namedtuple('Tier', 'params, limit')
+
+# Result of a job that did not finish before the deadline
+_DEFERRED = 'DEFERRED'
+
+# Status of a file whose pylint run was stopped once it could not pass
+_STOPPED_EARLY = 'FAILED (stopped early)'
+
 
 def _execute(cmd):
-    process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
-                               stderr=subprocess.PIPE)
-    (stdout, stderr) = process.communicate()
+    with profiling.span(' '.join(cmd[:2]), 'git', cmd=' '.join(cmd)):
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        (stdout, stderr) = process.communicate()
     status = process.poll()
     return ExecutionResult(status, stdout, stderr)
 
@@ -43,15 +83,22 @@ def _get_list_of_committed_python_files():
     # pylint: disable=E1103
 
     diff_index_cmd = 'git diff-index %s' % _current_commit()
-    output = subprocess.check_output(diff_index_cmd.split())
+    with profiling.span('git diff-index', 'git', cmd=diff_index_cmd):
+        output = subprocess.check_output(diff_index_cmd.split())
     for result in output.split('\n'):
         if result != '':
             result = result.split()
             if result[4] in ['A', 'M']:
-                if _is_python_file(result[5]):
-                    files.append((result[5], None))  # None is initial score
+                # The blob in the index, the null SHA when the working
+                # tree file differs from it
+                files.append((result[5], result[3]))
 
-    return files
+    # Attributes, extensions and #! lines of the files in one pass, the
+    # #! lines of indexed blobs through the shared cat-file reader
+
+    lint_types = classify.classify(files)
+    return [(path, None) for (path, blob) in files  # None is initial score
+            if lint_types[(path, blob)] == 'pylint']
 
 
 def _get_user():
@@ -64,6 +111,15 @@ def _get_user():
     return user.split()[0]
 
 
+def _get_author_email():
+    """
+        Email of the author of the commit being made
+    """
+
+    ident = _execute(['git', 'var', 'GIT_AUTHOR_IDENT']).stdout
+    return ident.partition('<')[2].partition('>')[0]
+
+
 def _is_python_file(filename):
     """Check if the input file looks like a Python script
 
@@ -98,6 +154,365 @@ def _parse_score(pylint_output):
     return 0.0
 
 
+_PARSEABLE_REGEXP = \
+    re.compile(r'^(?P<path>[^:]+):(?P<line>\d+): '
+               r'\[(?P<msg_id>[A-Z]\d+)(\((?P<symbol>[^)]*)\))?, '
+               r'(?P<obj>[^\]]*)\] (?P<text>.*)$')
+
+
+def _parse_messages(pylint_output):
+    """Parse pylint's parseable output into a list of LintMessage
+
+    Lines that are not messages (module headers, source excerpts,
+    the score line) are ignored.
+
+    """
+
+    messages = []
+    for line in pylint_output.splitlines():
+        match = re.match(_PARSEABLE_REGEXP, line)
+        if match:
+            messages.append(LintMessage(os.path.normpath(match.group('path')),
+                                        int(match.group('line')),
+                                        match.group('msg_id'),
+                                        match.group('symbol') or '',
+                                        match.group('obj'),
+                                        match.group('text')))
+    return messages
+
+
+# Score cache param of _run_pylint_batch results, the results of runs
+# that rated files by module name are not read
+_BATCH = 'batch-by-file'
+
+# pylint plugin rating every file of a run on its own
+_STATS_PLUGIN = 'git_pylint_commit_hook.pylint_stats'
+
+_STATS_REGEXP = re.compile(r'^pylint-stats: (?P<path>.+):(?P<statements>\d+):'
+                           r'(?P<rating>-?[0-9.]+)?$')
+
+
+def _parse_file_stats(pylint_output):
+    """Parse the lines pylint_stats adds to pylint's output
+
+    Returns {real path: (statements, rating)} of the files pylint
+    checked, the rating is 0.0 when pylint gives none, like _parse_score.
+    A file rated more than once keeps its last rating.
+
+    """
+
+    stats = {}
+    for line in pylint_output.splitlines():
+        match = re.match(_STATS_REGEXP, line)
+        if match:
+            stats[match.group('path')] = (int(match.group('statements')),
+                                          float(match.group('rating') or 0))
+    return stats
+
+
+def _stats_command(pylint, reporter='StatsReporter'):
+    """
+        The pylint command line of a run giving the parseable messages and
+        the rating of every file, reporter is one of pylint_stats
+    """
+
+    return [pylint, '--load-plugins=' + _STATS_PLUGIN,
+            '--output-format={}.{}'.format(_STATS_PLUGIN, reporter),
+            '--reports=n'] + _PYLINT_PARAMS
+
+
+def _format_message(message):
+    """
+        Format a LintMessage the way pylint's parseable output does
+    """
+
+    if message.symbol:
+        msg_id = '{}({})'.format(message.msg_id, message.symbol)
+    else:
+        msg_id = message.msg_id
+    return '{}:{}: [{}, {}] {}'.format(message.path, message.line, msg_id,
+                                       message.obj, message.text)
+
+
+def _count_statements(source):
+    """Estimate the statements pylint would analyse in source
+
+    Counts what astroid makes statements of: docstrings are not, except
+    handlers are. Returns 0 when the source does not parse, pylint gives
+    no score for such files either. Files pylint checks get their exact
+    count from pylint_stats.
+
+    """
+
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, TypeError, ValueError):
+        return 0
+    statements = 0
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.stmt, ast.excepthandler)):
+            statements += 1
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef)) \
+                and ast.get_docstring(node, clean=False) is not None:
+            statements -= 1
+    return statements
+
+
+def _compute_score(messages, statements):
+    """Estimate a pylint score from messages and a statement count
+
+    Uses pylint's default evaluation formula, and like _parse_score
+    returns 0.0 when there is nothing to rate. Only for versions pylint
+    does not check, the others are rated by pylint_stats.
+
+    """
+
+    if not statements:
+        return 0.0
+    counts = collections.Counter(message.msg_id[0] for message in
+                                 messages)
+    penalty = 5 * counts['E'] + counts['W'] + counts['R'] + counts['C']
+    return round(10.0 - float(penalty) / statements * 10, 2)
+
+
+def _message_path(lint_path):
+    """
+        The path pylint prints in its messages for lint_path
+    """
+
+    lint_path = os.path.abspath(lint_path)
+    relative_path = os.path.relpath(lint_path)
+    if relative_path.startswith(os.pardir):
+        return lint_path
+    return relative_path
+
+
+def _run_pylint_batch(pylint, python_files, root=None, jobs=1,
+                      baselines=None):
+    """Run pylint once over all python_files
+
+    python_files are relative to root, the current directory by default.
+    Returns a dict mapping each file to a LintResult, each file is rated
+    by pylint from its own statements and messages, see pylint_stats.
+    Files pylint gives no rating line for are linted again on their own.
+    Files found in the score cache are not linted again, nor are files
+    equivalent to their (source, LintResult) in baselines, see
+    _equivalent_result.
+
+    """
+
+    results = {}
+    lint_paths = {}
+    cache_keys = {}
+    for python_file in python_files:
+        lint_path = os.path.join(root, python_file) if root else python_file
+        with open(lint_path, 'r') as file_handle:
+            source = file_handle.read()
+        if _SCORE_CACHE is not None:
+            cache_keys[python_file] = _lint_cache_key(pylint, python_file,
+                    source, _BATCH)
+            cached = _SCORE_CACHE.get(cache_keys[python_file])
+            if cached is not None:
+                results[python_file] = LintResult(cached['score'],
+                        [LintMessage(python_file, *message[1:])
+                         for message in cached['messages']],
+                        cached['statements'])
+                continue
+        if baselines and python_file in baselines:
+            result = _equivalent_result(python_file, source,
+                                        baselines[python_file])
+            if result is not None:
+                results[python_file] = result
+                continue
+        lint_paths[python_file] = lint_path
+    if not lint_paths:
+        return results
+    command = _stats_command(pylint)
+    if jobs > 1:
+        command.append('--jobs={}'.format(jobs))
+    command.extend(lint_paths.values())
+    try:
+        (status, out, _) = _spawn_pylint(command)
+    except OSError:
+        print '\nAn error occurred. Is pylint installed?'
+        sys.exit(1)
+    by_path = collections.defaultdict(list)
+    for message in _parse_messages(out):
+        by_path[message.path].append(message)
+    file_stats = _parse_file_stats(out)
+    for (python_file, lint_path) in lint_paths.items():
+        if os.path.realpath(lint_path) not in file_stats:
+            if len(lint_paths) == 1:
+                print '\npylint gave no rating for {}'.format(python_file)
+                sys.exit(1)
+            results.update(_run_pylint_batch(pylint, [python_file], root))
+            continue
+        messages = [message._replace(path=python_file) for message in
+                    by_path.get(os.path.normpath(_message_path(lint_path)),
+                    [])]
+        (statements, score) = file_stats[os.path.realpath(lint_path)]
+        results[python_file] = LintResult(score, messages, statements)
+        # Only results rated for this very path are cached
+        if python_file in cache_keys and not status & 33:
+            _SCORE_CACHE.put(cache_keys[python_file], {
+                'score': results[python_file].score,
+                'messages': [list(message) for message in messages],
+                'statements': statements,
+                })
+    return results
+
+
+_EARLY_FAIL = False
+
+
+def _configure_early_fail(early_fail):
+    """
+        Stop pylint on a committed file once it can no longer pass, see
+        _run_pylint_early_fail
+    """
+
+    global _EARLY_FAIL
+    _EARLY_FAIL = early_fail
+
+
+def _run_pylint_early_fail(pylint, python_file, fail_below, baselines=None):
+    """Lint python_file like _run_pylint_batch, giving up below fail_below
+
+    pylint's messages are read as it prints them, each followed by the
+    rating pylint gives the file so far, from its own statement count,
+    see pylint_stats. Every message lowers the rating, so once it is
+    below fail_below the file cannot reach it and pylint is killed.
+    Returns the LintResult and whether pylint was stopped, the result of
+    a stopped run holds the messages read so far and their rating, which
+    the whole file cannot exceed. Only complete runs are cached.
+
+    """
+
+    with open(python_file, 'r') as file_handle:
+        source = file_handle.read()
+    if baselines and python_file in baselines:
+        result = _equivalent_result(python_file, source,
+                                    baselines[python_file])
+        if result is not None:
+            return (result, False)
+    if _is_cached(pylint, python_file, source, _BATCH):
+        return (_run_pylint_batch(pylint, [python_file])[python_file], False)
+    command = _stats_command(pylint, 'RunningStatsReporter') + [python_file]
+    env = _pylint_env(command)
+    env['PYTHONUNBUFFERED'] = '1'
+    real_path = os.path.realpath(python_file)
+    messages = []
+    rating = None
+    stopped = False
+    with profiling.span('pylint', 'lint', file=python_file, early_fail=True):
+        try:
+            with open(os.devnull, 'w') as devnull:
+                proc = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                        stderr=devnull, env=env)
+        except OSError:
+            print '\nAn error occurred. Is pylint installed?'
+            sys.exit(1)
+        for line in iter(proc.stdout.readline, ''):
+            message = _parse_messages(line)
+            if message:
+                messages.append(message[0]._replace(path=python_file))
+                continue
+            file_stats = _parse_file_stats(line)
+            if real_path not in file_stats:
+                continue
+            rating = file_stats[real_path]
+            (statements, score) = rating
+            if statements and score < fail_below:
+                proc.kill()
+                stopped = True
+                break
+        proc.stdout.close()
+        status = proc.wait()
+    if rating is None:
+        # pylint rated nothing, a run of its own tells why
+        return (_run_pylint_batch(pylint, [python_file])[python_file], False)
+    result = LintResult(rating[1], messages, rating[0])
+    if not stopped and _SCORE_CACHE is not None and not status & 33:
+        _SCORE_CACHE.put(_lint_cache_key(pylint, python_file, source,
+                         _BATCH), {
+                             'score': result.score,
+                             'messages': [list(message) for message in
+                                          messages],
+                             'statements': result.statements,
+                             })
+    return (result, stopped)
+
+
+def _average_score(scores):
+    """
+        Average the non zero scores, _GIT_PYLINT_MINIMUM_SCORE when
+        there are none
+    """
+
+    scores = [score for score in scores if score]
+    if not scores:
+        return _GIT_PYLINT_MINIMUM_SCORE
+    return sum(scores) / len(scores)
+
+
+def _previous_commit_sha():
+    """
+        SHA of HEAD~1, the empty tree when there is none
+    """
+
+    result = _execute(['git', 'rev-parse', '-q', '--verify', 'HEAD~1'])
+    if result.status:
+        return '4b825dc642cb6eb9a060e54bf8d69288fbee4904'
+    return result.stdout.strip()
+
+
+def _read_hook_config(pylintrc, pylint, pylint_params, limit):
+    """
+        Apply the [pre-commit-hook] options of pylintrc, if it exists, to
+        the pylint command, its params and the limit
+    """
+
+    if os.path.exists(pylintrc):
+        conf = ConfigParser.SafeConfigParser()
+        conf.read(pylintrc)
+        if conf.has_option('pre-commit-hook', 'command'):
+            pylint = conf.get('pre-commit-hook', 'command')
+        if conf.has_option('pre-commit-hook', 'params'):
+            pylint_params += ' ' + conf.get('pre-commit-hook', 'params')
+        if conf.has_option('pre-commit-hook', 'limit'):
+            limit = float(conf.get('pre-commit-hook', 'limit'))
+    return (pylint, pylint_params, limit)
+
+
+def _read_tiers(pylintrc, pylint_params, limit):
+    """The fast and the full Tier of the [pre-commit-hook] options
+
+    pylint_params and limit are those _read_hook_config returns. The fast
+    tier gates commits with fast-params added to the params and its
+    fast-limit, by default the limit. The full tier adds full-params and
+    gives the scores that are uploaded. Returns (fast, full), the fast
+    Tier is None unless pylintrc sets fast-params.
+
+    """
+
+    params = shlex.split(pylint_params or '')
+    fast = None
+    full = Tier(params, limit)
+    if os.path.exists(pylintrc):
+        conf = ConfigParser.SafeConfigParser()
+        conf.read(pylintrc)
+        if conf.has_option('pre-commit-hook', 'full-params'):
+            full = Tier(params + shlex.split(conf.get('pre-commit-hook',
+                                                      'full-params')), limit)
+        if conf.has_option('pre-commit-hook', 'fast-params'):
+            fast = Tier(params + shlex.split(conf.get('pre-commit-hook',
+                                                      'fast-params')), limit)
+            if conf.has_option('pre-commit-hook', 'fast-limit'):
+                fast = fast._replace(limit=float(conf.get('pre-commit-hook',
+                                                          'fast-limit')))
+    return (fast, full)
+
+
 def _get_git_previous_commit():
     """
     Getting last commit SHA
@@ -111,66 +526,923 @@ def _get_git_previous_commit():
 _GIT_PYLINT_MINIMUM_SCORE = 4
 
 
-def _get_prev_score(pylint, python_files, commit_sha='HEAD~1'):
+def get_pylint_score(lint, git_commit_file, source=None):
     """
-        Getting prev commit file score
+        It is giving pylint_score of the file, or of source when given.
     """
 
-    total_score = 0
-    checked_pylint_files = 0
-    avg_score = 0
-    for (python_file, score) in python_files:
-        if is_empty_file(python_file):
-            continue
-        git_commit_file = create_specfic_commit_git_file(python_file,
-                commit_sha)
-        (out, _) = _run_pylint(pylint, git_commit_file)
-        os.remove(git_commit_file)
-        if _parse_score(out):
-            score = _parse_score(out)
-            total_score += score
-            checked_pylint_files += 1
-    if checked_pylint_files:
-        avg_score = total_score / checked_pylint_files
-    if avg_score == 0:
-        avg_score = _GIT_PYLINT_MINIMUM_SCORE
-    return avg_score
+    if source is None:
+        (out, _) = _run_pylint(lint, git_commit_file)
+    else:
+        (out, _) = _run_pylint_blob(lint, git_commit_file, source)
+    return _parse_score(out)
 
 
-def get_pylint_score(lint, git_commit_file):
+def _pylint_env(command=()):
     """
-        It is giving pylint_score of the file.
+        Environment pylint runs with, pylint_stats can be imported in it
+        when the command loads it
     """
 
-    (out, _) = _run_pylint(lint, git_commit_file)
-    return _parse_score(out)
+    penv = os.environ.copy()
+    penv['LANG'] = 'it_IT.UTF-8'
+    penv['LC_CTYPE'] = 'it_IT.UTF-8'
+    penv['LC_COLLATE'] = 'it_IT.UTF-8'
+    if '--load-plugins=' + _STATS_PLUGIN in command:
+        paths = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+        if penv.get('PYTHONPATH'):
+            paths.append(penv['PYTHONPATH'])
+        penv['PYTHONPATH'] = os.pathsep.join(paths)
+    return penv
+
+
+_LINT_SERVER = None
 
 
-def _run_pylint(pylint, python_file, suppress_report=False):
+def _configure_lint_server(socket_path):
     """
-        Run pylint on python_file
+        Send pylint runs to the lint server on socket_path, when one is
+        listening there. None disables it.
     """
-    try:
-        command = [pylint]
 
-        penv = os.environ.copy()
-        penv['LANG'] = 'it_IT.UTF-8'
-        penv['LC_CTYPE'] = 'it_IT.UTF-8'
-        penv['LC_COLLATE'] = 'it_IT.UTF-8'
+    global _LINT_SERVER
+    _LINT_SERVER = socket_path or None
+
+
+def _spawn_pylint(command, stdin_data=None):
+    """Run a pylint command line, feeding it stdin_data if given
+
+    It goes to the lint server when one is configured and listening,
+    otherwise a pylint process is spawned. Returns an ExecutionResult.
+
+    """
+
+    lint_files = [arg for arg in command[1:] if not arg.startswith('-')]
+    span_args = {'files': len(lint_files)}
+    if len(lint_files) == 1:
+        span_args['file'] = git_blobs.original_path(lint_files[0])
+    if _LINT_SERVER and command[0] == 'pylint':
+        with profiling.span('lint server', 'lint', **span_args):
+            response = lint_server.request(command[1:], _LINT_SERVER,
+                                           stdin_data)
+        if response is not None:
+            return ExecutionResult(*response)
+    with profiling.span('pylint', 'lint', **span_args):
+        proc = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, env=_pylint_env(command))
+        (out, err) = proc.communicate(stdin_data)
+    return ExecutionResult(proc.returncode, out, err)
+
+
+_VERSION_REGEXP = re.compile(r'(\d+)\.(\d+)')
+
+
+def _pylint_supports_stdin(pylint):
+    """
+        pylint 2.4 and later can lint source read from stdin
+    """
+
+    match = re.search(_VERSION_REGEXP,
+                      score_cache.linter_version_output(pylint,
+                      cache=_SCORE_CACHE))
+    if not match:
+        return False
+    return (int(match.group(1)), int(match.group(2))) >= (2, 4)
+
+
+_SCORE_CACHE = None
+
+_PYLINT_PARAMS = []
 
+
+def _configure_params(params):
+    """
+        Add the list of params to every pylint run, they are part of the
+        score cache keys
+    """
+
+    global _PYLINT_PARAMS
+    _PYLINT_PARAMS = list(params)
+
+
+def _configure_cache(cache_dir, pylint='pylint',
+                     max_bytes=score_cache.DEFAULT_MAX_BYTES):
+    """
+        Use the score cache in cache_dir for every lint, None disables it
+
+        The pylint version is looked up here, before any worker
+        processes are forked, so they all share it.
+    """
+
+    global _SCORE_CACHE
+    if cache_dir:
+        _SCORE_CACHE = score_cache.ScoreCache(cache_dir, max_bytes)
+        score_cache.linter_version(pylint, cache=_SCORE_CACHE)
+    else:
+        _SCORE_CACHE = None
+
+
+_EQUIVALENCE = equivalence.DEFAULT_POLICY
+
+
+def _configure_equivalence(policy):
+    """
+        Reuse the results of equivalent versions of files under policy,
+        see equivalence.tokens, None lints every version
+    """
+
+    global _EQUIVALENCE
+    _EQUIVALENCE = policy
+
+
+def _equivalent_result(python_file, source, baseline):
+    """The LintResult of an equivalent version of python_file
+
+    baseline is the (source, LintResult) of another version. Its result
+    is returned with the messages moved to the lines of source when both
+    versions are equivalent, None is returned otherwise. Results reused
+    this way are not cached, their key does not cover the policy.
+
+    """
+
+    (baseline_source, result) = baseline
+    if _EQUIVALENCE is None or result is None:
+        return None
+    with profiling.span('equivalence', 'lint', file=python_file):
+        lines = equivalence.line_map(baseline_source, source, _EQUIVALENCE)
+    if lines is None:
+        return None
+    return result._replace(messages=[message._replace(path=python_file,
+                           line=equivalence.remap(lines, message.line))
+                           for message in result.messages])
+
+
+def _baselines(python_files, results, commit_sha='HEAD~1'):
+    """
+        (source, LintResult) at commit_sha of the python_files in results,
+        for _run_pylint_batch
+    """
+
+    if _EQUIVALENCE is None:
+        return None
+    return dict((python_file, (get_commit_file_data(python_file, commit_sha),
+                results[python_file])) for python_file in python_files
+                if python_file in results)
+
+
+def _cached_baselines(pylint, python_files, commit_sha='HEAD~1'):
+    """
+        _baselines of the python_files whose commit_sha version is in the
+        score cache, nothing is linted
+    """
+
+    if _EQUIVALENCE is None or _SCORE_CACHE is None:
+        return None
+    baselines = {}
+    for python_file in python_files:
+        source = get_commit_file_data(python_file, commit_sha)
+        cached = _SCORE_CACHE.get(_lint_cache_key(pylint, python_file,
+                                  source, _BATCH))
+        if cached is not None:
+            baselines[python_file] = (source, LintResult(cached['score'],
+                    [LintMessage(python_file, *message[1:]) for message in
+                     cached['messages']], cached['statements']))
+    return baselines
+
+
+def _open_score_index(index_path, pylint):
+    """
+        The ScoreIndex in index_path of the scores pylint gives with its
+        current configuration, None when index_path is empty
+    """
+
+    if not index_path:
+        return None
+    return score_index.ScoreIndex(index_path, score_cache.config_hash(pylint,
+                                  _PYLINT_PARAMS, _pylint_config_files()) +
+                                  score_cache.linter_version(pylint,
+                                  cache=_SCORE_CACHE))
+
+
+def _tree_blobs(commit_sha, paths):
+    """
+        Blob SHA of every one of paths in commit_sha that exists there,
+        from one git call
+    """
+
+    if not paths:
+        return {}
+    output = _execute(['git', 'ls-tree', '-z', commit_sha, '--'] +
+                      list(paths)).stdout
+    blobs = {}
+    for entry in output.split('\0'):
+        if entry:
+            (info, path) = entry.split('\t', 1)
+            blobs[path] = info.split()[2]
+    return blobs
+
+
+def _pylint_config_files():
+    """
+        Configuration files pylint may pick up on its own
+    """
+
+    return [os.environ.get('PYLINTRC'), 'pylintrc', '.pylintrc',
+            os.path.expanduser('~/.pylintrc'),
+            os.path.expanduser('~/.config/pylintrc'), '/etc/pylintrc']
+
+
+def _lint_cache_key(pylint, python_file, source, *params):
+    """Score cache key for linting source with pylint
+
+    The key covers the blob SHA of the source, the pylint configuration
+    and the pylint version. The basename is part of it as well, since
+    pylint checks module names.
+
+    """
+
+    return _SCORE_CACHE.key(score_cache.blob_sha(source),
+                            os.path.basename(python_file),
+                            score_cache.config_hash(pylint, _PYLINT_PARAMS +
+                            list(params), _pylint_config_files()),
+                            score_cache.linter_version(pylint,
+                            cache=_SCORE_CACHE))
+
+
+def _run_pylint(pylint, python_file, suppress_report=False, source=None):
+    """
+        Run pylint on python_file, unless the score cache has its output
+
+        When source is given pylint reads it from stdin instead of
+        python_file, see _pylint_supports_stdin.
+    """
+    cache_key = None
+    if _SCORE_CACHE is not None and (source is not None or
+                                     os.path.isfile(python_file)):
+        if source is None:
+            with open(python_file, 'r') as file_handle:
+                cache_key = _lint_cache_key(pylint, python_file,
+                        file_handle.read(), 'report', str(suppress_report))
+        else:
+            cache_key = _lint_cache_key(pylint, python_file, source,
+                                        'report', str(suppress_report))
+        cached = _SCORE_CACHE.get(cache_key)
+        if cached is not None:
+            return (cached['output'], '')
+    try:
+        command = [pylint] + _PYLINT_PARAMS
+
+        if source is not None:
+            command.append('--from-stdin')
         command.append(python_file)
 
         if suppress_report:
             command.append('--reports=n')
-        proc = subprocess.Popen(command, stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE, env=penv)
-        (out, _value) = proc.communicate()
+        (status, out, _value) = _spawn_pylint(command, source)
     except OSError:
         print '\nAn error occurred. Is pylint installed?'
         sys.exit(1)
+    if cache_key and not status & 33:
+        _SCORE_CACHE.put(cache_key, {'score': _parse_score(out),
+                         'output': out})
     return (out, _value)
 
 
+def _run_pylint_blob(pylint, lint_file, source, suppress_report=False):
+    """
+        Run pylint on source, the content of lint_file at some commit
+
+        source is piped to pylint when it can read stdin, otherwise it
+        goes through a temporary file on tmpfs.
+    """
+
+    if _pylint_supports_stdin(pylint):
+        return _run_pylint(pylint, lint_file, suppress_report, source)
+    git_commit_file = git_blobs.write_temp_file(lint_file, source)
+    try:
+        return _run_pylint(pylint, git_commit_file, suppress_report)
+    finally:
+        git_blobs.remove_temp_file(git_commit_file)
+
+
+def _new_pool(processes):
+    """Pool of processes workers, each leading its own process group
+
+    The pylint runs a worker starts stay in its group, so _end_pool can
+    kill them with it rather than leave them running on their own.
+
+    """
+
+    return multiprocessing.Pool(processes, os.setpgrp)
+
+
+def _end_pool(pool):
+    """
+        Terminate a pool from _new_pool and whatever its workers started
+    """
+
+    # The group outlives its leader while members are left in it
+    groups = [worker.pid for worker in
+              pool._pool]  # pylint: disable=protected-access
+    pool.terminate()
+    pool.join()
+    for group in groups:
+        try:
+            os.killpg(group, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def _imap_jobs(func, items, jobs):
+    """
+        Map func over items using a pool of jobs processes.
+
+        Results are yielded in the order of items, so callers can print
+        them as they arrive without reordering.
+    """
+
+    if jobs > 1 and len(items) > 1:
+        pool = _new_pool(min(jobs, len(items)))
+        try:
+            for result in pool.imap(func, items):
+                yield result
+            pool.close()
+        finally:
+            _end_pool(pool)
+    else:
+        for item in items:
+            yield func(item)
+
+
+def _imap_jobs_deadline(func, items, jobs, deadline, cached=0):
+    """Map func over items like _imap_jobs, giving up at deadline
+
+    The first cached items have their results in the score cache and are
+    mapped right here, the others go to a pool of jobs processes. No job
+    is started after deadline, the ones still running then are
+    terminated. _DEFERRED is yielded for every item without a result in
+    time.
+
+    """
+
+    for item in items[:cached]:
+        yield func(item)
+    queued = collections.deque(items[cached:])
+    if not queued:
+        return
+    workers = max(1, min(jobs, len(queued)))
+    pool = _new_pool(workers)
+    running = collections.deque()
+    try:
+        while queued or running:
+            while queued and len(running) < workers and \
+                    time.time() < deadline:
+                running.append(pool.apply_async(func, (queued.popleft(), )))
+            if not running:
+                break
+            try:
+                yield running.popleft().get(max(0, deadline - time.time()))
+            except multiprocessing.TimeoutError:
+                yield _DEFERRED
+    finally:
+        _end_pool(pool)
+    for _ in queued:
+        yield _DEFERRED
+
+
+def _is_cached(pylint, python_file, source, *params):
+    """
+        Whether the score cache has the result of linting source
+    """
+
+    return _SCORE_CACHE is not None and _SCORE_CACHE.get(
+        _lint_cache_key(pylint, python_file, source, *params)) is not None
+
+
+def _get_changed_line_counts(commit_sha):
+    """
+        Number of lines added plus deleted in every file of the working
+        tree since commit_sha, from one git call
+    """
+
+    output = _execute(['git', 'diff-index', '--numstat', '-z', '-M',
+                       commit_sha]).stdout
+    return dict((path, insert + delete) for (path, (insert, delete)) in
+                git_push.parse_numstat(output).items())
+
+
+def _prioritize_committed_files(pylint, python_files, diff_aware=False):
+    """Order python_files for a deadline, the most valuable first
+
+    Files whose results are all in the score cache cost nothing and come
+    first, the others follow by the number of lines changed, most first.
+    Returns the ordered python_files and how many of them are cached.
+
+    """
+
+    changed = _get_changed_line_counts(_current_commit())
+    cached = set()
+    for python_file in python_files:
+        with open(python_file, 'r') as file_handle:
+            source = file_handle.read()
+        if diff_aware:
+            if _is_cached(pylint, python_file, source, _BATCH):
+                cached.add(python_file)
+        elif _is_cached(pylint, python_file, source, 'report', str(True)) \
+                and _is_cached(pylint, python_file, get_commit_file_data(
+                    python_file), 'report', str(False)):
+            cached.add(python_file)
+    return (sorted(python_files, key=lambda python_file: (python_file not in
+                   cached, -changed.get(python_file, 0))), len(cached))
+
+
+def _prioritize_lint_jobs(lint_jobs, changes):
+    """
+        Order the (path, blob) keys of the push lint_jobs for a deadline,
+        cached blobs first and then the most changed, returns the keys
+        and how many of them are cached
+    """
+
+    changed = {}
+    for commit_changes in changes.values():
+        for change in commit_changes:
+            changed[(change.path, change.blob)] = change.insert + change.delete
+    cached = set(key for (key, (lint, changed_file, commit)) in
+                 lint_jobs.items() if engines.get(lint).caching and
+                 engines.get(lint).cached(changed_file,
+                 get_commit_file_data(changed_file, commit)))
+    keys = sorted(lint_jobs, key=lambda key: (key not in cached,
+                  -changed.get(key, 0)))
+    return (keys, len(cached))
+
+
+def _check_committed_file(current, previous, limit, report=None):
+    """
+        Judge a file from the LintResult of its current and previous
+        version, the report of a failed file lists all its messages
+        unless one is given
+    """
+
+    file_prev_score = _average_score([previous.score])
+    status = _get_commit_status(current.score, file_prev_score, limit)
+    if report is None:
+        report = '\n'.join(_format_message(message) for message in
+                           current.messages)
+    return CheckedFile(current, previous, status, report)
+
+
+def _lint_previous_versions(pylint, python_files, commit_sha='HEAD~1',
+                            jobs=1):
+    """
+        LintResult of the commit_sha version of every file, from one run
+    """
+
+    prev_dir = create_specfic_commit_git_tree(python_files, commit_sha)
+    try:
+        return _run_pylint_batch(pylint, python_files, root=prev_dir,
+                                 jobs=jobs)
+    finally:
+        shutil.rmtree(prev_dir, ignore_errors=True)
+
+
+def _lint_into_cache(pylint, python_files, commit_sha='HEAD~1'):
+    """
+        Lint python_files and their commit_sha version one by one, the
+        way _lint_committed_file does, so check_repo finds them in the
+        score cache. When commit_sha is None the files are linted the way
+        _lint_committed_files_diff_aware does instead, no previous
+        versions are. Returns the score of every file.
+    """
+
+    scores = {}
+    for python_file in python_files:
+        if commit_sha:
+            (out, _) = _run_pylint(pylint, python_file, suppress_report=True)
+            scores[python_file] = _parse_score(out)
+            _run_pylint_blob(pylint, python_file,
+                             get_commit_file_data(python_file, commit_sha))
+        else:
+            scores[python_file] = _run_pylint_batch(pylint,
+                    [python_file])[python_file].score
+    return scores
+
+
+def _lint_committed_file(job):
+    """
+        Lint a committed file and its previous version for check_repo
+
+        Runs inside a worker process, every version is linted once and
+        judged by the score pylint gives it, the report of a failed file
+        is pylint's output. The previous version is not linted when its
+        score is given, the file is not when it is equivalent to it.
+        Returns a CheckedFile.
+    """
+
+    (pylint, python_file, limit, previous_score) = job
+    try:
+        if _EARLY_FAIL:
+            return _lint_committed_file_early_fail(pylint, python_file,
+                                                   limit, previous_score)
+        previous_source = get_commit_file_data(python_file)
+        if previous_score is None:
+            (out, _) = _run_pylint_blob(pylint, python_file, previous_source)
+            previous_score = _parse_score(out)
+        previous = LintResult(previous_score, [], None)
+        with open(python_file, 'r') as file_handle:
+            source = file_handle.read()
+        if previous_score:
+            # Never fails, it keeps the score of its previous version
+            current = _equivalent_result(python_file, source,
+                                         (previous_source, previous))
+            if current is not None:
+                return _check_committed_file(current, previous, limit)
+        (report, _) = _run_pylint(pylint, python_file, suppress_report=True)
+    except SystemExit:
+        return None
+    return _check_committed_file(LintResult(_parse_score(report), [], None),
+                                 previous, limit, report)
+
+
+def _lint_committed_file_early_fail(pylint, python_file, limit,
+                                    previous_score):
+    """
+        _lint_committed_file with --early-fail, the report of a failed
+        file lists the messages pylint printed
+    """
+
+    if previous_score is not None:
+        previous = LintResult(previous_score, [], None)
+        baselines = None
+    else:
+        previous = _lint_previous_versions(pylint, [python_file])
+        baselines = _baselines([python_file], previous)
+        previous = previous[python_file]
+    (current, stopped) = _run_pylint_early_fail(pylint, python_file,
+            min(float(limit), _average_score([previous.score])), baselines)
+    if stopped:
+        return CheckedFile(current, previous, _STOPPED_EARLY,
+                           '\n'.join(_format_message(message) for message
+                                     in current.messages))
+    return _check_committed_file(current, previous, limit)
+
+
+def _lint_committed_files_batch(pylint, python_files, limit, jobs=1,
+                                commit_sha='HEAD~1', previous_scores=None):
+    """
+        Batch counterpart of _lint_committed_file
+
+        Lints all files in one pylint run and the previous versions whose
+        score is not in previous_scores in another, returns an iterator of
+        CheckedFile in the order of python_files.
+    """
+
+    previous_scores = previous_scores or {}
+    previous = _lint_previous_versions(pylint, [python_file for python_file
+                                       in python_files if python_file not in
+                                       previous_scores], commit_sha, jobs)
+    current = _run_pylint_batch(pylint, python_files, jobs=jobs,
+                                baselines=_baselines(python_files, previous,
+                                                     commit_sha))
+    previous.update((python_file, LintResult(score, [], None)) for
+                    (python_file, score) in previous_scores.items())
+    return iter([_check_committed_file(current[python_file],
+                previous[python_file], limit) for python_file in
+                python_files])
+
+
+_HUNK_REGEXP = re.compile(r'^@@ -\d+(,\d+)? '
+                          r'\+(?P<start>\d+)(,(?P<count>\d+))? @@')
+
+
+def _get_changed_lines(python_files, commit_sha):
+    """Lines of python_files added or changed since commit_sha
+
+    Returns {python_file: set of line numbers in the working tree}, read
+    from one zero-context diff. Unchanged files have no entry.
+
+    """
+
+    with profiling.span('git diff-index', 'git', cmd='diff-index -p -U0'):
+        output = subprocess.check_output(['git', 'diff-index', '-p', '-U0',
+                                          '--no-color', '--no-ext-diff',
+                                          '--src-prefix=a/',
+                                          '--dst-prefix=b/', commit_sha,
+                                          '--'] + list(python_files))
+    changed_lines = {}
+    lines = None
+    for line in output.splitlines():
+        if line.startswith('--- '):
+            lines = None
+        elif line.startswith('+++ '):
+            path = line[4:]
+            if path == '/dev/null':
+                continue
+            lines = changed_lines.setdefault(path[2:], set())
+        elif line.startswith('@@') and lines is not None:
+            match = re.match(_HUNK_REGEXP, line)
+            start = int(match.group('start'))
+            count = int(match.group('count') or 1)
+            lines.update(range(start, start + count))
+    return changed_lines
+
+
+def _lint_committed_files_diff_aware(pylint, python_files, limit, jobs=1,
+                                     batch=False, deadline=None, cached=0):
+    """Diff-aware counterpart of _lint_committed_file
+
+    The previous revision is not linted. A file fails when it is below
+    limit and pylint reports messages on lines the commit adds or
+    changes, its report lists those messages. The previous LintResult is
+    estimated from the messages on unchanged lines and the statement
+    count of the previous version. Returns an iterator of CheckedFile in
+    the order of python_files. With a deadline, see _imap_jobs_deadline,
+    files not linted in time give _DEFERRED.
+    """
+
+    commit_sha = _current_commit()
+    changed_lines = _get_changed_lines(python_files, commit_sha)
+    baselines = _cached_baselines(pylint, python_files, commit_sha) or {}
+    lint_jobs = [(pylint, python_file, baselines.get(python_file))
+                 for python_file in python_files]
+    if deadline is not None:
+        results = _imap_jobs_deadline(_lint_file_messages, lint_jobs, jobs,
+                                      deadline, cached)
+    elif batch:
+        current = _run_pylint_batch(pylint, python_files, jobs=jobs,
+                                    baselines=baselines)
+        results = (current[python_file] for python_file in python_files)
+    else:
+        results = _imap_jobs(_lint_file_messages, lint_jobs, jobs)
+    for (python_file, result) in zip(python_files, results):
+        if result is None or result is _DEFERRED:
+            yield result
+            continue
+        if python_file in changed_lines:
+            lines = changed_lines[python_file]
+            introduced = [message for message in result.messages
+                          if message.line in lines]
+            unchanged = [message for message in result.messages
+                         if message.line not in lines]
+            statements = _count_statements(get_commit_file_data(python_file,
+                                           commit_sha))
+            previous = LintResult(_compute_score(unchanged, statements),
+                                  unchanged, statements)
+        else:
+            introduced = []
+            previous = result
+        status = 'PASSED'
+        if introduced and result.score < float(limit):
+            status = 'FAILED'
+        yield CheckedFile(result, previous, status, '\n'.join(
+            _format_message(message) for message in introduced))
+
+
+def _lint_file_messages(job):
+    """
+        Lint one file for _lint_committed_files_diff_aware in a worker
+        process, returns its LintResult
+    """
+
+    (pylint, python_file, baseline) = job
+    try:
+        return _run_pylint_batch(pylint, [python_file],
+                                 baselines=baseline and {python_file:
+                                 baseline})[python_file]
+    except SystemExit:
+        return None
+
+
+def _get_file_scores_batch(lint_jobs, jobs=1):
+    """
+        Batch counterpart of _score_changed_file
+
+        The (lint, changed_file, commit) jobs are linted in as few runs as
+        possible, one per version of a path that is pushed more than once.
+        Returns an iterator of scores in the order of lint_jobs.
+    """
+
+    lint_jobs = list(lint_jobs)
+    if not lint_jobs:
+        return iter([])
+    lint = lint_jobs[0][0]
+    rounds = []
+    for (index, (_, changed_file, commit)) in enumerate(lint_jobs):
+        for lint_round in rounds:
+            if changed_file not in lint_round:
+                break
+        else:
+            lint_round = {}
+            rounds.append(lint_round)
+        lint_round[changed_file] = (index, commit)
+    scores = [None] * len(lint_jobs)
+    for lint_round in rounds:
+        commit_dir = git_blobs.write_temp_tree(
+            (changed_file, get_commit_file_data(changed_file, commit))
+            for (changed_file, (_, commit)) in lint_round.items())
+        try:
+            results = _run_pylint_batch(lint, list(lint_round),
+                                        root=commit_dir, jobs=jobs)
+        finally:
+            shutil.rmtree(commit_dir, ignore_errors=True)
+        for (changed_file, (index, _)) in lint_round.items():
+            scores[index] = results[changed_file].score
+    return iter(scores)
+
+
+def _fetch_blobs(lint_jobs, blobs):
+    """
+        Put (lint, changed_file, source) for every (lint, changed_file,
+        commit) job on the blobs queue, in order, and None at the end
+    """
+
+    try:
+        for (lint, changed_file, commit) in lint_jobs:
+            blobs.put((lint, changed_file, get_commit_file_data(changed_file,
+                      commit)))
+    finally:
+        blobs.put(None)
+
+
+def _score_blob(job):
+    """
+        Score the source of a changed file, in a worker process
+    """
+
+    (lint, changed_file, source) = job
+    try:
+        return _get_lint_score(lint, changed_file, source)
+    except SystemExit:
+        return None
+
+
+def _pipeline_scores(lint_jobs, jobs=1, depth=None):
+    """Score (lint, changed_file, commit) jobs, overlapping git and lint
+
+    A thread reads the blobs through git cat-file while a pool of jobs
+    processes lints the ones read already. At most depth blobs wait to be
+    linted and depth lint runs wait to be consumed, so memory stays
+    bounded however large the push. Yields the scores in the order of
+    lint_jobs.
+
+    """
+
+    lint_jobs = list(lint_jobs)
+    depth = depth or 2 * max(1, jobs)
+    pool = None
+    if jobs > 1 and len(lint_jobs) > 1:
+        # Fork the workers before the fetcher thread exists
+        pool = _new_pool(min(jobs, len(lint_jobs)))
+    blobs = Queue.Queue(depth)
+    fetcher = threading.Thread(target=_fetch_blobs, args=(lint_jobs, blobs))
+    fetcher.daemon = True
+    fetcher.start()
+    if pool is None:
+        for job in iter(blobs.get, None):
+            yield _score_blob(job)
+        return
+    try:
+        linting = collections.deque()
+        for job in iter(blobs.get, None):
+            linting.append(pool.apply_async(_score_blob, (job, )))
+            if len(linting) >= depth:
+                yield linting.popleft().get()
+        while linting:
+            yield linting.popleft().get()
+        pool.close()
+    finally:
+        _end_pool(pool)
+
+
+def _get_engine_scores_batch(lint_jobs, jobs=1):
+    """
+        Batch counterpart of _pipeline_scores
+
+        Every engine scores its own (lint, changed_file, commit) jobs,
+        batching engines in as few runs as possible, and the engines run
+        side by side. Returns an iterator of scores in the order of
+        lint_jobs.
+    """
+
+    lint_jobs = list(lint_jobs)
+    engine_jobs = collections.OrderedDict()
+    for (index, (lint, changed_file, commit)) in enumerate(lint_jobs):
+        engine_jobs.setdefault(lint, []).append((index, changed_file, commit))
+    scores = [None] * len(lint_jobs)
+
+    def score_engine(lint, indexed_jobs):
+        engine = engines.get(lint)
+        try:
+            if engine.batching:
+                results = engine.score_batch([(changed_file, commit) for
+                                              (_, changed_file, commit) in
+                                              indexed_jobs], jobs)
+            else:
+                results = _pipeline_scores([(lint, changed_file, commit) for
+                                            (_, changed_file, commit) in
+                                            indexed_jobs], jobs)
+            for ((index, _, _), score) in zip(indexed_jobs, results):
+                scores[index] = score
+        except SystemExit:
+            return
+
+    threads = [threading.Thread(target=score_engine, args=item)
+               for item in engine_jobs.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return iter(scores)
+
+
+def _upload_commits(client, uploads, errors):
+    """
+        Post the records lists put on the uploads queue until None, all
+        lists waiting at a time in one go. Stops posting at the first
+        error, which is appended to errors.
+    """
+
+    for records in iter(uploads.get, None):
+        batch = list(records)
+        done = False
+        while True:
+            try:
+                records = uploads.get_nowait()
+            except Queue.Empty:
+                break
+            if records is None:
+                done = True
+                break
+            batch.extend(records)
+        if not errors:
+            try:
+                client.post_commits(batch)
+            except Exception as error:  # pylint: disable=broad-except
+                errors.append(error)
+        if done:
+            return
+
+
+def _score_changed_file(job):
+    """
+        Score a changed file at a given commit for push_commit_score
+    """
+
+    (lint, changed_file, commit) = job
+    try:
+        return _get_file_score(lint, changed_file, commit)
+    except SystemExit:
+        return None
+
+
+def _equivalent_scores(pylint, lint_jobs, changes):
+    """Scores of the pylint jobs of a push equivalent to their base
+
+    The base is the version of the file in the first parent of the
+    commit. Only bases found in the score cache are used, so no base is
+    linted. Returns {(path, blob): score} for the keys of lint_jobs.
+
+    """
+
+    if _EQUIVALENCE is None or _SCORE_CACHE is None:
+        return {}
+    by_key = dict(((change.path, change.blob), change) for commit_changes in
+                  changes.values() for change in commit_changes)
+    scores = {}
+    for (key, (lint, changed_file, commit)) in lint_jobs.items():
+        change = by_key[key]
+        if lint != 'pylint' or change.base_blob == git_push.NULL_SHA or \
+                os.path.basename(change.base_path) != \
+                os.path.basename(changed_file):
+            continue
+        base_source = get_commit_file_data(change.base_path, commit + '^')
+        for params in (('report', str(False)), (_BATCH, )):
+            cached = _SCORE_CACHE.get(_lint_cache_key(pylint,
+                                      change.base_path, base_source,
+                                      *params))
+            if cached is not None:
+                break
+        else:
+            continue
+        with profiling.span('equivalence', 'lint', file=changed_file):
+            if equivalence.line_map(base_source, get_commit_file_data(
+                    changed_file, commit), _EQUIVALENCE) is not None:
+                scores[key] = cached['score']
+    return scores
+
+
+def _get_commit_status(score, file_prev_score, limit):
+    """
+        PASSED if the score did not go down or is above the limit
+    """
+
+    if file_prev_score and score >= file_prev_score:
+        return 'PASSED'
+    elif score >= float(limit):
+        return 'PASSED'
+    return 'FAILED'
+
+
 def _process_git_log_data(git_log_data):
     """
     parse and process git log data 
@@ -184,22 +1456,22 @@ def _process_git_log_data(git_log_data):
 
 def _get_lint_type(filename):
     """
-        Getting type of lint e.g. pylint or golint
+        Getting type of lint e.g. pylint or golint, the name of the engine
+        in use for filename, empty if no engine handles it
     """
 
-    file_ext = filename.split('.')[-1]
-    lint_type = {'py': 'pylint'}
-    return lint_type.get(file_ext, '')
+    engine = engines.engine_for(filename)
+    if engine is None:
+        return ''
+    return engine.name
 
 
-def _get_lint_score(lint, git_commit_file):
+def _get_lint_score(lint, git_commit_file, source=None):
     """
-        Returning lint function.
+        Score git_commit_file, or source when given, with the lint engine
     """
 
-    file_ext = git_commit_file.split('.')[-1]
-    lint_types = {'py': get_pylint_score, 'other': ''}  # 'go' : _get_golint_score
-    return lint_types.get(file_ext, 'other')(lint, git_commit_file)
+    return engines.get(lint).score(git_commit_file, source)
 
 
 def _get_file_score(lint, lint_file, commit_sha='HEAD~1'):
@@ -207,10 +1479,8 @@ def _get_file_score(lint, lint_file, commit_sha='HEAD~1'):
         Get file score
     """
     score = 0.0
-    git_commit_file = create_specfic_commit_git_file(lint_file,
-            commit_sha)
-    score = _get_lint_score(lint, git_commit_file)
-    os.remove(git_commit_file)
+    score = _get_lint_score(lint, lint_file,
+                            get_commit_file_data(lint_file, commit_sha))
     return score
 
 
@@ -238,21 +1508,19 @@ def _get_repo_name():
     return os.path.basename(os.getcwd())
 
 
-def get_insertion_and_deletions(changed_file, commit, prev_commit):
+def get_insertions_and_deletions(base, commit):
     """
-        Get number of insert and delete on a particular commit
+        Number of inserted and deleted lines of every file changed
+        between base and commit, from one git call
     """
-    updates = \
-        run_subprocess('git diff --stat {0}..{1} {2}'.format(commit,
-                       prev_commit, changed_file))
-    updates = re.findall(r'\d+', updates)
-    insert = 0
-    delete = 0
-    if len(updates) > 2:
-        insert = updates[2]
-    if len(updates) > 3:
-        delete = updates[3]
-    return (insert, delete)
+
+    if base == '0000000000000000000000000000000000000000':
+        output = run_subprocess('git diff-tree -r --root --no-commit-id '
+                                '--numstat -z -M %s' % commit)
+    else:
+        output = run_subprocess('git diff --numstat -z -M %s %s'
+                                % (base, commit))
+    return git_push.parse_numstat(output or '')
 
 
 def _get_user(commit):
@@ -262,17 +1530,20 @@ def _get_user(commit):
 
     get_user_cmd = 'git log -1 %s ' % commit
     get_user_cmd += '--format=%ae'
-    user = subprocess.check_output(get_user_cmd.split())
+    with profiling.span('git log', 'git', cmd=get_user_cmd):
+        user = subprocess.check_output(get_user_cmd.split())
     return user.split()[0]
 
 
 def get_commit_file_data(git_file, commit_sha='HEAD~1'):
     """
-    get previous commit git file data
+    get previous commit git file data, empty if it does not exist there
     """
 
-    diff_index_cmd = 'git show %s:%s' % (commit_sha, git_file)
-    return run_subprocess(diff_index_cmd)
+    blob = git_blobs.blob_reader().read(commit_sha, git_file)
+    if blob is None:
+        return ''
+    return blob.data
 
 
 def is_empty_file(python_file):
@@ -289,16 +1560,34 @@ def is_empty_file(python_file):
 def create_specfic_commit_git_file(lint_file, commit_sha):
     """
         Generate specfic commit git file
+
+        Every file gets its own temporary directory on tmpfs, so files
+        sharing a basename can be linted at the same time without
+        clobbering each other, while pylint still sees the original
+        module name.
+    """
+    return git_blobs.write_temp_file(lint_file,
+                                     get_commit_file_data(lint_file,
+                                     commit_sha))
+
+
+def create_specfic_commit_git_tree(lint_files, commit_sha):
+    """
+        Generate specfic commit versions of lint_files under one directory
+
+        Files keep their path relative to the repo root, so they can be
+        linted together with their packages in one run.
     """
-    git_commit_file_name = 'lint_' + commit_sha + lint_file.split('/'
-            )[-1]
-    git_commit_file = '/tmp/' + git_commit_file_name
-    if os.path.isfile(git_commit_file_name):
-        os.remove(git_commit_file_name)
-    f = open(git_commit_file, 'w')
-    f.write(get_commit_file_data(lint_file, commit_sha))
-    f.close()
-    return git_commit_file
+    return git_blobs.write_temp_tree((lint_file,
+            get_commit_file_data(lint_file, commit_sha)) for lint_file in
+            lint_files)
+
+
+def remove_specfic_commit_git_file(git_commit_file):
+    """
+        Remove a file made by create_specfic_commit_git_file
+    """
+    git_blobs.remove_temp_file(git_commit_file)
 
 
 def get_changed_files(base, commit):
@@ -322,33 +1611,46 @@ def run_subprocess(args):
     args = args.split(' ')
     try:
         environ = os.environ.copy()
-        process = subprocess.Popen(args, stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE, env=environ)
-        (stdout, stderr) = process.communicate()
+        with profiling.span(' '.join(args[:2]), 'git', cmd=' '.join(args)):
+            process = subprocess.Popen(args, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, env=environ)
+            (stdout, stderr) = process.communicate()
         status = process.poll()
     except Exception, e:
         print str(e)
     return ExecutionResult(status, stdout, stderr).stdout
 
-def is_commit_already_exist(commit):
+def is_commit_already_exist(commit, client=None):
     """
         Checking commit is passed to git points or not
     """
     from timeit import default_timer as timer
     start_timer = timer()
+    client = client or score_api.ScoreClient()
     try:
-        reponame = _get_repo_name()
-        url_get_commit = 'http://10.70.210.192:4000/api/Commits/%s/%s/isExists' % (commit,reponame)
-        request = urllib2.Request(url_get_commit) 
-        json_data = urllib2.urlopen(url_get_commit).read()
-        commit_data = json.loads(json_data)
-        commit_exists = commit_data.get('isExists', "")
-        if commit_exists:
+        if client.is_commit_already_exist(commit, _get_repo_name()):
             return True, timer()-start_timer
     except Exception as e:
         pass
     return False, timer()-start_timer
 
+def _score_record(commit, user, repo, change, score):
+    """
+        The record uploaded for the score of a FileChange of commit
+    """
+
+    return {
+        'score': score,
+        'commitid': commit,
+        'email': user,
+        'status': _get_status(score),
+        'file': change.path,
+        'repo': repo,
+        'insert': change.insert,
+        'delete': change.delete,
+        }
+
+
 def push_commit_score(
     limit,
     pylint='pylint',
@@ -357,6 +1659,17 @@ def push_commit_score(
     suppress_report=False,
     datfile='/tmp/git.dat',
     scorefile='/tmp/scores.dat',
+    jobs=1,
+    batch=False,
+    cache_dir=None,
+    lint_server_socket=None,
+    upload_timeout=score_api.DEFAULT_TIMEOUT,
+    spool_path=None,
+    deadline=None,
+    engine_names=engines.DEFAULT_ENGINES,
+    golint='golint',
+    equivalence_policy=equivalence.DEFAULT_POLICY,
+    index_path=None,
     ):
     """ Main function doing the checks
 
@@ -370,46 +1683,145 @@ def push_commit_score(
     :param pylint_params: Custom pylint parameters to add to the pylint command
     :type suppress_report: bool
     :param suppress_report: Suppress report if score is below limit
+    :type jobs: int
+    :param jobs: Number of files to lint in parallel
+    :type batch: bool
+    :param batch: Lint all files in a single pylint run
+    :type cache_dir: str
+    :param cache_dir: Directory of the score cache, None disables it
+    :type lint_server_socket: str
+    :param lint_server_socket: Socket of the lint server, None disables it
+    :type upload_timeout: float
+    :param upload_timeout: Seconds to wait for the scoring server
+    :type spool_path: str
+    :param spool_path: Spool scores there and upload them in the background,
+        None uploads them right away
+    :type deadline: float
+    :param deadline: Seconds to lint for, files not linted by then are
+        scored and uploaded by a background job. None waits for all files
+    :type engine_names: list
+    :param engine_names: Engines that score the pushed files, see engines
+    :type golint: str
+    :param golint: Path to golint executable
+    :type equivalence_policy: tuple
+    :param equivalence_policy: Reuse the cached score of the previous
+        version of files equivalent under it, None lints every file
+    :type index_path: str
+    :param index_path: ScoreIndex that pylint scores are looked up in and
+        every pushed commit is recorded in, None disables it
     """
 
-    line = sys.stdin.read()
-    (base, commit, ref) = line.strip().split()
+    started = time.time()
+    (pylint, pylint_params, limit) = _read_hook_config(pylintrc, pylint,
+                                                       pylint_params or '',
+                                                       limit)
+    _configure_params(_read_tiers(pylintrc, pylint_params, limit)[1].params)
+    _configure_cache(cache_dir, pylint)
+    _configure_equivalence(equivalence_policy)
+    engines.configure([(name, {'pylint': pylint, 'golint': golint}[name])
+                      for name in engine_names], cache_dir)
+    _configure_lint_server(lint_server_socket)
 
-    commit_exist, time_taken_by_request = is_commit_already_exist(commit)
-    if commit_exist:
+    updates = git_push.read_ref_updates(sys.stdin)
+
+    # Every commit of every ref update, scored commits are skipped
+
+    from timeit import default_timer as timer
+    start_timer = timer()
+    repo = _get_repo_name()
+    if spool_path:
+        # The server is only talked to by the background flush
+        spool = score_spool.ScoreSpool(spool_path)
+        commit_exist = lambda commit: spool.has_commit(commit, repo)
+    else:
+        client = score_api.ScoreClient(timeout=upload_timeout)
+        commit_exist = lambda commit: \
+            is_commit_already_exist(commit, client)[0]
+    with profiling.span('check commits', 'phase'):
+        push_commits = [push_commit for push_commit in
+                        git_push.push_commits(updates)
+                        if not commit_exist(push_commit.commit)]
+    time_taken_by_request = timer() - start_timer
+    if not push_commits:
         sys.exit(0)
 
-    git_changed_file_name_list = get_changed_files(base, commit)
-    for changed_file in git_changed_file_name_list:
-        commit_info = {}
-        lint = _get_lint_type(changed_file)
-        if lint:
+    commits = [push_commit.commit for push_commit in push_commits]
+    with profiling.span('read changes', 'phase'):
+        changes = git_push.commit_changes(commits)
+        users = git_push.commit_authors(commits)
+
+    # Lint each (path, blob) once, at the first commit that has it
+
+    with profiling.span('classify files', 'phase'):
+        lint_types = classify.classify(
+            [(change.path, change.blob) for commit in commits
+             for change in changes[commit]], commits[-1], _SCORE_CACHE)
+    lint_jobs = collections.OrderedDict()
+    for commit in commits:
+        for change in changes[commit]:
+            lint = lint_types[(change.path, change.blob)]
+            if lint:
+                lint_jobs.setdefault((change.path, change.blob),
+                                     (lint, change.path, commit))
+    blob_scores = _equivalent_scores(pylint, lint_jobs, changes)
+    index = _open_score_index(index_path, pylint)
+    if index is not None:
+        blob_scores.update(index.scores(key for (key, (lint, _, _)) in
+                                        lint_jobs.items() if lint == 'pylint'))
+    for key in blob_scores:
+        del lint_jobs[key]
+    if deadline is not None:
+        (keys, cached) = _prioritize_lint_jobs(lint_jobs, changes)
+        blob_scores.update(zip(keys, _imap_jobs_deadline(_score_changed_file,
+                           [lint_jobs[key] for key in keys], jobs,
+                           started + deadline, cached)))
+    elif batch:
+        file_scores = _get_engine_scores_batch(lint_jobs.values(), jobs)
+    else:
+        file_scores = _pipeline_scores(lint_jobs.values(), jobs)
+    commit_infos = collections.OrderedDict()
+    deferred_changes = []
+
+    # Without a spool the records of each commit are uploaded as soon as
+    # it is scored, while the next commits are linted
+
+    if not spool_path:
+        uploads = Queue.Queue()
+        upload_errors = []
+        uploader = threading.Thread(target=_upload_commits,
+                                    args=(client, uploads, upload_errors))
+        uploader.daemon = True
+        uploader.start()
+    for (base, commit, ref) in push_commits:
+        user = users.get(commit) or _get_user(commit)
+        commit_infos[commit] = []
+        index_files = []
+        if len(push_commits) > 1:
+            print 'Commit {} on {}'.format(commit, ref)
+        for change in changes[commit]:
+            lint = lint_types[(change.path, change.blob)]
+            if not lint:
+                continue
             sys.stdout.write('Processing start\n')
-            sys.stdout.write('pylint on {} \t \n'.format(changed_file))
+            sys.stdout.write('{} on {} \t \n'.format(lint, change.path))
             sys.stdout.flush()
-            file_score = _get_file_score(lint, changed_file, commit)
-
-            # prev_file_score = _get_file_score(lint, changed_file, base)
+            if (change.path, change.blob) not in blob_scores:
+                with profiling.span('score file', 'phase', file=change.path):
+                    blob_scores[(change.path, change.blob)] = \
+                        next(file_scores)
+            file_score = blob_scores[(change.path, change.blob)]
+            if file_score is None:
+                sys.exit(1)
+            if file_score is _DEFERRED:
+                print 'Score : DEFERRED'
+                deferred_changes.append((commit, user, change, lint))
+                continue
 
             commit_score = file_score
-            (insert, delete) = \
-                get_insertion_and_deletions(changed_file, commit, base)
-            user = _get_user(commit)
-            commit_info = {
-                'score': commit_score,
-                'commitid': commit,
-                'email': _get_user(commit),
-                'status': _get_status(commit_score),
-                'file': changed_file,
-                'repo': _get_repo_name(),
-                'insert': insert,
-                'delete': delete,
-                }
-            jsondata = json.dumps(commit_info)
-            url = 'http://10.70.210.192:4000/api/Commits'
-            req = urllib2.Request(url, jsondata)
-            req.add_header('Content-Type', 'application/json')
-            urllib2.urlopen(req).read()
+            commit_infos[commit].append(_score_record(commit, user, repo,
+                                        change, commit_score))
+            if lint == 'pylint':
+                index_files.append((change.path, change.blob, commit_score))
 
             # Add some output
 
@@ -420,6 +1832,211 @@ def push_commit_score(
                         commit_score, commit,
                         _get_status(commit_score), base, time_taken_by_request )) 
 
+        if index is not None and index_files:
+            index.add(index_files)
+            index.update(index_files, user)
+        if not spool_path:
+            uploads.put(commit_infos[commit])
+    if index is not None:
+        index.close()
+
+    if deferred_changes:
+        print 'Deadline of {}s reached, deferred scoring of: {}'.format(
+            deadline, ', '.join(sorted(set(change.path for (_, _, change, _)
+                                           in deferred_changes))))
+        deferred.spawn({
+            'command': 'push',
+            'cwd': os.getcwd(),
+            'pylint': pylint,
+            'engines': engines.configured(),
+            'params': list(_PYLINT_PARAMS),
+            'cache_dir': cache_dir,
+            'lint_server': lint_server_socket,
+            'repo': repo,
+            'changes': deferred_changes,
+            'spool_path': spool_path,
+            'upload_timeout': upload_timeout,
+            'server': score_api.server_address(),
+            })
+
+    # Spool all scores of the push at once
+
+    if spool_path:
+        try:
+            for (commit, infos) in commit_infos.items():
+                spool.append(commit, repo, infos)
+        finally:
+            spool.close()
+        score_spool.spawn_flush(spool_path, upload_timeout)
+        return
+    uploads.put(None)
+    uploader.join()
+    client.close()
+    if upload_errors:
+        raise upload_errors[0]
+
+def backfill_range(
+    rev_range,
+    pylint='pylint',
+    pylintrc='.pylintrc',
+    pylint_params=None,
+    jobs=1,
+    batch=False,
+    cache_dir=None,
+    lint_server_socket=None,
+    upload_timeout=score_api.DEFAULT_TIMEOUT,
+    spool_path=None,
+    engine_names=engines.DEFAULT_ENGINES,
+    golint='golint',
+    equivalence_policy=equivalence.DEFAULT_POLICY,
+    index_path=None,
+    checkpoint_path=None,
+    chunk_size=backfill.DEFAULT_CHUNK_SIZE,
+    ):
+    """ Score and upload every commit of a range of the history
+
+    Commits are scored oldest first, chunk_size at a time, the way the
+    push hook scores them. Each (path, blob) of the range is linted once,
+    by a pool of jobs workers, and the records of a chunk are uploaded
+    together. Once they are spooled or uploaded the checkpoint moves past
+    the chunk, so a backfill run again after it was interrupted starts
+    from there.
+
+    :type rev_range: str
+    :param rev_range: Commits to score, anything git rev-list takes
+    :type pylint: str
+    :param pylint: Path to pylint executable
+    :type pylintrc: str
+    :param pylintrc: Path to pylintrc file
+    :type pylint_params: str
+    :param pylint_params: Custom pylint parameters to add to the pylint command
+    :type jobs: int
+    :param jobs: Number of files to lint in parallel
+    :type batch: bool
+    :param batch: Lint the files of a chunk in as few runs as possible
+    :type cache_dir: str
+    :param cache_dir: Directory of the score cache, None disables it
+    :type lint_server_socket: str
+    :param lint_server_socket: Socket of the lint server, None disables it
+    :type upload_timeout: float
+    :param upload_timeout: Seconds to wait for the scoring server
+    :type spool_path: str
+    :param spool_path: Spool scores there and upload them in the background,
+        None uploads them right away
+    :type engine_names: list
+    :param engine_names: Engines that score the files, see engines
+    :type golint: str
+    :param golint: Path to golint executable
+    :type equivalence_policy: tuple
+    :param equivalence_policy: Reuse the cached score of the previous
+        version of files equivalent under it, None lints every file
+    :type index_path: str
+    :param index_path: ScoreIndex that pylint scores are looked up in and
+        added to, None disables it
+    :type checkpoint_path: str
+    :param checkpoint_path: File of the backfill checkpoints, None always
+        starts over
+    :type chunk_size: int
+    :param chunk_size: Number of commits scored and uploaded together
+    """
+
+    (pylint, pylint_params, limit) = _read_hook_config(pylintrc, pylint,
+                                                       pylint_params or '',
+                                                       0.0)
+    _configure_params(_read_tiers(pylintrc, pylint_params, limit)[1].params)
+    _configure_cache(cache_dir, pylint)
+    _configure_equivalence(equivalence_policy)
+    engines.configure([(name, {'pylint': pylint, 'golint': golint}[name])
+                      for name in engine_names], cache_dir)
+    _configure_lint_server(lint_server_socket)
+
+    with profiling.span('list commits', 'phase'):
+        commits = git_push.range_commits(rev_range)
+    checkpoint = backfill.Checkpoint(checkpoint_path)
+    start = checkpoint.start(rev_range, commits)
+    if start:
+        print 'Resuming {} after {}, {}/{} commits done'.format(
+            rev_range, commits[start - 1], start, len(commits))
+    repo = _get_repo_name()
+    index = _open_score_index(index_path, pylint)
+    if not spool_path:
+        client = score_api.ScoreClient(timeout=upload_timeout)
+
+    # Scores of every (path, blob) of the range, each is linted once
+
+    blob_scores = {}
+    linted = 0
+    try:
+        for chunk_start in range(start, len(commits), chunk_size):
+            chunk = commits[chunk_start:chunk_start + chunk_size]
+            with profiling.span('read changes', 'phase'):
+                changes = git_push.commit_changes(chunk)
+                users = git_push.commit_authors(chunk)
+            with profiling.span('classify files', 'phase'):
+                lint_types = classify.classify(
+                    [(change.path, change.blob) for commit in chunk
+                     for change in changes[commit]], chunk[-1], _SCORE_CACHE)
+            lint_jobs = collections.OrderedDict()
+            for commit in chunk:
+                for change in changes[commit]:
+                    lint = lint_types[(change.path, change.blob)]
+                    if lint and (change.path, change.blob) not in blob_scores:
+                        lint_jobs.setdefault((change.path, change.blob),
+                                             (lint, change.path, commit))
+            found = _equivalent_scores(pylint, lint_jobs, changes)
+            if index is not None:
+                found.update(index.scores(key for (key, (lint, _, _)) in
+                                          lint_jobs.items()
+                                          if lint == 'pylint'))
+            for key in found:
+                del lint_jobs[key]
+            blob_scores.update(found)
+            if batch:
+                file_scores = _get_engine_scores_batch(lint_jobs.values(),
+                                                       jobs)
+            else:
+                file_scores = _pipeline_scores(lint_jobs.values(), jobs)
+            with profiling.span('score files', 'phase', files=len(lint_jobs)):
+                scores = list(file_scores)
+            if None in scores:
+                sys.exit(1)
+            blob_scores.update(zip(lint_jobs, scores))
+            linted += len(lint_jobs)
+            if index is not None:
+                index.add([(path, blob, blob_scores[(path, blob)]) for
+                           ((path, blob), (lint, _, _)) in lint_jobs.items()
+                           if lint == 'pylint'])
+
+            commit_infos = collections.OrderedDict()
+            for commit in chunk:
+                user = users.get(commit) or _get_user(commit)
+                commit_infos[commit] = [
+                    _score_record(commit, user, repo, change,
+                                  blob_scores[(change.path, change.blob)])
+                    for change in changes[commit]
+                    if lint_types[(change.path, change.blob)]]
+            if spool_path:
+                spool = score_spool.ScoreSpool(spool_path)
+                try:
+                    for (commit, infos) in commit_infos.items():
+                        spool.append(commit, repo, infos)
+                finally:
+                    spool.close()
+                score_spool.spawn_flush(spool_path, upload_timeout)
+            else:
+                client.post_commits(info for infos in commit_infos.values()
+                                    for info in infos)
+            checkpoint.save(rev_range, chunk[-1])
+            print 'Scored {}/{} commits of {}, {} files linted'.format(
+                chunk_start + len(chunk), len(commits), rev_range, linted)
+            sys.stdout.flush()
+    finally:
+        if index is not None:
+            index.close()
+        if not spool_path:
+            client.close()
+    return True
+
 def check_repo(
     limit,
     pylint='pylint',
@@ -428,6 +2045,15 @@ def check_repo(
     suppress_report=False,
     datfile='/tmp/git.dat',
     scorefile='/tmp/scores.dat',
+    jobs=1,
+    batch=False,
+    cache_dir=None,
+    lint_server_socket=None,
+    diff_aware=False,
+    deadline=None,
+    equivalence_policy=equivalence.DEFAULT_POLICY,
+    index_path=None,
+    early_fail=False,
     ):
     """ Main function doing the checks
 
@@ -441,8 +2067,36 @@ def check_repo(
     :param pylint_params: Custom pylint parameters to add to the pylint command
     :type suppress_report: bool
     :param suppress_report: Suppress report if score is below limit
+    :type jobs: int
+    :param jobs: Number of files to lint in parallel
+    :type batch: bool
+    :param batch: Lint all files in a single pylint run
+    :type cache_dir: str
+    :param cache_dir: Directory of the score cache, None disables it
+    :type lint_server_socket: str
+    :param lint_server_socket: Socket of the lint server, None disables it
+    :type diff_aware: bool
+    :param diff_aware: Judge files by the messages on changed lines instead
+        of linting the previous revision
+    :type deadline: float
+    :param deadline: Seconds to lint for, files not linted by then are
+        reported as DEFERRED and linted into the score cache by a
+        background job. None waits for all files
+    :type equivalence_policy: tuple
+    :param equivalence_policy: Reuse the results of the previous version
+        of files equivalent under it, None lints every version
+    :type index_path: str
+    :param index_path: ScoreIndex the previous scores are looked up in and
+        the impact is computed from, None lints previous versions and
+        averages the committed files only
+    :type early_fail: bool
+    :param early_fail: Stop pylint on a file once it can no longer pass,
+        its report lists the messages found until then. Does not apply to
+        batch and diff-aware runs
     """
 
+    started = time.time()
+
     # List of checked files and their results
 
     python_files = _get_list_of_committed_python_files()
@@ -460,20 +2114,75 @@ def check_repo(
 
     # Load any pre-commit-hooks options from a .pylintrc file (if there is one)
 
-    if os.path.exists(pylintrc):
-        conf = ConfigParser.SafeConfigParser()
-        conf.read(pylintrc)
-        if conf.has_option('pre-commit-hook', 'command'):
-            pylint = conf.get('pre-commit-hook', 'command')
-        if conf.has_option('pre-commit-hook', 'params'):
-            pylint_params += ' ' + conf.get('pre-commit-hook', 'params')
-        if conf.has_option('pre-commit-hook', 'limit'):
-            limit = float(conf.get('pre-commit-hook', 'limit'))
-
-    # Pylint Python files
+    (pylint, pylint_params, limit) = _read_hook_config(pylintrc, pylint,
+                                                       pylint_params, limit)
+
+    # The fast tier, when there is one, gates the commit and the full tier
+    # is left to a background job
+
+    (fast_tier, full_tier) = _read_tiers(pylintrc, pylint_params, limit)
+    tier = fast_tier or full_tier
+    limit = tier.limit
+    _configure_params(tier.params)
+
+    _configure_cache(cache_dir, pylint)
+    _configure_lint_server(lint_server_socket)
+    _configure_equivalence(equivalence_policy)
+    _configure_early_fail(early_fail)
+
+    # Previous versions the index has a score of are not linted again, the
+    # index only keeps full tier scores
+
+    index = _open_score_index(None if fast_tier else index_path, pylint)
+    previous_blobs = {}
+    previous_scores = {}
+    if index is not None and not diff_aware:
+        previous_blobs = _tree_blobs(_previous_commit_sha(), [python_file
+                                     for (python_file, _) in python_files])
+        previous_scores = dict((python_file, score) for ((python_file, _),
+                               score) in index.scores(
+                               previous_blobs.items()).items())
+
+    # Pylint Python files, in parallel when jobs > 1 or in one run in
+    # batch mode. With a deadline the most valuable files are linted
+    # first, results are still reported in the order of python_files.
+
+    if deadline is not None:
+        (lint_files, cached) = _prioritize_committed_files(pylint, [python_file
+                for (python_file, score) in python_files
+                if not is_empty_file(python_file)], diff_aware)
+        if diff_aware:
+            results = _lint_committed_files_diff_aware(pylint, lint_files,
+                    limit, jobs, deadline=started + deadline, cached=cached)
+        else:
+            results = _imap_jobs_deadline(_lint_committed_file,
+                    [(pylint, python_file, limit,
+                    previous_scores.get(python_file)) for python_file in
+                    lint_files], jobs, started + deadline, cached)
+        checked_files = dict(zip(lint_files, results))
+        results = iter([checked_files[python_file] for (python_file, score)
+                       in python_files if not is_empty_file(python_file)])
+    elif diff_aware:
+        results = _lint_committed_files_diff_aware(pylint, [python_file
+                for (python_file, score) in python_files
+                if not is_empty_file(python_file)], limit, jobs, batch)
+    elif batch:
+        results = _lint_committed_files_batch(pylint, [python_file
+                for (python_file, score) in python_files
+                if not is_empty_file(python_file)], limit, jobs,
+                previous_scores=previous_scores)
+    else:
+        lint_jobs = [(pylint, python_file, limit,
+                      previous_scores.get(python_file))
+                     for (python_file, score) in python_files
+                     if not is_empty_file(python_file)]
+        results = _imap_jobs(_lint_committed_file, lint_jobs, jobs)
 
     i = 1
     n_files = len(python_files)
+    previous_results = []
+    deferred_files = []
+    scored_files = []
     for (python_file, score) in python_files:
 
         # Allow __init__.py files to be completely empty
@@ -491,19 +2200,23 @@ def check_repo(
         sys.stdout.write('Running pylint on {} (file {}/{})..\t'.format(python_file,
                          i, n_files))
         sys.stdout.flush()
-        (out, _) = _run_pylint(pylint, python_file)
+        with profiling.span('score file', 'phase', file=python_file):
+            checked = next(results)
+        if checked is None:
+            sys.exit(1)
+        if checked is _DEFERRED:
+            print _DEFERRED
+            deferred_files.append(python_file)
+            i += 1
+            continue
 
         # Verify the score
 
-        score = _parse_score(out)
-        file_prev_score = _get_prev_score(pylint, [(python_file,
-                score)])
-        if file_prev_score and score >= file_prev_score:
-            status = 'PASSED'
-        elif score >= float(limit):
-            status = 'PASSED'
-        else:
-            status = 'FAILED'
+        score = checked.current.score
+        status = checked.status
+        previous_results.append(checked.previous)
+        scored_files.append((python_file, checked))
+        if status.startswith('FAILED'):
             all_filed_passed = False
 
         total_score += score
@@ -512,27 +2225,233 @@ def check_repo(
 
         print '{:.2}/10.00\t{}'.format(decimal.Decimal(score), status)
         if 'FAILED' in status:
-            (out, _) = _run_pylint(pylint, python_file,
-                                   suppress_report=True)
-            print out
+            print checked.report
 
         # Bump parsed files
 
         i += 1
 
-    user = _get_user()
-
-    prev_score = _get_prev_score(pylint, python_files)
-
-    if 'FAILED' in status:
-        new_score = total_score
+    if deferred_files:
+        print 'Deadline of {}s reached, deferred pylint on: {}'.format(
+            deadline, ', '.join(deferred_files))
+        if cache_dir:
+            deferred.spawn({
+                'command': 'commit',
+                'cwd': os.getcwd(),
+                'pylint': pylint,
+                'cache_dir': cache_dir,
+                'lint_server': lint_server_socket,
+                'params': list(_PYLINT_PARAMS),
+                'files': deferred_files,
+                'commit_sha': None if diff_aware else _previous_commit_sha(),
+                })
+        n_files -= len(deferred_files)
+        if not n_files:
+            return all_filed_passed
+
+    if index is not None:
+        impact = _index_impact(index, scored_files, previous_blobs,
+                               all_filed_passed)
     else:
-        new_score = (total_score + prev_score) / (n_files + 1)
+        prev_score = _average_score(previous.score for previous in
+                                    previous_results)
+
+        if 'FAILED' in status:
+            new_score = total_score
+        else:
+            new_score = (total_score + prev_score) / (n_files + 1)
 
-    impact = new_score - prev_score
+        impact = new_score - prev_score
     total_score = total_score / n_files
 
     print 'Total score ', str(total_score)
     print 'Your score made an impact of ', str(impact)
 
-    return all_filed_passed
\ No newline at end of file
+    if fast_tier and all_filed_passed and scored_files:
+        print 'Fast tier passed, running the full tier in the background'
+        sources = []
+        for (python_file, _) in scored_files:
+            with open(python_file, 'r') as file_handle:
+                sources.append((python_file, file_handle.read()))
+        deferred.spawn({
+            'command': 'full',
+            'cwd': os.getcwd(),
+            'pylint': pylint,
+            'params': full_tier.params,
+            'cache_dir': cache_dir,
+            'lint_server': lint_server_socket,
+            'index_path': index_path,
+            'author': _get_author_email(),
+            'sources': sources,
+            })
+
+    return all_filed_passed
+
+def _index_impact(index, scored_files, previous_blobs, commit):
+    """Impact of the scored (python_file, CheckedFile) pairs on the
+    repository average kept by index
+
+    Scores of both versions are remembered and the previous versions
+    added to the state of the repository when it does not know them yet.
+    When commit is True the scored files become the state of the
+    repository, on behalf of the committing author.
+
+    """
+
+    current_blobs = {}
+    for (python_file, _) in scored_files:
+        with open(python_file, 'r') as file_handle:
+            current_blobs[python_file] = score_cache.blob_sha(
+                file_handle.read())
+    index.add([(python_file, previous_blobs[python_file],
+                checked.previous.score) for (python_file, checked) in
+               scored_files if python_file in previous_blobs] +
+              [(python_file, current_blobs[python_file],
+                checked.current.score) for (python_file, checked) in
+               scored_files if checked.status != _STOPPED_EARLY])
+    index.fill([(python_file, previous_blobs[python_file],
+                 checked.previous.score) for (python_file, checked) in
+                scored_files if python_file in previous_blobs])
+    before = index.average()
+    after = index.average(dict((python_file, checked.current.score) for
+                          (python_file, checked) in scored_files))
+    if commit:
+        index.update([(python_file, current_blobs[python_file],
+                       checked.current.score) for (python_file, checked) in
+                      scored_files], _get_author_email())
+    index.close()
+    if before is None or after is None:
+        return 0.0
+    return after - before
+
+
+def run_deferred(job):
+    """
+        Lint what a hook deferred at its deadline, see deferred.spawn
+
+        Commit jobs fill the score cache, so the next run finds the files
+        scored. Full jobs score the committed sources with the full tier,
+        into the score cache the push hook reads and the score index.
+        Push jobs score the deferred files and upload their records the
+        way the hook would have.
+    """
+
+    os.chdir(job['cwd'])
+    _configure_params(job.get('params', []))
+    if 'server' in job:
+        score_api.configure(job['server'])
+    _configure_cache(job['cache_dir'], job['pylint'])
+    _configure_lint_server(job['lint_server'])
+    if 'engines' in job:
+        engines.configure(job['engines'], job['cache_dir'])
+    if job['command'] == 'commit':
+        _lint_into_cache(job['pylint'], job['files'], job['commit_sha'])
+        return
+    if job['command'] == 'full':
+        scores = [(python_file, score_cache.blob_sha(source),
+                   get_pylint_score(job['pylint'], python_file, source))
+                  for (python_file, source) in job['sources']]
+        index = _open_score_index(job['index_path'], job['pylint'])
+        if index is not None:
+            index.add(scores)
+            index.update(scores, job['author'])
+            index.close()
+        return
+
+    blob_scores = {}
+    commit_infos = collections.OrderedDict()
+    for (commit, user, change, lint) in job['changes']:
+        if (change.path, change.blob) not in blob_scores:
+            blob_scores[(change.path, change.blob)] = _score_changed_file(
+                (lint, change.path, commit))
+        score = blob_scores[(change.path, change.blob)]
+        if score is not None:
+            commit_infos.setdefault(commit, []).append(_score_record(commit,
+                                    user, job['repo'], change, score))
+    if job['spool_path']:
+        spool = score_spool.ScoreSpool(job['spool_path'])
+        try:
+            for (commit, infos) in commit_infos.items():
+                spool.append(commit, job['repo'], infos)
+        finally:
+            spool.close()
+        score_spool.flush(job['spool_path'], job['upload_timeout'])
+        return
+    client = score_api.ScoreClient(timeout=job['upload_timeout'])
+    try:
+        client.post_commits(info for infos in commit_infos.values()
+                            for info in infos)
+    finally:
+        client.close()
+
+
+def watch(
+    pylint='pylint',
+    pylintrc='.pylintrc',
+    cache_dir=score_cache.DEFAULT_CACHE_DIR,
+    lint_server_socket=None,
+    debounce=watcher.DEFAULT_DEBOUNCE,
+    ):
+    """ Score the files of the working tree as they are saved, until killed
+
+    Saved python files are linted at low CPU priority once no further
+    save came in for debounce seconds. Their results, and those of their
+    previous revision, go to the score cache, so check_repo finds them
+    scored already.
+
+    :type pylint: str
+    :param pylint: Path to pylint executable
+    :type pylintrc: str
+    :param pylintrc: Path to pylintrc file
+    :type cache_dir: str
+    :param cache_dir: Directory of the score cache
+    :type lint_server_socket: str
+    :param lint_server_socket: Socket of the lint server, None disables it
+    :type debounce: float
+    :param debounce: Seconds a file must be left alone before it is linted
+    """
+
+    if not cache_dir:
+        print 'watch needs the score cache, --cache-dir is empty'
+        sys.exit(1)
+    root = _execute(['git', 'rev-parse', '--show-toplevel'])
+    if root.status:
+        print 'watch must run inside a git working tree'
+        sys.exit(1)
+    os.chdir(root.stdout.strip())
+    (pylint, pylint_params, limit) = _read_hook_config(pylintrc, pylint, '',
+                                                       0.0)
+
+    # Warm the cache for the tier that gates commits
+
+    (fast_tier, full_tier) = _read_tiers(pylintrc, pylint_params, limit)
+    _configure_params((fast_tier or full_tier).params)
+    _configure_cache(cache_dir, pylint)
+    _configure_lint_server(lint_server_socket)
+    os.nice(watcher.NICENESS)
+
+    try:
+        notifier = watcher.Inotify()
+    except OSError as error:
+        print 'Cannot watch {}: {}'.format(os.getcwd(), error.strerror)
+        sys.exit(1)
+    try:
+        watcher.watch_tree(notifier, '.')
+        print 'Watching {} for changes'.format(os.getcwd())
+        sys.stdout.flush()
+        for saved in watcher.saved_files(notifier, debounce):
+            python_files = []
+            for saved_file in saved:
+                try:
+                    if _is_python_file(saved_file) and \
+                            not is_empty_file(saved_file):
+                        python_files.append(saved_file)
+                except IOError:
+                    continue
+            for (python_file, score) in sorted(_lint_into_cache(pylint,
+                    python_files).items()):
+                print '{:.2}/10.00\t{}'.format(decimal.Decimal(score),
+                                               python_file)
+            sys.stdout.flush()
+    finally:
+        notifier.close()
@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Background job linting the files a hook deferred at its deadline """
+
+import cPickle
+import os
+import subprocess
+import sys
+import tempfile
+
+NICENESS = 10
+
+
+def spawn(job):
+    """Start a detached process that runs job, the hook does not wait for it
+
+    job is a dict handed to commit_hook.run_deferred, pickled to a
+    private temporary file the process removes once it has read it.
+
+    """
+
+    (handle, job_file) = tempfile.mkstemp(prefix='deferred_',
+                                          suffix='.pickle')
+    with os.fdopen(handle, 'wb') as file_handle:
+        cPickle.dump(job, file_handle, cPickle.HIGHEST_PROTOCOL)
+    with open(os.devnull, 'r+') as devnull:
+        subprocess.Popen([sys.executable, '-m', __name__, job_file],
+                         stdin=devnull, stdout=devnull, stderr=devnull,
+                         close_fds=True, preexec_fn=os.setsid)
+
+
+def load(job_file):
+    """
+        Read the job spawn() wrote to job_file and remove the file
+    """
+
+    try:
+        with open(job_file, 'rb') as file_handle:
+            return cPickle.load(file_handle)
+    finally:
+        os.remove(job_file)
+
+
+if __name__ == '__main__':
+    from git_pylint_commit_hook import commit_hook
+    os.nice(NICENESS)
+    commit_hook.run_deferred(load(sys.argv[1]))
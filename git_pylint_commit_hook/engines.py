@@ -0,0 +1,193 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Registry of the linters the push hook scores files with """
+
+import abc
+import collections
+
+from git_pylint_commit_hook import score_cache
+
+DEFAULT_ENGINES = ('pylint', )
+
+
+class Engine(object):
+    """A linter the hooks can score files with
+
+    An engine handles the files ending in one of its extensions, and
+    scripts whose #! line names one of its interpreters. Engines declare
+    what they can do: batching ones lint many files in one run
+    through score_batch(), caching ones keep their results in the score
+    cache and answer cached() without linting. Every engine implements
+    score() and score_batch().
+
+    """
+
+    __metaclass__ = abc.ABCMeta
+
+    name = None
+    extensions = ()
+    interpreters = ()
+    batching = False
+    caching = False
+
+    def __init__(self, command=None, cache_dir=None):
+        self.command = command or self.name
+        self.cache_dir = cache_dir
+
+    def handles(self, path):
+        """
+            Whether path is a file of this engine
+        """
+
+        return path.endswith(self.extensions)
+
+    @abc.abstractmethod
+    def score(self, path, source=None):
+        """
+            Score source, the content of path, or the file path itself
+            when source is None
+        """
+
+    @abc.abstractmethod
+    def score_batch(self, lint_jobs, jobs=1):
+        """
+            Scores of (path, commit) jobs in as few runs as possible, in
+            the order of lint_jobs
+        """
+
+    def cached(self, path, source):
+        """
+            Whether the score of source, the content of path, is cached
+        """
+
+        return False
+
+
+class PylintEngine(Engine):
+    """ Python files, scored by pylint """
+
+    name = 'pylint'
+    extensions = ('.py', )
+    interpreters = ('python', )
+    batching = True
+    caching = True
+
+    def score(self, path, source=None):
+        from git_pylint_commit_hook import commit_hook
+        return commit_hook.get_pylint_score(self.command, path, source)
+
+    def score_batch(self, lint_jobs, jobs=1):
+        from git_pylint_commit_hook import commit_hook
+        return list(commit_hook._get_file_scores_batch(
+            [(self.command, path, commit) for (path, commit) in lint_jobs],
+            jobs))
+
+    def cached(self, path, source):
+        from git_pylint_commit_hook import commit_hook
+        return commit_hook._is_cached(self.command, path, source, 'report',
+                                      str(False))
+
+
+class GolintEngine(Engine):
+    """ Go files, scored by golint """
+
+    name = 'golint'
+    extensions = ('.go', )
+    batching = True
+    caching = True
+
+    def _cache(self):
+        if not self.cache_dir:
+            return None
+        return score_cache.ScoreCache(self.cache_dir)
+
+    def score(self, path, source=None):
+        from git_golint_commit_hook import commit_hook as golint_hook
+        if source is None:
+            with open(path, 'r') as file_handle:
+                source = file_handle.read()
+        return golint_hook.runGolintCached(path, source, self.command,
+                                           self._cache())
+
+    def score_batch(self, lint_jobs, jobs=1):
+        from git_golint_commit_hook import commit_hook as golint_hook
+        lint_jobs = [(path, index, commit,
+                      golint_hook.get_file_content(path, commit))
+                     for (index, (path, commit)) in enumerate(lint_jobs)]
+        scores = golint_hook.runGolintPackages(lint_jobs, self.command,
+                                               self._cache())
+        return [scores[(path, index)] for (path, index, _, _) in lint_jobs]
+
+    def cached(self, path, source):
+        from git_golint_commit_hook import commit_hook as golint_hook
+        cache = self._cache()
+        return cache is not None and cache.get(golint_hook.golintCacheKey(
+            path, source, self.command, cache)) is not None
+
+
+ENGINE_TYPES = collections.OrderedDict((engine.name, engine) for engine in
+                                       (PylintEngine, GolintEngine))
+
+_ENGINES = collections.OrderedDict([('pylint', PylintEngine())])
+
+
+def configure(commands, cache_dir=None):
+    """
+        Use the engines of commands, (name, command) pairs where a None
+        command runs the linter the engine is named after
+    """
+
+    _ENGINES.clear()
+    for (name, command) in commands:
+        _ENGINES[name] = ENGINE_TYPES[name](command, cache_dir)
+
+
+def configured():
+    """
+        The (name, command) pairs of the engines in use
+    """
+
+    return [(engine.name, engine.command) for engine in _ENGINES.values()]
+
+
+def names():
+    """
+        Names of the engines in use
+    """
+
+    return list(_ENGINES)
+
+
+def get(name):
+    """
+        The engine in use called name
+    """
+
+    return _ENGINES[name]
+
+
+def engine_for(path):
+    """
+        The engine in use that handles path, None if there is none
+    """
+
+    for engine in _ENGINES.values():
+        if engine.handles(path):
+            return engine
+    return None
+
+
+def engine_for_first_line(line):
+    """
+        The engine in use for a script starting with line, None if it is
+        no #! line of an interpreter any engine knows
+    """
+
+    if '#!' not in line:
+        return None
+    for engine in _ENGINES.values():
+        for interpreter in engine.interpreters:
+            if interpreter in line:
+                return engine
+    return None
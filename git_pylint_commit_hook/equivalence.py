@@ -0,0 +1,141 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Tell whether two versions of a Python file lint the same """
+
+import ast
+import re
+import tokenize
+from StringIO import StringIO
+
+# What a policy may leave out of the comparison, on top of blank lines
+POLICIES = ('comments', 'docstrings', 'whitespace')
+
+DEFAULT_POLICY = ()
+
+# Comments pylint reads, kept whatever the policy
+_PYLINT_COMMENT_REGEXP = re.compile(r'pylint\s*:|\b(FIXME|XXX|TODO)\b')
+
+_STATEMENT_START = (tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT)
+
+
+def parse_policy(text):
+    """Policy from a comma separated list of POLICIES
+
+    Returns None for 'off', which disables the equivalence check. Raises
+    ValueError for unknown names.
+
+    """
+
+    names = [name.strip() for name in (text or '').split(',')
+             if name.strip()]
+    if names == ['off']:
+        return None
+    for name in names:
+        if name not in POLICIES:
+            raise ValueError('unknown equivalence policy {}'.format(name))
+    return tuple(sorted(set(names)))
+
+
+def _docstring_token(string):
+    """
+        What is left of a string statement under the docstrings policy,
+        whether it is empty decides pylint's empty-docstring
+    """
+
+    try:
+        return ('DOCSTRING', bool(ast.literal_eval(string).strip()))
+    except (SyntaxError, ValueError):
+        return ('DOCSTRING', string)
+
+
+def tokens(source, policy=DEFAULT_POLICY):
+    """Tokens of source pylint's verdict depends on under policy
+
+    Blank lines never matter, 'comments' drops comments except pylint
+    pragmas and notes, 'docstrings' drops the text of string statements,
+    'whitespace' drops the spacing inside lines. Returns a list of
+    (token, start line, end line), None when source does not tokenize.
+
+    """
+
+    result = []
+    try:
+        token_list = list(tokenize.generate_tokens(StringIO(source).readline))
+    except (tokenize.TokenError, IndentationError):
+        return None
+    previous_type = tokenize.NEWLINE
+    previous = None
+    for (index, (token_type, string, start, end, _)) in enumerate(token_list):
+        statement_start = previous_type in _STATEMENT_START
+        if token_type not in (tokenize.NL, tokenize.COMMENT):
+            previous_type = token_type
+        after_comment = previous == tokenize.COMMENT
+        previous = token_type
+        if token_type == tokenize.ENDMARKER or \
+                token_type == tokenize.NL and start[1] == 0:
+            continue
+        if 'comments' in policy:
+            if token_type == tokenize.COMMENT and \
+                    not _PYLINT_COMMENT_REGEXP.search(string):
+                continue
+            if after_comment and token_type == tokenize.NL:
+                continue
+            if token_type in (tokenize.NEWLINE, tokenize.NL):
+                # Where a line ends depends on its comment
+                start = (start[0], None)
+        if token_type == tokenize.STRING and 'docstrings' in policy and \
+                statement_start and index + 1 < len(token_list) and \
+                token_list[index + 1][0] == tokenize.NEWLINE:
+            token = _docstring_token(string)
+        elif 'whitespace' in policy:
+            if token_type == tokenize.NL:
+                continue
+            token = (token_type, string.strip())
+        else:
+            token = (token_type, string, start[1])
+        result.append((token, start[0], end[0]))
+
+    # pylint checks the newlines at the end of the file itself
+
+    result.append((('END', source.endswith('\n'),
+                    source.rstrip(' \t\r\n') + '\n' != source), 0, 0))
+    return result
+
+
+def line_map(old_source, new_source, policy=DEFAULT_POLICY):
+    """Map the lines of old_source to those of new_source
+
+    Returns {old line: new line} when both sources are equivalent under
+    policy, None when they are not.
+
+    """
+
+    if policy is None:
+        return None
+    old_tokens = tokens(old_source, policy)
+    new_tokens = tokens(new_source, policy)
+    if old_tokens is None or new_tokens is None or \
+            [token for (token, _, _) in old_tokens] != \
+            [token for (token, _, _) in new_tokens]:
+        return None
+    lines = {}
+    for ((_, old_start, old_end), (_, new_start, _)) in zip(old_tokens,
+                                                          new_tokens):
+        for line in range(old_start, old_end + 1):
+            lines.setdefault(line, new_start + line - old_start)
+    return lines
+
+
+def remap(lines, line):
+    """
+        The new line of the old line, shifted like the closest line above
+        it with a token when it has none itself
+    """
+
+    if line in lines:
+        return lines[line]
+    above = [old for old in lines if 0 < old < line]
+    if not above:
+        return line
+    return lines[max(above)] + line - max(above)
@@ -0,0 +1,183 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Read git blobs through one long running `git cat-file --batch` """
+
+import atexit
+import collections
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from git_pylint_commit_hook import profiling
+
+Blob = collections.namedtuple('Blob', 'sha, data')
+
+
+def _tmpfs_dir():
+    """
+        Directory for temporary files, /dev/shm when it is usable
+    """
+
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+TMPFS_DIR = _tmpfs_dir()
+
+
+class BlobReader(object):
+    """Read blobs through one `git cat-file --batch` process
+
+    The process is started on the first read and kept open until
+    close(), so reading N blobs costs one git process instead of N.
+
+    """
+
+    def __init__(self):
+        self._proc = None
+        self._lock = threading.Lock()
+
+    def _process(self):
+        if self._proc is None:
+            self._proc = subprocess.Popen(['git', 'cat-file', '--batch'],
+                                          stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE)
+        return self._proc
+
+    def read(self, rev, path):
+        """
+            Returns the Blob of path at rev, None if it does not exist
+        """
+
+        with self._lock, profiling.span('git cat-file', 'git', file=path,
+                                        rev=rev):
+            proc = self._process()
+            proc.stdin.write('%s:%s\n' % (rev, path))
+            proc.stdin.flush()
+            header = proc.stdout.readline().split()
+            if len(header) != 3:
+                return None
+            (sha, kind, size) = header
+            data = proc.stdout.read(int(size))
+            proc.stdout.read(1)
+        if kind != 'blob':
+            return None
+        return Blob(sha, data)
+
+    def read_head(self, obj, size):
+        """Returns the first size bytes of the blob obj, a SHA or rev:path,
+        None if it is no blob
+
+        git cannot send part of a blob, the rest is read off the pipe in
+        chunks and dropped, so large blobs never sit in memory.
+
+        """
+
+        with self._lock, profiling.span('git cat-file', 'git', obj=obj):
+            proc = self._process()
+            proc.stdin.write(obj + '\n')
+            proc.stdin.flush()
+            header = proc.stdout.readline().split()
+            if len(header) != 3:
+                return None
+            (_, kind, total) = header
+            head = proc.stdout.read(min(size, int(total)))
+            remaining = int(total) - len(head)
+            while remaining > 0:
+                remaining -= len(proc.stdout.read(min(remaining, 64 * 1024)))
+            proc.stdout.read(1)
+        if kind != 'blob':
+            return None
+        return head
+
+    def close(self):
+        """
+            Stop the git process
+        """
+
+        with self._lock:
+            if self._proc is not None:
+                self._proc.stdin.close()
+                self._proc.wait()
+                self._proc = None
+
+
+_READERS = {}
+
+
+def blob_reader():
+    """
+        The BlobReader of this process, forked workers get their own
+    """
+
+    pid = os.getpid()
+    if pid not in _READERS:
+        _READERS.clear()
+        _READERS[pid] = BlobReader()
+        atexit.register(_READERS[pid].close)
+    return _READERS[pid]
+
+
+def make_temp_dir():
+    """
+        A new private directory on tmpfs
+    """
+
+    return tempfile.mkdtemp(prefix='lint_', dir=TMPFS_DIR)
+
+
+def original_path(path):
+    """
+        The path a file written by write_temp_file or write_temp_tree
+        stands for, other paths are returned unchanged
+    """
+
+    relative_path = os.path.relpath(os.path.abspath(path), TMPFS_DIR)
+    if not relative_path.startswith('lint_'):
+        return path
+    return relative_path.split(os.sep, 1)[-1]
+
+
+def write_temp_file(path, data):
+    """Write data to a temporary file named like path
+
+    Every file gets its own directory, so files sharing a basename never
+    collide and linters still see the original file name.
+
+    """
+
+    with profiling.span('write temp file', 'io', file=path, bytes=len(data)):
+        temp_file = os.path.join(make_temp_dir(), os.path.basename(path))
+        with open(temp_file, 'w') as file_handle:
+            file_handle.write(data)
+    return temp_file
+
+
+def write_temp_tree(files):
+    """
+        Write (path, data) pairs under one temporary directory, keeping
+        their relative paths, returns the directory
+    """
+
+    temp_dir = make_temp_dir()
+    for (path, data) in files:
+        with profiling.span('write temp file', 'io', file=path,
+                            bytes=len(data)):
+            temp_file = os.path.join(temp_dir, path)
+            if not os.path.isdir(os.path.dirname(temp_file)):
+                os.makedirs(os.path.dirname(temp_file))
+            with open(temp_file, 'w') as file_handle:
+                file_handle.write(data)
+    return temp_dir
+
+
+def remove_temp_file(temp_file):
+    """
+        Remove a file made by write_temp_file
+    """
+
+    shutil.rmtree(os.path.dirname(temp_file), ignore_errors=True)
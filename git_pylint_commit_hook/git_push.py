@@ -0,0 +1,189 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Enumerate the new commits and changed blobs of a push """
+
+import collections
+import re
+import subprocess
+
+from git_pylint_commit_hook import profiling
+
+NULL_SHA = '0' * 40
+
+RefUpdate = collections.namedtuple('RefUpdate', 'base, commit, ref')
+
+FileChange = collections.namedtuple('FileChange',
+                                    'path, blob, insert, delete, '
+                                    'base_path, base_blob')
+
+_SHA_REGEXP = re.compile(r'^[0-9a-f]{40}$')
+
+
+def _git(args, stdin_data=None):
+    """
+        Output of a git command, empty if it fails
+    """
+
+    with profiling.span(' '.join(args[:2]), 'git', cmd=' '.join(args)):
+        process = subprocess.Popen(args, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        (stdout, _) = process.communicate(stdin_data)
+    if process.returncode:
+        return ''
+    return stdout
+
+
+def read_ref_updates(stream):
+    """
+        All `base commit ref` lines a pre/post-receive hook gets on stdin
+    """
+
+    updates = []
+    for line in stream:
+        fields = line.split()
+        if len(fields) == 3:
+            updates.append(RefUpdate(*fields))
+    return updates
+
+
+def push_commits(updates):
+    """Every commit the ref updates bring in, oldest first and each once
+
+    Returns a RefUpdate per commit, carrying the base and ref of the
+    first update that reached it. An updated ref brings in base..commit,
+    a new ref only its tip, like the hooks always scored it. Deleted refs
+    bring nothing.
+
+    """
+
+    seen = set()
+    commits = []
+    for update in updates:
+        if update.commit == NULL_SHA:
+            continue
+        if update.base == NULL_SHA:
+            revs = _git(['git', 'rev-parse', '-q', '--verify',
+                         update.commit + '^{commit}'])
+        else:
+            revs = _git(['git', 'rev-list', '--reverse',
+                         '%s..%s' % (update.base, update.commit)])
+        for rev in revs.split():
+            if rev not in seen:
+                seen.add(rev)
+                commits.append(RefUpdate(update.base, rev, update.ref))
+    return commits
+
+
+def range_commits(rev_range):
+    """
+        Every commit of rev_range, anything git rev-list takes like A..B,
+        oldest first
+    """
+
+    return _git(['git', 'rev-list', '--reverse', rev_range]).split()
+
+
+def parse_numstat(output):
+    """
+        Parse `git diff --numstat -z` output into {path: (insert, delete)},
+        binary files count as (0, 0) and renames are keyed by their new path
+    """
+
+    table = {}
+    fields = output.split('\0')
+    i = 0
+    while i < len(fields):
+        counts = fields[i].split('\t')
+        i += 1
+        if len(counts) != 3:
+            continue
+        (insert, delete, path) = counts
+        if not path:
+            # A rename, followed by its old and new path
+            path = fields[i + 1]
+            i += 2
+        if insert == '-' or delete == '-':
+            table[path] = (0, 0)
+        else:
+            table[path] = (int(insert), int(delete))
+    return table
+
+
+def _parse_diff_tree(output):
+    """
+        Parse `git diff-tree --stdin -z --raw --numstat` output into
+        {commit: [FileChange]}, deleted files are left out. The base
+        blob of an added file is the null SHA.
+    """
+
+    changes = {}
+    tokens = output.split('\0')
+    (commit, blobs, numstat) = (None, [], [])
+
+    def finish():
+        if commit is not None:
+            counts = parse_numstat('\0'.join(numstat))
+            changes[commit] = [FileChange(path, blob,
+                                          *(counts.get(path, (0, 0)) +
+                                            base))
+                               for (path, blob, base) in blobs]
+
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        i += 1
+        if token.startswith(':'):
+            (_, _, base_blob, blob, status) = token[1:].split()
+            if status[0] in 'RC':
+                (base_path, path) = tokens[i:i + 2]
+                i += 2
+            else:
+                base_path = path = tokens[i]
+                i += 1
+            if status != 'D':
+                blobs.append((path, blob, (base_path, base_blob)))
+        elif '\t' in token:
+            numstat.append(token)
+            if token.endswith('\t'):
+                numstat.extend(tokens[i:i + 2])
+                i += 2
+        elif re.match(_SHA_REGEXP, token):
+            finish()
+            (commit, blobs, numstat) = (token, [], [])
+    finish()
+    return changes
+
+
+def commit_changes(commits):
+    """
+        The files every commit changed against its first parent, as
+        {commit: [FileChange]}, read with one git call
+    """
+
+    if not commits:
+        return {}
+    output = _git(['git', 'diff-tree', '--stdin', '-r', '--root', '-z', '-M',
+                   '--raw', '--numstat'], ''.join(commit + '\n' for commit in
+                                                  commits))
+    changes = _parse_diff_tree(output)
+    for commit in commits:
+        changes.setdefault(commit, [])
+    return changes
+
+
+def commit_authors(commits):
+    """
+        Author email of every commit, read with one git call
+    """
+
+    if not commits:
+        return {}
+    output = _git(['git', 'log', '--no-walk=unsorted', '--format=%H %ae'] +
+                  list(commits))
+    authors = {}
+    for line in output.splitlines():
+        (commit, _, email) = line.partition(' ')
+        authors[commit] = email
+    return authors
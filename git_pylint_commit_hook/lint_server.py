@@ -0,0 +1,288 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Long-lived pylint server, keeps pylint and astroid's cache warm """
+
+import collections
+import errno
+import json
+import os
+import socket
+import sys
+from StringIO import StringIO
+
+DEFAULT_SOCKET = '/tmp/git-pylint-commit-hook-%d.sock' % os.getuid()
+
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+
+DEFAULT_MAX_MEMORY = 1024
+
+_CONNECT_TIMEOUT = 1.0
+
+LintResponse = collections.namedtuple('LintResponse',
+        'status, stdout, stderr')
+
+
+def _read_all(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return ''.join(chunks)
+        chunks.append(chunk)
+
+
+def request(args, socket_path=DEFAULT_SOCKET, stdin_data=None):
+    """Run pylint with args on the lint server, stdin_data is what it
+    reads from stdin
+
+    Returns a LintResponse, or None when no server is listening on
+    socket_path so the caller can run pylint itself.
+
+    """
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(_CONNECT_TIMEOUT)
+        try:
+            sock.connect(socket_path)
+        except socket.error:
+            return None
+        sock.settimeout(None)
+        try:
+            sock.sendall(json.dumps({'args': list(args),
+                                     'cwd': os.getcwd(),
+                                     'stdin': stdin_data}))
+            sock.shutdown(socket.SHUT_WR)
+            response = json.loads(_read_all(sock))
+        except (socket.error, ValueError):
+            return None
+    finally:
+        sock.close()
+    if 'error' in response:
+        return None
+    return LintResponse(response['status'],
+                        response['stdout'].encode('utf-8'),
+                        response['stderr'].encode('utf-8'))
+
+
+def _text(value):
+    """
+        pylint output as unicode, ready for json
+    """
+
+    if isinstance(value, unicode):
+        return value
+    return value.decode('utf-8', 'replace')
+
+
+def _rss_megabytes():
+    """
+        Resident memory of this process in MB
+    """
+
+    try:
+        with open('/proc/self/status', 'r') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except IOError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LintServer(object):
+    """Serve pylint runs over a Unix socket
+
+    Requests are handled one at a time in this process, so astroid's
+    module cache is reused across hook invocations. Cached modules whose
+    file changed on disk are dropped before every run. The server
+    restarts itself once it grows over max_memory MB and shuts down
+    after idle_timeout seconds without requests.
+
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 max_memory=DEFAULT_MAX_MEMORY):
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.max_memory = max_memory
+        self._mtimes = {}
+
+    def _invalidate(self, lint_paths):
+        """
+            Drop cached modules that changed on disk or are being linted
+        """
+
+        from astroid import MANAGER
+        lint_paths = set(os.path.abspath(path) for path in lint_paths)
+        invalidated = False
+        for (modname, module) in MANAGER.astroid_cache.items():
+            module_file = getattr(module, 'file', None)
+            if not module_file:
+                continue
+            module_file = os.path.abspath(module_file)
+            try:
+                stat = os.stat(module_file)
+                mtime = (stat.st_mtime, stat.st_size)
+            except OSError:
+                mtime = None
+            if module_file in lint_paths or mtime is None or \
+                    self._mtimes.setdefault(module_file, mtime) != mtime:
+                del MANAGER.astroid_cache[modname]
+                self._mtimes.pop(module_file, None)
+                invalidated = True
+        if invalidated:
+            MANAGER._mod_file_cache.clear()
+
+    def _record(self):
+        """
+            Remember the mtime of modules astroid cached in the last run
+        """
+
+        from astroid import MANAGER
+        for module in MANAGER.astroid_cache.values():
+            module_file = getattr(module, 'file', None)
+            if not module_file:
+                continue
+            module_file = os.path.abspath(module_file)
+            if module_file in self._mtimes:
+                continue
+            try:
+                stat = os.stat(module_file)
+            except OSError:
+                continue
+            self._mtimes[module_file] = (stat.st_mtime, stat.st_size)
+
+    def _lint(self, args, cwd, stdin_data=None):
+        """
+            Run pylint in this process, returns (status, stdout, stderr)
+        """
+
+        from pylint import lint
+
+        # pylint's own worker processes would start with a cold cache
+        args = [arg for arg in args if not arg.startswith('--jobs')]
+        os.chdir(cwd)
+        (stdin, stdout, stderr) = (sys.stdin, sys.stdout, sys.stderr)
+        sys.stdin = StringIO(stdin_data or '')
+        sys.stdout = StringIO()
+        sys.stderr = StringIO()
+        status = 0
+        try:
+            self._invalidate(arg for arg in args if not arg.startswith('-'))
+            try:
+                run = lint.Run(list(args), exit=False)
+                status = run.linter.msg_status
+            except SystemExit as error:
+                status = error.code or 0
+            self._record()
+            return (status, sys.stdout.getvalue(), sys.stderr.getvalue())
+        finally:
+            os.chdir('/')
+            (sys.stdin, sys.stdout, sys.stderr) = (stdin, stdout, stderr)
+
+    def _bind(self):
+        """
+            Listen on socket_path, returns None if a server already is
+        """
+
+        if request_alive(self.socket_path):
+            return None
+        try:
+            os.remove(self.socket_path)
+        except OSError as error:
+            if error.errno != errno.ENOENT:
+                raise
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            sock.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        sock.listen(16)
+        sock.settimeout(self.idle_timeout)
+        return sock
+
+    def serve_forever(self):
+        """
+            Handle requests until idle or over the memory ceiling
+        """
+
+        # Import pylint up front, that is the warm-up the server is for
+        from pylint import lint  # pylint: disable=unused-variable
+
+        sock = self._bind()
+        if sock is None:
+            print 'A lint server is already listening on', self.socket_path
+            return
+
+        # Requests chdir to their own directory, stay out of the way of
+        # directories that get removed in between
+        argv = [os.path.abspath(sys.argv[0])] + sys.argv[1:]
+        os.chdir('/')
+        restart = False
+        try:
+            while not restart:
+                try:
+                    (conn, _) = sock.accept()
+                except socket.timeout:
+                    break
+                try:
+                    conn.settimeout(None)
+                    payload = json.loads(_read_all(conn))
+                    if payload.get('ping'):
+                        response = {'status': 0, 'stdout': '', 'stderr': ''}
+                    else:
+                        try:
+                            (status, out, err) = \
+                                self._lint(payload['args'], payload['cwd'],
+                                           payload.get('stdin'))
+                            response = {'status': status,
+                                        'stdout': _text(out),
+                                        'stderr': _text(err)}
+                        except Exception as error:  # pylint: disable=broad-except
+                            response = {'error': str(error)}
+                    conn.sendall(json.dumps(response))
+                except (socket.error, ValueError, KeyError):
+                    pass
+                finally:
+                    conn.close()
+                restart = _rss_megabytes() > self.max_memory
+        finally:
+            sock.close()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+        if restart:
+            os.execv(sys.executable, [sys.executable] + argv)
+
+
+def request_alive(socket_path=DEFAULT_SOCKET):
+    """
+        Whether a lint server answers on socket_path
+    """
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(_CONNECT_TIMEOUT)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps({'ping': True}))
+        sock.shutdown(socket.SHUT_WR)
+        return bool(_read_all(sock))
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+
+
+def serve(socket_path=DEFAULT_SOCKET, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+          max_memory=DEFAULT_MAX_MEMORY):
+    """
+        Run a lint server in the foreground
+    """
+
+    LintServer(socket_path, idle_timeout, max_memory).serve_forever()
@@ -0,0 +1,148 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Per-phase timing of hook runs in Chrome trace-event format """
+
+import collections
+import contextlib
+import glob
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+_TRACE_FILE = None
+
+_START = None
+
+
+def enable(trace_file):
+    """Record spans from now on, finish() writes them to trace_file
+
+    Every process, forked workers included, appends its events to its
+    own file next to trace_file, so nothing is lost when a worker is
+    terminated.
+
+    """
+
+    global _TRACE_FILE, _START
+    _TRACE_FILE = os.path.abspath(trace_file)
+    _START = time.time()
+    shutil.rmtree(_parts_dir(), ignore_errors=True)
+    os.makedirs(_parts_dir())
+
+
+def enabled():
+    """
+        Whether spans are being recorded
+    """
+
+    return _TRACE_FILE is not None
+
+
+def _parts_dir():
+    return _TRACE_FILE + '.parts'
+
+
+def _record(event):
+    path = os.path.join(_parts_dir(), '{}.jsonl'.format(os.getpid()))
+    with open(path, 'a') as file_handle:
+        file_handle.write(json.dumps(event) + '\n')
+
+
+@contextlib.contextmanager
+def span(name, category, **args):
+    """
+        Time the enclosed block as a span of category, args end up in
+        the trace, a 'file' argument in the slowest files summary
+    """
+
+    if _TRACE_FILE is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        _record({'name': name, 'cat': category, 'ph': 'X',
+                 'ts': int((start - _START) * 1e6),
+                 'dur': int((time.time() - start) * 1e6),
+                 'pid': os.getpid(), 'tid': threading.current_thread().ident,
+                 'args': args})
+
+
+def _load_events():
+    events = []
+    for path in sorted(glob.glob(os.path.join(_parts_dir(), '*.jsonl'))):
+        with open(path, 'r') as file_handle:
+            for line in file_handle:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+    return events
+
+
+def finish(out=sys.stderr, top=10):
+    """
+        Write the trace file and print the slowest phases and files
+    """
+
+    global _TRACE_FILE
+    if _TRACE_FILE is None:
+        return
+    events = _load_events()
+    shutil.rmtree(_parts_dir(), ignore_errors=True)
+    main_pid = os.getpid()
+    for pid in set(event['pid'] for event in events):
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                       'args': {'name': 'hook' if pid == main_pid
+                                else 'worker {}'.format(pid)}})
+    with open(_TRACE_FILE, 'w') as file_handle:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'},
+                  file_handle)
+    print_summary(_TRACE_FILE, [event for event in events
+                  if event['ph'] == 'X'], out, top)
+    _TRACE_FILE = None
+
+
+def print_summary(trace_file, events, out=sys.stderr, top=10):
+    """
+        Print the total time of every phase and of the slowest files
+    """
+
+    phases = collections.defaultdict(lambda: [0, 0])
+    files = collections.defaultdict(lambda: [0, 0])
+    # End of the last span counted for a file on a thread, spans on one
+    # thread are nested or apart, those starting before it are inside it
+    file_ends = {}
+    for event in sorted(events, key=lambda event: (
+            event['pid'], event['tid'], event['ts'], -event['dur'])):
+        phase = phases[(event['cat'], event['name'])]
+        phase[0] += 1
+        phase[1] += event['dur']
+        if 'file' in event['args']:
+            key = (event['pid'], event['tid'], event['args']['file'])
+            if event['ts'] < file_ends.get(key, -1):
+                continue
+            file_ends[key] = event['ts'] + event['dur']
+            lint_file = files[event['args']['file']]
+            lint_file[0] += 1
+            lint_file[1] += event['dur']
+
+    out.write('\nProfile written to {}\n'.format(trace_file))
+    out.write('{:12s} {:28s} {:>6s} {:>10s}\n'.format('category', 'phase',
+                                                      'calls', 'total ms'))
+    for ((category, name), (calls, total)) in sorted(
+            phases.items(), key=lambda item: -item[1][1])[:top]:
+        out.write('{:12s} {:28s} {:>6d} {:>10.1f}\n'.format(
+            category, name[:28], calls, total / 1000.0))
+    if files:
+        out.write('{:41s} {:>6s} {:>10s}\n'.format('slowest files', 'spans',
+                                                   'total ms'))
+        for (lint_file, (calls, total)) in sorted(
+                files.items(), key=lambda item: -item[1][1])[:top]:
+            out.write('{:41s} {:>6d} {:>10.1f}\n'.format(
+                lint_file[-41:], calls, total / 1000.0))
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" pylint plugin giving the statement count and rating of every file """
+
+import os
+
+from pylint.reporters.text import TextReporter
+
+# Starts the lines the reporters add to pylint's output, followed by
+# path:statements:rating, the rating is empty when pylint gives none
+PREFIX = 'pylint-stats: '
+
+
+# What pylint counts messages by, the names its evaluation uses
+_CATEGORIES = ('info', 'convention', 'refactor', 'warning', 'error', 'fatal')
+
+
+def _count_statements(node):
+    """
+        Statements pylint's AST walker counts in node and its children
+    """
+
+    return int(bool(node.is_statement)) + sum(_count_statements(child) for
+                                              child in node.get_children())
+
+
+def register(linter):
+    """Count the statements of every file linter checks
+
+    pylint only keeps the statement count of the whole run and of every
+    module name, which two files can share. The count of each file is
+    kept by its real path in the by_file stats instead, 0 for files that
+    do not parse. It is known before the file is checked, so messages can
+    be rated as they come, and set to what the walker counted once it is.
+
+    """
+
+    set_current_module = linter.set_current_module
+    check_astroid_module = linter.check_astroid_module
+
+    def start_module(modname, filepath=None):
+        set_current_module(modname, filepath)
+        if filepath is not None:
+            linter.stats.setdefault('by_file', {})[
+                os.path.realpath(filepath)] = 0
+
+    def check_module(ast_node, walker, *args, **kwargs):
+        by_file = linter.stats.setdefault('by_file', {})
+        path = os.path.realpath(ast_node.file)
+        by_file[path] = _count_statements(ast_node)
+        before = walker.nbstatements
+        try:
+            return check_astroid_module(ast_node, walker, *args, **kwargs)
+        finally:
+            by_file[path] = walker.nbstatements - before
+
+    linter.set_current_module = start_module
+    linter.check_astroid_module = check_module
+
+
+class StatsReporter(TextReporter):
+    """Parseable messages, then the rating of every file
+
+    Files are rated the way pylint rates a run, with the evaluation
+    option, from their own statements and the messages about them.
+
+    """
+
+    name = 'git-pylint-stats'
+    line_format = '{path}:{line}: [{msg_id}({symbol}), {obj}] {msg}'
+
+    def __init__(self, output=None):
+        TextReporter.__init__(self, output)
+        self._counts = {}
+
+    def handle_message(self, msg):
+        TextReporter.handle_message(self, msg)
+        if msg.abspath:
+            counts = self._counts.setdefault(os.path.realpath(msg.abspath),
+                                             dict.fromkeys(_CATEGORIES, 0))
+            counts[msg.category] = counts.get(msg.category, 0) + 1
+
+    def write_rating(self, path, statements):
+        """
+            Write the path, statement count and rating of a file
+        """
+
+        rating = ''
+        if statements:
+            stats = dict(self.linter.stats)
+            stats.update(self._counts.get(path,
+                                          dict.fromkeys(_CATEGORIES, 0)))
+            stats['statement'] = statements
+            try:
+                # pylint evaluates its own option the same way
+                rating = '%.2f' % eval(  # pylint: disable=eval-used
+                    self.linter.config.evaluation, {}, stats)
+            except Exception:  # pylint: disable=broad-except
+                pass
+        self.writeln('%s%s:%d:%s' % (PREFIX, path, statements, rating))
+
+    def on_close(self, stats, previous_stats):
+        for (path, statements) in sorted(stats.get('by_file', {}).items()):
+            self.write_rating(path, statements)
+
+
+class RunningStatsReporter(StatsReporter):
+    """StatsReporter that also rates a file after each message about it
+
+    Messages only lower the rating, so the one after a message is the
+    most the file can still be rated.
+
+    """
+
+    name = 'git-pylint-running-stats'
+
+    def handle_message(self, msg):
+        StatsReporter.handle_message(self, msg)
+        by_file = self.linter.stats.get('by_file', {})
+        path = os.path.realpath(msg.abspath or '')
+        if path in by_file:
+            self.write_rating(path, by_file[path])
@@ -0,0 +1,147 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Client for the Commits API of the scoring server """
+
+import ConfigParser
+import httplib
+import json
+import os
+import socket
+
+from git_pylint_commit_hook import profiling
+
+SCORE_SERVER = '10.70.210.192:4000'
+
+# Environment variable naming the scoring server, host:port
+SERVER_ENV = 'GIT_PYLINT_SCORE_SERVER'
+
+DEFAULT_TIMEOUT = 10.0
+
+DEFAULT_CHUNK_SIZE = 100
+
+_SERVER = None
+
+
+def configure(server=None, pylintrc=None):
+    """Use server, host:port, as the scoring server of every ScoreClient
+
+    Without server the SERVER_ENV environment variable decides, then the
+    server option in the [pre-commit-hook] section of pylintrc, then
+    SCORE_SERVER.
+
+    """
+
+    global _SERVER
+    server = server or os.environ.get(SERVER_ENV)
+    if not server and pylintrc and os.path.exists(pylintrc):
+        conf = ConfigParser.SafeConfigParser()
+        conf.read(pylintrc)
+        if conf.has_option('pre-commit-hook', 'server'):
+            server = conf.get('pre-commit-hook', 'server')
+    _SERVER = server or None
+
+
+def server_address():
+    """
+        host:port of the scoring server in use
+    """
+
+    return _SERVER or os.environ.get(SERVER_ENV) or SCORE_SERVER
+
+
+class ScoreApiError(Exception):
+    """ The scoring server answered with an error status """
+    pass
+
+
+class ScoreClient(object):
+    """Talk to the scoring server over a single keep-alive connection
+
+    Every request has timeout seconds to connect and to answer. Score
+    records are posted in bulk, chunk_size records per request. The
+    server defaults to the one configure() chose.
+
+    """
+
+    def __init__(self, server=None, timeout=DEFAULT_TIMEOUT,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self.server = server or server_address()
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = httplib.HTTPConnection(self.server,
+                                                timeout=self.timeout)
+        return self._conn
+
+    def _request(self, method, path, body=None):
+        """
+            Send one request, reconnecting once if the kept-alive
+            connection was closed by the server in the meantime
+        """
+
+        headers = {'Connection': 'keep-alive'}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            reused = self._conn is not None
+            conn = self._connection()
+            try:
+                with profiling.span('{} {}'.format(method, path.split('/')[2]),
+                                    'http', path=path,
+                                    bytes=len(body or '')):
+                    conn.request(method, path, body, headers)
+                    response = conn.getresponse()
+                    data = response.read()
+            except (httplib.HTTPException, socket.error):
+                self.close()
+                if reused and attempt == 1:
+                    continue
+                raise
+            if response.getheader('connection', '').lower() == 'close':
+                self.close()
+            if response.status >= 400:
+                raise ScoreApiError('%s %s: %d %s' % (method, path,
+                                    response.status, response.reason))
+            return data
+
+    def is_commit_already_exist(self, commit, repo):
+        """
+            Whether scores of commit in repo were uploaded already
+        """
+
+        data = self._request('GET', '/api/Commits/%s/%s/isExists'
+                             % (commit, repo))
+        return bool(json.loads(data).get('isExists', ''))
+
+    def post_commits(self, records):
+        """
+            Upload score records, chunk_size records per request
+        """
+
+        records = list(records)
+        for start in range(0, len(records), self.chunk_size):
+            self._request('POST', '/api/Commits',
+                          json.dumps(records[start:start + self.chunk_size]))
+
+    def post_bulk(self, records):
+        """
+            Upload score records in one request to the bulk endpoint of
+            servers that have one, like the collector
+        """
+
+        data = json.loads(self._request('POST', '/api/Commits/bulk',
+                                        json.dumps(list(records))))
+        return data['count']
+
+    def close(self):
+        """
+            Close the connection
+        """
+
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,230 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Content addressed on-disk cache of lint results """
+
+import errno
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache',
+                                 'git-pylint-commit-hook')
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def blob_sha(data):
+    """
+        SHA of data as git would store it, equal to `git hash-object`
+    """
+
+    return hashlib.sha1('blob %d\0' % len(data) + data).hexdigest()
+
+
+def config_hash(command, params=(), config_files=()):
+    """
+        Hash of everything that changes how the linter scores a file:
+        the command, its extra parameters and its configuration files
+    """
+
+    digest = hashlib.sha1(json.dumps([command, list(params)]))
+    for config_file in config_files:
+        if config_file and os.path.isfile(config_file):
+            with open(config_file, 'rb') as file_handle:
+                digest.update(os.path.abspath(config_file))
+                digest.update(file_handle.read())
+    return digest.hexdigest()
+
+
+def _which(command):
+    """
+        Resolve command on PATH like the shell would
+    """
+
+    if os.path.dirname(command):
+        return command
+    for directory in os.environ.get('PATH', '').split(os.pathsep):
+        path = os.path.join(directory, command)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return command
+
+
+_LINTER_VERSIONS = {}
+
+
+def linter_version_output(command, version_flag='--version', cache=None):
+    """
+        The output of the linter's version_flag, looked up once per
+        executable and remembered in cache
+    """
+
+    path = _which(command)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ''
+    ident = '%s:%d:%d' % (path, stat.st_mtime, stat.st_size)
+    if ident in _LINTER_VERSIONS:
+        return _LINTER_VERSIONS[ident]
+    version_key = ScoreCache.key('linter-version', ident)
+    cached = cache.get(version_key) if cache is not None else None
+    if cached is not None:
+        output = cached['output']
+    else:
+        try:
+            proc = subprocess.Popen([command, version_flag],
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE)
+            (output, _) = proc.communicate()
+        except OSError:
+            output = ''
+        if cache is not None:
+            cache.put(version_key, {'output': output})
+    _LINTER_VERSIONS[ident] = output
+    return output
+
+
+def linter_version(command, version_flag='--version', cache=None):
+    """Identify the installed linter
+
+    The executable's path, size and mtime identify it cheaply. When a
+    version_flag is given the linter's own version output is added.
+
+    """
+
+    path = _which(command)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return command
+    ident = '%s:%d:%d' % (path, stat.st_mtime, stat.st_size)
+    if version_flag is None:
+        return ident
+    return hashlib.sha1(ident + linter_version_output(command,
+                        version_flag, cache)).hexdigest()
+
+
+def _encode(value):
+    """
+        Turn the unicode strings json hands back into utf-8 str
+    """
+
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return dict((_encode(key), _encode(item)) for (key, item) in
+                    value.items())
+    return value
+
+
+class ScoreCache(object):
+    """On-disk cache of lint results with size bounded LRU eviction
+
+    Every entry is a small JSON file named after its key. Reading an
+    entry bumps its mtime, eviction removes the least recently used
+    entries once the cache grows over max_bytes. Entries are written
+    atomically, so hooks running in parallel can share a cache.
+
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._size = None
+
+    @staticmethod
+    def key(*parts):
+        """
+            Build a cache key out of its parts
+        """
+
+        return hashlib.sha1('\0'.join(parts)).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key[2:] + '.json')
+
+    def get(self, key):
+        """
+            Returns the value stored for key, or None
+        """
+
+        path = self._path(key)
+        try:
+            with open(path, 'r') as file_handle:
+                value = _encode(json.load(file_handle))
+        except (IOError, ValueError):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        """
+            Store value for key, evicting old entries when needed
+        """
+
+        path = self._path(key)
+        try:
+            data = json.dumps(value)
+        except ValueError:
+            return
+        try:
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+            (handle, tmp_path) = \
+                tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(handle, 'w') as file_handle:
+                file_handle.write(data)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            return
+        if self._size is None:
+            self._size = sum(size for (_, size, _) in self._entries())
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for (dirpath, _, filenames) in os.walk(self.cache_dir):
+            for filename in filenames:
+                if not filename.endswith('.json'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+            Remove least recently used entries until the cache is back
+            under 90% of max_bytes
+        """
+
+        entries = sorted(self._entries())
+        total = sum(size for (_, size, _) in entries)
+        for (_, size, path) in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._size = total
@@ -0,0 +1,222 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Per-repository index of file scores and their running aggregates """
+
+import os
+import sqlite3
+import subprocess
+
+from git_pylint_commit_hook import profiling
+
+INDEX_FILE = 'pylint-score-index.sqlite'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scores (
+    path TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (path, blob)
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    blob TEXT NOT NULL,
+    score REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS authors (
+    author TEXT PRIMARY KEY,
+    changes INTEGER NOT NULL DEFAULT 0,
+    total REAL NOT NULL DEFAULT 0,
+    impact REAL NOT NULL DEFAULT 0
+);
+'''
+
+
+def default_path():
+    """
+        Where the index of the current repository lives, inside its git
+        directory so every clone keeps its own. None outside a repository.
+    """
+
+    process = subprocess.Popen(['git', 'rev-parse', '--git-dir'],
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    (stdout, _) = process.communicate()
+    if process.returncode:
+        return None
+    return os.path.join(stdout.strip(), INDEX_FILE)
+
+
+def _counted(score):
+    """
+        Whether score counts towards the averages, like _average_score in
+        commit_hook zero scores do not
+    """
+
+    return score is not None and score != 0
+
+
+class ScoreIndex(object):
+    """Scores of (path, blob) pairs and the state of the repository
+
+    The scores table remembers the score of every blob seen, so a version
+    is never linted twice. The files table holds the latest known score
+    of every path, and the repository total and file count are kept up to
+    date with it, so the repository average and the impact of a change
+    cost one lookup per changed file. Files the index does not know yet
+    are added as hooks come across them. The authors table sums the
+    changes, scores and impact of every author.
+
+    Scores depend on the linter and its configuration: when config
+    differs from the one the index was built with, the index starts
+    over.
+
+    """
+
+    def __init__(self, path, config=''):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+        if self._meta('config') != config:
+            with self._db:
+                for table in ('scores', 'files', 'authors', 'meta'):
+                    self._db.execute('DELETE FROM {}'.format(table))
+                self._set_meta('config', config)
+                self._set_meta('total', 0.0)
+                self._set_meta('files', 0)
+
+    def _meta(self, key):
+        row = self._db.execute('SELECT value FROM meta WHERE key = ?',
+                               (key, )).fetchone()
+        return row and row[0]
+
+    def _set_meta(self, key, value):
+        self._db.execute('INSERT OR REPLACE INTO meta (key, value) '
+                         'VALUES (?, ?)', (key, str(value)))
+
+    def scores(self, keys):
+        """
+            The known scores of (path, blob) keys, as {key: score}
+        """
+
+        result = {}
+        for (path, blob) in keys:
+            row = self._db.execute(
+                'SELECT score FROM scores WHERE path = ? AND blob = ?',
+                (path, blob)).fetchone()
+            if row is not None:
+                result[(path, blob)] = row[0]
+        return result
+
+    def add(self, scores):
+        """
+            Remember the score of every (path, blob, score)
+        """
+
+        with self._db, profiling.span('index add', 'io', files=len(scores)):
+            self._db.executemany('INSERT OR REPLACE INTO scores '
+                                 '(path, blob, score) VALUES (?, ?, ?)',
+                                 scores)
+
+    def _state(self, paths):
+        state = {}
+        for path in paths:
+            row = self._db.execute('SELECT score FROM files WHERE path = ?',
+                                   (path, )).fetchone()
+            if row is not None:
+                state[path] = row[0]
+        return state
+
+    def average(self, changes=None):
+        """
+            Average score of the repository, or what it would be with the
+            {path: score} changes, None when no file counts
+        """
+
+        total = float(self._meta('total'))
+        files = int(self._meta('files'))
+        if changes:
+            for score in self._state(changes).values():
+                if _counted(score):
+                    total -= score
+                    files -= 1
+            for score in changes.values():
+                if _counted(score):
+                    total += score
+                    files += 1
+        if not files:
+            return None
+        return total / files
+
+    def _set_files(self, files):
+        old_scores = self._state(path for (path, _, _) in files)
+        total = float(self._meta('total'))
+        count = int(self._meta('files'))
+        for (path, blob, score) in files:
+            if _counted(old_scores.get(path)):
+                total -= old_scores[path]
+                count -= 1
+            if _counted(score):
+                total += score
+                count += 1
+            old_scores[path] = score
+            self._db.execute('INSERT OR REPLACE INTO files (path, blob, '
+                             'score) VALUES (?, ?, ?)', (path, blob, score))
+        self._set_meta('total', total)
+        self._set_meta('files', count)
+
+    def fill(self, files):
+        """
+            Add the (path, blob, score) files whose path the index does
+            not know yet to the state of the repository
+        """
+
+        with self._db:
+            known = self._state(path for (path, _, _) in files)
+            self._set_files([(path, blob, score) for (path, blob, score) in
+                             files if path not in known])
+
+    def update(self, files, author):
+        """
+            Make the (path, blob, score) files, changed by author, the state
+            of the repository and credit author with the change, returns
+            its impact on the repository average
+        """
+
+        with self._db, profiling.span('index update', 'io',
+                                      files=len(files)):
+            before = self.average()
+            self._set_files(files)
+            after = self.average()
+            impact = 0.0
+            if before is not None and after is not None:
+                impact = after - before
+            self._db.execute('INSERT OR IGNORE INTO authors (author) '
+                             'VALUES (?)', (author, ))
+            self._db.execute(
+                'UPDATE authors SET changes = changes + ?, total = total + ?, '
+                'impact = impact + ? WHERE author = ?',
+                (len(files), sum(score for (_, _, score) in files), impact,
+                 author))
+        return impact
+
+    def author(self, author):
+        """
+            (changes, total score, total impact) of author
+        """
+
+        row = self._db.execute('SELECT changes, total, impact FROM authors '
+                               'WHERE author = ?', (author, )).fetchone()
+        return tuple(row) if row else (0, 0.0, 0.0)
+
+    def close(self):
+        """
+            Close the database
+        """
+
+        self._db.close()
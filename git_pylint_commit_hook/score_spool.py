@@ -0,0 +1,222 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Durable local spool of score records waiting for upload """
+
+import errno
+import fcntl
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from git_pylint_commit_hook import profiling
+from git_pylint_commit_hook import score_api
+
+DEFAULT_SPOOL = os.path.join(os.path.expanduser('~'), '.local', 'share',
+                             'git-pylint-commit-hook', 'spool.sqlite')
+
+DEFAULT_BATCH_SIZE = 500
+
+MAX_BACKOFF = 60 * 60
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    repo TEXT NOT NULL,
+    commitid TEXT NOT NULL,
+    file TEXT NOT NULL,
+    record TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    UNIQUE (repo, commitid, file)
+);
+CREATE TABLE IF NOT EXISTS commits (
+    repo TEXT NOT NULL,
+    commitid TEXT NOT NULL,
+    uploading INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (repo, commitid)
+);
+'''
+
+
+def _make_parent(path):
+    try:
+        os.makedirs(os.path.dirname(path))
+    except OSError as error:
+        if error.errno != errno.EEXIST:
+            raise
+
+
+class ScoreSpool(object):
+    """Score records stored in SQLite until the scoring server takes them
+
+    Hooks append the records of a push in one transaction and return,
+    flush() uploads them later in batches. A record is identified by
+    (repo, commitid, file), spooling it again replaces the queued copy.
+    Records that fail to upload are retried with exponential backoff.
+
+    """
+
+    def __init__(self, path=DEFAULT_SPOOL):
+        self.path = path
+        _make_parent(path)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+
+    def has_commit(self, commit, repo):
+        """
+            Whether commit of repo was spooled already
+        """
+
+        row = self._db.execute(
+            'SELECT 1 FROM commits WHERE repo = ? AND commitid = ?',
+            (repo, commit)).fetchone()
+        return row is not None
+
+    def append(self, commit, repo, records):
+        """
+            Queue the score records of commit in repo
+        """
+
+        with self._db, profiling.span('spool append', 'io', commit=commit):
+            self._db.execute(
+                'INSERT OR IGNORE INTO commits (repo, commitid) '
+                'VALUES (?, ?)', (repo, commit))
+            self._db.executemany(
+                'INSERT OR REPLACE INTO records '
+                '(repo, commitid, file, record) VALUES (?, ?, ?, ?)',
+                [(repo, commit, record['file'], json.dumps(record))
+                 for record in records])
+
+    def pending(self, limit=DEFAULT_BATCH_SIZE, retry_all=False):
+        """
+            Up to limit queued (id, repo, commitid, record) rows, oldest
+            first, skipping those waiting for a retry unless retry_all
+        """
+
+        now = float('inf') if retry_all else time.time()
+        return [(row_id, repo, commit, json.loads(record))
+                for (row_id, repo, commit, record) in self._db.execute(
+                    'SELECT id, repo, commitid, record FROM records '
+                    'WHERE next_attempt <= ? ORDER BY id LIMIT ?',
+                    (now, limit))]
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+    def _uploading(self, commit, repo):
+        row = self._db.execute(
+            'SELECT uploading FROM commits WHERE repo = ? AND commitid = ?',
+            (repo, commit)).fetchone()
+        return bool(row and row[0])
+
+    def _mark_uploading(self, commit, repo):
+        with self._db:
+            self._db.execute(
+                'UPDATE commits SET uploading = 1 '
+                'WHERE repo = ? AND commitid = ?', (repo, commit))
+
+    def _remove(self, row_ids):
+        with self._db:
+            self._db.executemany('DELETE FROM records WHERE id = ?',
+                                 [(row_id, ) for row_id in row_ids])
+
+    def _retry_later(self, row_ids):
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                'UPDATE records SET attempts = attempts + 1, '
+                'next_attempt = ? + MIN(?, 1 << MIN(attempts, 20)) '
+                'WHERE id = ?',
+                [(now, MAX_BACKOFF, row_id) for row_id in row_ids])
+
+    def flush(self, client, batch_size=DEFAULT_BATCH_SIZE, retry_all=False):
+        """Upload queued records through client, returns how many were
+        sent
+
+        Records are grouped per commit. A commit the server already knows
+        and this spool never started uploading is dropped instead of sent
+        twice. Flushing stops at the first failing request, the failed
+        records are retried by a later flush.
+
+        """
+
+        sent = 0
+        while True:
+            rows = self.pending(batch_size, retry_all)
+            if not rows:
+                return sent
+            groups = []
+            for row in rows:
+                if groups and groups[-1][0] == row[1:3]:
+                    groups[-1][1].append(row)
+                else:
+                    groups.append((row[1:3], [row]))
+            for ((repo, commit), group) in groups:
+                row_ids = [row[0] for row in group]
+                try:
+                    if not self._uploading(commit, repo) and \
+                            client.is_commit_already_exist(commit, repo):
+                        self._remove(row_ids)
+                        continue
+                    self._mark_uploading(commit, repo)
+                    client.post_commits([row[3] for row in group])
+                except Exception:  # pylint: disable=broad-except
+                    self._retry_later(row_ids)
+                    return sent
+                self._remove(row_ids)
+                sent += len(group)
+
+    def close(self):
+        """
+            Close the database
+        """
+
+        self._db.close()
+
+
+def flush(spool_path=DEFAULT_SPOOL, timeout=score_api.DEFAULT_TIMEOUT,
+          retry_all=False):
+    """Drain the spool at spool_path, returns (sent, still queued)
+
+    Only one flush runs per spool at a time, a flush started while
+    another one is busy returns right away.
+
+    """
+
+    _make_parent(spool_path)
+    with open(spool_path + '.lock', 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            return (0, None)
+        spool = ScoreSpool(spool_path)
+        client = score_api.ScoreClient(timeout=timeout)
+        try:
+            sent = spool.flush(client, retry_all=retry_all)
+            return (sent, len(spool))
+        finally:
+            client.close()
+            spool.close()
+
+
+def spawn_flush(spool_path=DEFAULT_SPOOL, timeout=score_api.DEFAULT_TIMEOUT):
+    """
+        Start a detached process that flushes the spool to the scoring
+        server in use, the hook does not wait for it
+    """
+
+    with open(os.devnull, 'r+') as devnull:
+        subprocess.Popen([sys.executable, '-m', __name__, spool_path,
+                          str(timeout), score_api.server_address()],
+                         stdin=devnull, stdout=devnull, stderr=devnull,
+                         close_fds=True, preexec_fn=os.setsid)
+
+
+if __name__ == '__main__':
+    score_api.configure(sys.argv[3])
+    flush(sys.argv[1], float(sys.argv[2]))
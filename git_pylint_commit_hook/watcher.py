@@ -0,0 +1,181 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Watch the working tree for saved files through inotify """
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import subprocess
+import time
+
+DEFAULT_DEBOUNCE = 1.0
+
+NICENESS = 10
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0x00080000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+_EVENT = struct.Struct('iIII')
+
+
+class Inotify(object):
+    """Minimal inotify binding through ctypes
+
+    Linux only, OSError is raised where inotify is not available.
+
+    """
+
+    def __init__(self):
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                     use_errno=True)
+            self._fd = self._libc.inotify_init1(IN_CLOEXEC)
+        except (AttributeError, OSError):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._paths = {}
+
+    def fileno(self):
+        """
+            File descriptor to select() on
+        """
+
+        return self._fd
+
+    def add_watch(self, path, mask=_WATCH_MASK):
+        """
+            Watch the directory path, returns False if it is gone
+        """
+
+        wd = self._libc.inotify_add_watch(self._fd, path, mask)
+        if wd < 0:
+            return False
+        self._paths[wd] = path
+        return True
+
+    def read_events(self):
+        """
+            Read pending events as (path, mask) pairs, the path is None
+            for a queue overflow
+        """
+
+        data = os.read(self._fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            (wd, mask, _, length) = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip('\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, mask))
+                continue
+            directory = self._paths.get(wd)
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+            if directory is not None:
+                events.append((os.path.join(directory, name), mask))
+        return events
+
+    def close(self):
+        """
+            Stop watching
+        """
+
+        os.close(self._fd)
+
+
+def _git_lines(args, stdin_data=None):
+    """
+        NUL separated output of a git command, empty if it fails
+    """
+
+    process = subprocess.Popen(['git'] + args, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    (stdout, _) = process.communicate(stdin_data)
+    return [line for line in stdout.split('\0') if line]
+
+
+def ignored_files(paths):
+    """
+        The paths of the working tree git ignores
+    """
+
+    if not paths:
+        return set()
+    return set(_git_lines(['check-ignore', '-z', '--stdin'],
+                          ''.join(path + '\0' for path in paths)))
+
+
+def watch_tree(notifier, top):
+    """
+        Watch top and every directory below it that git does not ignore
+    """
+
+    ignored = set(path.rstrip('/') for path in _git_lines(
+        ['ls-files', '-z', '--others', '--ignored', '--exclude-standard',
+         '--directory', '--', top]))
+    for (dirpath, dirnames, _) in os.walk(top):
+        dirnames[:] = [dirname for dirname in dirnames if dirname != '.git'
+                       and os.path.normpath(os.path.join(dirpath, dirname))
+                       not in ignored]
+        notifier.add_watch(dirpath)
+
+
+def _modified_files():
+    """
+        Changed and untracked files of the working tree, rescanned after
+        the event queue overflowed
+    """
+
+    return _git_lines(['ls-files', '-z', '--modified', '--others',
+                       '--exclude-standard'])
+
+
+def saved_files(notifier, debounce=DEFAULT_DEBOUNCE):
+    """Yield lists of files saved under the watched directories
+
+    A file is yielded once no further save came in for debounce seconds.
+    After an event queue overflow every changed and untracked file is
+    yielded. Paths are relative like the watched directories.
+
+    """
+
+    saved = {}
+    while True:
+        timeout = None
+        if saved:
+            timeout = max(0, min(saved.values()) + debounce - time.time())
+        if select.select([notifier], [], [], timeout)[0]:
+            for (path, mask) in notifier.read_events():
+                if path is None:
+                    saved.update((modified, time.time()) for modified in
+                                 _modified_files())
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        watch_tree(notifier, path)
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    saved[os.path.normpath(path)] = time.time()
+        quiet = time.time() - debounce
+        ready = sorted(path for (path, when) in saved.items()
+                       if when <= quiet)
+        for path in ready:
+            del saved[path]
+        ready = [path for path in ready if os.path.isfile(path)]
+        if ready:
+            ignored = ignored_files(ready)
+            yield [path for path in ready if path not in ignored]
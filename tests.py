@@ -1,12 +1,63 @@
 # pylint: disable=missing-docstring
 
+import BaseHTTPServer
+import httplib
+import json
 import os
+import Queue
 import shutil
 import subprocess
 import tempfile
+import threading
+import time
 import unittest
+from StringIO import StringIO
 
+from git_golint_commit_hook import commit_hook as golint_hook
+from git_pylint_commit_hook import backfill
+from git_pylint_commit_hook import classify
+from git_pylint_commit_hook import collector
 from git_pylint_commit_hook import commit_hook
+from git_pylint_commit_hook import engines
+from git_pylint_commit_hook import equivalence
+from git_pylint_commit_hook import git_blobs
+from git_pylint_commit_hook import git_push
+from git_pylint_commit_hook import lint_server
+from git_pylint_commit_hook import profiling
+from git_pylint_commit_hook import score_api
+from git_pylint_commit_hook import score_cache
+from git_pylint_commit_hook import score_index
+from git_pylint_commit_hook import score_spool
+from git_pylint_commit_hook import watcher
+
+class CommitsApiHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Stand-in for the Commits API of the scoring server"""
+
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+    posted = []
+
+    def setup(self):
+        CommitsApiHandler.connections += 1
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+
+    def respond(self, data):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.respond(json.dumps({'isExists': 'exists' in self.path}))
+
+    def do_POST(self):
+        length = int(self.headers.getheader('Content-Length'))
+        CommitsApiHandler.posted.append(json.loads(self.rfile.read(length)))
+        self.respond('[]')
+
+    def log_message(self, *args):
+        pass
+
 
 class TestHook(unittest.TestCase):
     # pylint: disable=protected-access,too-many-public-methods,invalid-name
@@ -44,31 +95,53 @@ class TestHook(unittest.TestCase):
         self.cmd('git commit --allow-empty -m msg')
         self.assertEquals(commit_hook._current_commit(), 'HEAD')
 
-    def test_list_of_committed_files(self):
-        """Test commit_hook._get_list_of_committed_files"""
+    def test_list_of_committed_python_files(self):
+        """Test commit_hook._get_list_of_committed_python_files"""
 
         # Test empty tree
-        self.assertEquals(commit_hook._get_list_of_committed_files(), [])
+        self.assertEquals(commit_hook._get_list_of_committed_python_files(),
+                          [])
 
-        # Create file 'a'
-        a = self.write_file('a', 'foo')
-        self.assertEquals(commit_hook._get_list_of_committed_files(), [])
+        # Create file 'a.py'
+        a = self.write_file('a.py', 'foo')
+        self.assertEquals(commit_hook._get_list_of_committed_python_files(),
+                          [])
 
-        # Add 'a'
+        # Add 'a.py'
         self.cmd('git add ' + a)
-        self.assertEquals(commit_hook._get_list_of_committed_files(), [a])
+        self.assertEquals(commit_hook._get_list_of_committed_python_files(),
+                          [(a, None)])
 
-        # Commit 'a'
+        # Commit 'a.py'
         self.cmd('git commit -m msg')
-        self.assertEquals(commit_hook._get_list_of_committed_files(), [])
+        self.assertEquals(commit_hook._get_list_of_committed_python_files(),
+                          [])
 
-        # Edit 'a'
-        self.write_file('a', 'bar')
-        self.assertEquals(commit_hook._get_list_of_committed_files(), [])
+        # Edit 'a.py', files are compared against HEAD
+        self.write_file('a.py', 'bar')
+        self.assertEquals(commit_hook._get_list_of_committed_python_files(),
+                          [(a, None)])
 
-        # Add 'a'
-        self.cmd('git add ' + a)
-        self.assertEquals(commit_hook._get_list_of_committed_files(), [a])
+        # Non Python files are left out
+        self.write_file('b', 'foo')
+        self.cmd('git add b')
+        self.assertEquals(commit_hook._get_list_of_committed_python_files(),
+                          [(a, None)])
+
+        # Python scripts are told by the #! line of the indexed blob, or of
+        # the working tree file when it differs from the index
+        c = self.write_file('c', '#!/usr/bin/env python\n')
+        self.cmd('git add c')
+        d = self.write_file('d', 'foo')
+        self.cmd('git add d')
+        self.write_file('d', '#!/usr/bin/env python\n')
+        try:
+            self.assertEquals(
+                commit_hook._get_list_of_committed_python_files(),
+                [(a, None), (c, None), (d, None)])
+        finally:
+            # The reader runs git in this test's repository
+            git_blobs.blob_reader().close()
 
     def test_is_python_file(self):
         """Test commit_hook._is_python_file"""
@@ -93,3 +166,738 @@ class TestHook(unittest.TestCase):
 
         text = 'Your code has been rated at 8.51'
         self.assertEquals(commit_hook._parse_score(text), 0.0)
+
+    def test_imap_jobs(self):
+        """Test commit_hook._imap_jobs keeps the input order"""
+
+        items = [-3, 2, -1, 5]
+        self.assertEquals(list(commit_hook._imap_jobs(abs, items, 1)),
+                          [3, 2, 1, 5])
+        self.assertEquals(list(commit_hook._imap_jobs(abs, items, 3)),
+                          [3, 2, 1, 5])
+
+    def test_imap_jobs_deadline(self):
+        """Test commit_hook._imap_jobs_deadline defers late jobs"""
+
+        deadline = time.time() + 1
+        results = list(commit_hook._imap_jobs_deadline(time.sleep,
+                       [0, 0, 5, 0], 1, deadline, cached=1))
+        self.assertTrue(time.time() < deadline + 1)
+        self.assertEquals(results, [None, None, commit_hook._DEFERRED,
+                                    commit_hook._DEFERRED])
+
+        # What a terminated job started goes with it
+        pid_file = os.path.join(self.tmp_dir, 'pid')
+        command = ['sh', '-c', 'echo $$ > {}; exec sleep 30'.format(pid_file)]
+        deadline = time.time() + 1
+        results = list(commit_hook._imap_jobs_deadline(subprocess.call,
+                       [command], 1, deadline))
+        self.assertEquals(results, [commit_hook._DEFERRED])
+        with open(pid_file) as f:
+            stat = '/proc/{}/stat'.format(f.read().strip())
+        state = None
+        for _ in range(20):
+            if not os.path.exists(stat):
+                break
+            with open(stat) as f:
+                state = f.read().split()[2]
+            if state == 'Z':
+                break
+            time.sleep(0.1)
+        self.assertTrue(not os.path.exists(stat) or state == 'Z')
+
+    def test_compute_score(self):
+        """Test commit_hook._parse_messages and commit_hook._compute_score"""
+
+        text = '\n'.join([
+            '************* Module a',
+            'a.py:1: [C0111(missing-docstring), ] Missing module docstring',
+            'a.py:2: [W0611(unused-import), ] Unused import os',
+            'sub/b.py:3: [E1101(no-member), f] Module has no member'])
+        messages = commit_hook._parse_messages(text)
+        self.assertEquals([m.path for m in messages],
+                          ['a.py', 'a.py', 'sub/b.py'])
+        self.assertEquals(messages[2].line, 3)
+        self.assertEquals(messages[2].symbol, 'no-member')
+
+        source = 'import os\nX = 1\n'
+        statements = commit_hook._count_statements(source)
+        self.assertEquals(statements, 2)
+        self.assertEquals(commit_hook._compute_score(messages[:2],
+                                                     statements), 0.0)
+        self.assertEquals(commit_hook._compute_score(messages[2:], 10), 5.0)
+        self.assertEquals(commit_hook._compute_score(messages, 0), 0.0)
+
+        # Docstrings are no statements for pylint, except handlers are
+        source = ('"""Doc"""\ndef f():\n    """Doc"""\n    try:\n'
+                  '        pass\n    except ValueError:\n        pass\n')
+        self.assertEquals(commit_hook._count_statements(source), 5)
+
+    def test_file_stats(self):
+        """Test commit_hook._parse_file_stats"""
+
+        text = '\n'.join([
+            '************* Module a',
+            'a.py:1: [C0111(missing-docstring), ] Missing module docstring',
+            'pylint-stats: /src/a.py:4:7.50',
+            'pylint-stats: /src/a.py:4:5.00',
+            'pylint-stats: /src/b:c.py:0:',
+            'pylint-stats: /src/d.py:8:-1.25'])
+        self.assertEquals(commit_hook._parse_file_stats(text), {
+            '/src/a.py': (4, 5.0), '/src/b:c.py': (0, 0.0),
+            '/src/d.py': (8, -1.25)})
+        self.assertEquals(commit_hook._parse_messages(text)[0].path, 'a.py')
+
+        # Files without a rating line are linted again on their own
+        os.mkdir('sub')
+        self.write_file('a.py', 'X = 1\n')
+        self.write_file('sub/a.py', 'X = 1\n')
+        pylint = self.write_file('pylint', '#!/bin/sh\n'
+                                 'for arg; do case "$arg" in -*) ;; *)\n'
+                                 'echo "pylint-stats: $(pwd -P)/$arg:2:7.50"\n'
+                                 'exit 0;; esac; done\n')
+        os.chmod(pylint, 0755)
+        pylint = os.path.join(self.tmp_dir, pylint)
+        results = commit_hook._run_pylint_batch(pylint, ['a.py', 'sub/a.py'])
+        self.assertEquals(sorted(results), ['a.py', 'sub/a.py'])
+        self.assertEquals(results['sub/a.py'].score, 7.5)
+
+    def test_score_cache(self):
+        """Test score_cache.ScoreCache and score_cache.blob_sha"""
+
+        a = self.write_file('a.py', 'X = 1\n')
+        self.assertEquals(score_cache.blob_sha('X = 1\n'),
+                          self.cmd('git hash-object ' + a).strip())
+
+        cache = score_cache.ScoreCache(os.path.join(self.tmp_dir, 'cache'),
+                                       max_bytes=100)
+        self.assertEquals(cache.get('0' * 40), None)
+        cache.put('1' * 40, {'score': 1.0, 'messages': ['a' * 30]})
+        self.assertEquals(cache.get('1' * 40)['score'], 1.0)
+
+        # Make the first entry the oldest, the second one pushes it out
+        os.utime(cache._path('1' * 40), (0, 0))
+        cache.put('2' * 40, {'score': 2.0, 'messages': ['b' * 30]})
+        self.assertEquals(cache.get('1' * 40), None)
+        self.assertEquals(cache.get('2' * 40)['messages'], ['b' * 30])
+
+    def test_lint_server_fallback(self):
+        """Test lint_server.request without a server listening"""
+
+        socket_path = os.path.join(self.tmp_dir, 'lint.sock')
+        self.assertEquals(lint_server.request(['a.py'], socket_path), None)
+        self.assertFalse(lint_server.request_alive(socket_path))
+
+    def test_blob_reader(self):
+        """Test git_blobs.BlobReader"""
+
+        a = self.write_file('a.py', 'X = 1\n')
+        self.cmd('git add ' + a)
+        self.cmd('git commit -m msg')
+        self.write_file('a.py', 'X = 2\n')
+
+        reader = git_blobs.BlobReader()
+        blob = reader.read('HEAD', a)
+        self.assertEquals(blob.data, 'X = 1\n')
+        self.assertEquals(blob.sha, score_cache.blob_sha('X = 1\n'))
+        self.assertEquals(reader.read('HEAD', 'missing.py'), None)
+        self.assertEquals(reader.read('HEAD', a).data, 'X = 1\n')
+        reader.close()
+
+        temp_file = git_blobs.write_temp_file('sub/a.py', blob.data)
+        self.assertEquals(os.path.basename(temp_file), 'a.py')
+        git_blobs.remove_temp_file(temp_file)
+        self.assertFalse(os.path.exists(os.path.dirname(temp_file)))
+
+    def test_score_client(self):
+        """Test score_api.ScoreClient uploads in chunks on one connection"""
+
+        server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), CommitsApiHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        CommitsApiHandler.connections = 0
+        CommitsApiHandler.posted = []
+        try:
+            client = score_api.ScoreClient('127.0.0.1:%d' % server.server_port,
+                                           chunk_size=2)
+            self.assertTrue(client.is_commit_already_exist('exists', 'repo'))
+            self.assertFalse(client.is_commit_already_exist('abc', 'repo'))
+            client.post_commits([{'file': str(i)} for i in range(5)])
+            client.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEquals([len(chunk) for chunk in CommitsApiHandler.posted],
+                          [2, 2, 1])
+        self.assertEquals(CommitsApiHandler.connections, 1)
+
+    def test_collector(self):
+        """Test the collector stores records from concurrent clients"""
+
+        db_path = os.path.join(self.tmp_dir, 'collector.sqlite')
+        server = collector.CollectorServer('127.0.0.1:0', db_path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        address = '127.0.0.1:%d' % server.server_port
+        try:
+            def post(client_number):
+                client = score_api.ScoreClient(address, chunk_size=7)
+                client.post_commits({'commitid': 'c%d' % client_number,
+                                     'repo': 'repo', 'file': '%d.py' % i,
+                                     'score': 5.0} for i in range(20))
+                client.close()
+
+            threads = [threading.Thread(target=post, args=(i, ))
+                       for i in range(4)]
+            for post_thread in threads:
+                post_thread.start()
+            for post_thread in threads:
+                post_thread.join()
+
+            client = score_api.ScoreClient(address)
+            self.assertTrue(client.is_commit_already_exist('c3', 'repo'))
+            self.assertFalse(client.is_commit_already_exist('c3', 'other'))
+            self.assertEquals(client.post_bulk([{'commitid': 'c9',
+                                                 'repo': 'repo',
+                                                 'file': 'a.py'}]), 1)
+            self.assertRaises(score_api.ScoreApiError, client.post_bulk,
+                              [{'commitid': 'c9'}])
+            client.close()
+
+            # A single record, and one record per line in bulk
+            conn = httplib.HTTPConnection(address)
+            conn.request('POST', '/api/Commits', json.dumps(
+                {'commitid': 'c0', 'repo': 'repo', 'file': '0.py'}))
+            self.assertEquals(json.loads(conn.getresponse().read())['file'],
+                              '0.py')
+            conn.request('POST', '/api/Commits/bulk', '\n'.join(json.dumps(
+                {'commitid': 'c8', 'repo': 'repo', 'file': name})
+                for name in ('a.py', 'b.py')))
+            self.assertEquals(json.loads(conn.getresponse().read()),
+                              {'count': 2})
+            conn.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        store = collector.CommitStore(db_path)
+        self.assertEquals(len(store), 83)
+        store.close()
+
+    def test_score_server(self):
+        """Test the scoring server comes from the option, env or pylintrc"""
+
+        self.write_file('.pylintrc', '[pre-commit-hook]\n'
+                        'server = rc:4000\n')
+        environ = os.environ.pop(score_api.SERVER_ENV, None)
+        try:
+            score_api.configure(None, '.pylintrc')
+            self.assertEquals(score_api.ScoreClient().server, 'rc:4000')
+            os.environ[score_api.SERVER_ENV] = 'env:4000'
+            score_api.configure(None, '.pylintrc')
+            self.assertEquals(score_api.server_address(), 'env:4000')
+            score_api.configure('cli:4000', '.pylintrc')
+            self.assertEquals(score_api.server_address(), 'cli:4000')
+        finally:
+            os.environ.pop(score_api.SERVER_ENV, None)
+            if environ is not None:
+                os.environ[score_api.SERVER_ENV] = environ
+            score_api.configure()
+        self.assertEquals(score_api.server_address(), score_api.SCORE_SERVER)
+
+    def test_pipeline_scores(self):
+        """Test commit_hook._pipeline_scores keeps the order of the jobs"""
+
+        self.write_file('a.py', '"""a"""\nX = 1\n')
+        self.write_file('b.py', 'x=1\n')
+        self.cmd('git add a.py b.py')
+        self.cmd('git commit -m add')
+        self.write_file('a.py', 'x=1\n')
+        self.cmd('git commit -a -m change')
+        lint_jobs = [('pylint', 'a.py', 'HEAD~1'), ('pylint', 'b.py', 'HEAD'),
+                     ('pylint', 'a.py', 'HEAD')]
+        scores = list(commit_hook._pipeline_scores(lint_jobs, 2, depth=1))
+        self.assertEquals(scores[0], 10.0)
+        self.assertEquals(scores[1:], [scores[1], scores[1]])
+        self.assertTrue(scores[1] < 0)
+        self.assertEquals(list(commit_hook._pipeline_scores(lint_jobs)),
+                          scores)
+
+    def test_upload_commits(self):
+        """Test commit_hook._upload_commits joins waiting records"""
+
+        class Client(object):
+            def __init__(self):
+                self.posted = []
+
+            def post_commits(self, records):
+                self.posted.append(records)
+
+        client = Client()
+        uploads = Queue.Queue()
+        for records in ([1, 2], [3], None):
+            uploads.put(records)
+        errors = []
+        commit_hook._upload_commits(client, uploads, errors)
+        self.assertEquals(client.posted, [[1, 2, 3]])
+        self.assertEquals(errors, [])
+
+    def test_score_spool(self):
+        """Test score_spool.ScoreSpool dedupes and retries uploads"""
+
+        class Client(object):
+            """Scoring server stand-in that fails until told otherwise"""
+            def __init__(self):
+                self.up = False
+                self.posted = []
+
+            def is_commit_already_exist(self, commit, repo):
+                if not self.up:
+                    raise IOError('server down')
+                return commit == 'known'
+
+            def post_commits(self, records):
+                self.posted.extend(records)
+
+        spool = score_spool.ScoreSpool(os.path.join(self.tmp_dir, 'spool'))
+        spool.append('abc', 'repo', [{'file': 'a.py', 'score': 1.0},
+                                     {'file': 'b.py', 'score': 2.0}])
+        spool.append('abc', 'repo', [{'file': 'a.py', 'score': 3.0}])
+        spool.append('known', 'repo', [{'file': 'a.py', 'score': 4.0}])
+        self.assertTrue(spool.has_commit('abc', 'repo'))
+        self.assertFalse(spool.has_commit('abc', 'other'))
+        self.assertEquals(len(spool), 3)
+
+        client = Client()
+        self.assertEquals(spool.flush(client), 0)
+        # The failed commit waits for a retry, the untried one does not
+        self.assertEquals([row[2] for row in spool.pending()], ['known'])
+        self.assertEquals(len(spool), 3)
+
+        client.up = True
+        self.assertEquals(spool.flush(client, retry_all=True), 2)
+        self.assertEquals(sorted((record['file'], record['score'])
+                                 for record in client.posted),
+                          [('a.py', 3.0), ('b.py', 2.0)])
+        self.assertEquals(len(spool), 0)
+        spool.close()
+
+    def test_insertions_and_deletions(self):
+        """Test commit_hook.get_insertions_and_deletions"""
+
+        self.write_file('a.py', 'A = 1\nB = 2\nC = 3\nD = 4\n')
+        self.write_file('b.bin', '\0\1\2')
+        self.cmd('git add a.py b.bin')
+        self.cmd('git commit -m one')
+        first = self.cmd('git rev-parse HEAD').strip()
+        self.assertEquals(
+            commit_hook.get_insertions_and_deletions('0' * 40, first),
+            {'a.py': (4, 0), 'b.bin': (0, 0)})
+
+        self.cmd('git mv a.py c.py')
+        self.write_file('c.py', 'A = 1\nB = 2\nC = 3\nE = 5\nF = 6\n')
+        self.write_file('b.bin', '\3\0\4')
+        self.cmd('git add c.py b.bin')
+        self.cmd('git commit -m two')
+        second = self.cmd('git rev-parse HEAD').strip()
+        self.assertEquals(
+            commit_hook.get_insertions_and_deletions(first, second),
+            {'c.py': (2, 1), 'b.bin': (0, 0)})
+
+    def test_push_commits(self):
+        """Test git_push enumerates every commit of a multi-ref push"""
+
+        a = self.write_file('a.py', 'X = 1\n')
+        self.cmd('git add ' + a)
+        self.cmd('git commit -m one')
+        base = self.cmd('git rev-parse HEAD').strip()
+        self.write_file('a.py', 'X = 2\n')
+        self.write_file('b.py', 'Y = 1\n')
+        self.cmd('git add a.py b.py')
+        self.cmd('git commit -m two')
+        self.cmd('git rm -q b.py')
+        self.cmd('git commit -m three')
+        tip = self.cmd('git rev-parse HEAD').strip()
+        (second, third) = self.cmd('git rev-list --reverse HEAD~2..HEAD') \
+            .split()
+
+        null = git_push.NULL_SHA
+        updates = git_push.read_ref_updates([
+            '%s %s refs/heads/master\n' % (base, tip),
+            '%s %s refs/heads/release\n' % (null, tip),
+            '%s %s refs/heads/gone\n' % (base, null),
+            '\n'])
+        self.assertEquals(len(updates), 3)
+        commits = git_push.push_commits(updates)
+        self.assertEquals([push_commit.commit for push_commit in commits],
+                          [second, third])
+        self.assertEquals(commits[0].ref, 'refs/heads/master')
+
+        changes = git_push.commit_changes([second, third])
+        self.assertEquals(
+            [(change.path, change.blob, change.insert, change.delete,
+              change.base_blob) for change in changes[second]],
+            [('a.py', score_cache.blob_sha('X = 2\n'), 1, 1,
+              score_cache.blob_sha('X = 1\n')),
+             ('b.py', score_cache.blob_sha('Y = 1\n'), 1, 0, null)])
+        self.assertEquals(changes[third], [])
+        self.assertEquals(git_push.commit_authors([tip]).keys(), [tip])
+
+    def test_backfill_checkpoint(self):
+        """Test a backfill resumes after the last commit it saved"""
+
+        for i in range(3):
+            self.write_file('a.py', 'X = %d\n' % i)
+            self.cmd('git add a.py')
+            self.cmd('git commit -m c%d' % i)
+        commits = git_push.range_commits('HEAD')
+        self.assertEquals(commits, self.cmd('git rev-list --reverse HEAD')
+                          .split())
+        self.assertEquals(git_push.range_commits('HEAD~1..HEAD'),
+                          commits[2:])
+
+        path = os.path.join(self.tmp_dir, backfill.CHECKPOINT_FILE)
+        checkpoint = backfill.Checkpoint(path)
+        self.assertEquals(checkpoint.start('HEAD', commits), 0)
+        checkpoint.save('HEAD', commits[1])
+        checkpoint = backfill.Checkpoint(path)
+        self.assertEquals(checkpoint.start('HEAD', commits), 2)
+        self.assertEquals(checkpoint.start('HEAD~1..HEAD', commits), 0)
+
+    def test_changed_lines(self):
+        """Test commit_hook._get_changed_lines"""
+
+        a = self.write_file('a.py', 'A = 1\nB = 2\nC = 3\nD = 4\n')
+        self.cmd('git add ' + a)
+        self.cmd('git commit -m msg')
+        self.write_file('a.py', 'A = 1\nB = 5\nC = 3\nE = 6\nF = 7\n')
+        b = self.write_file('b.py', 'X = 1\n')
+        self.cmd('git add ' + b)
+
+        self.assertEquals(commit_hook._get_changed_lines([a, b], 'HEAD'),
+                          {a: set([2, 4, 5]), b: set([1])})
+
+    def test_check_committed_file(self):
+        """Test commit_hook._check_committed_file"""
+
+        message = commit_hook.LintMessage('a.py', 1, 'C0111',
+                                          'missing-docstring', '', 'text')
+        current = commit_hook.LintResult(7.5, [message], 4)
+        checked = commit_hook._check_committed_file(
+            current, commit_hook.LintResult(8.0, [], 4), 9)
+        self.assertEquals(checked.status, 'FAILED')
+        self.assertEquals(checked.report,
+                          'a.py:1: [C0111(missing-docstring), ] text')
+
+        # A new file is held to the minimum score
+        checked = commit_hook._check_committed_file(
+            current, commit_hook.LintResult(0.0, [], 0), 9)
+        self.assertEquals(checked.status, 'PASSED')
+        self.assertEquals(commit_hook._average_score(
+            [checked.previous.score]), 4)
+
+    def test_lint_committed_file(self):
+        """Test _lint_committed_file judges by pylint's score and output"""
+
+        self.write_file('a.py', 'X = 1\nY = 1\n')
+        self.cmd('git add a.py')
+        self.cmd('git commit -m c0')
+        self.write_file('a.py', 'X = 2\nY = 1\n')
+        self.cmd('git commit -a -m c1')
+        output = ('************* Module a\n'
+                  'C:  1, 0: Missing module docstring (missing-docstring)\n'
+                  'Your code has been rated at 4.00/10\n')
+        pylint = self.write_file('pylint', '#!/bin/sh\nprintf "%s"\n' %
+                                 output.replace('\n', '\\n'))
+        os.chmod(pylint, 0755)
+        pylint = os.path.join(self.tmp_dir, pylint)
+        try:
+            # Equivalent to its previous version, which scored 8.0
+            self.write_file('a.py', 'X = 1\n\nY = 1\n')
+            checked = commit_hook._lint_committed_file(('no-such-pylint',
+                                                        'a.py', 5, 8.0))
+            self.assertEquals((checked.current.score, checked.status),
+                              (8.0, 'PASSED'))
+
+            self.write_file('a.py', 'X = 3\n')
+            checked = commit_hook._lint_committed_file((pylint, 'a.py', 5,
+                                                        8.0))
+            self.assertEquals((checked.current.score, checked.status),
+                              (4.0, 'FAILED'))
+            self.assertEquals(checked.report, output)
+        finally:
+            # The reader runs git in this test's repository
+            git_blobs.blob_reader().close()
+
+    def test_watcher(self):
+        """Test watcher.saved_files yields saved files once settled"""
+
+        self.write_file('.gitignore', 'build/\n')
+        os.mkdir('build')
+        os.mkdir('pkg')
+        notifier = watcher.Inotify()
+        try:
+            watcher.watch_tree(notifier, '.')
+            self.write_file('build/a.py', 'X = 1\n')
+            self.write_file('pkg/a.py', 'X = 1\n')
+            self.write_file('b.py', 'X = 1\n')
+            self.write_file('b.py', 'X = 2\n')
+            started = time.time()
+            saved = next(watcher.saved_files(notifier, 0.2))
+        finally:
+            notifier.close()
+        self.assertTrue(time.time() - started >= 0.2)
+        self.assertEquals(saved, ['b.py', 'pkg/a.py'])
+
+    def test_engines(self):
+        """Test engines.engine_for picks the configured engine by name"""
+
+        self.assertEquals(commit_hook._get_lint_type('a.py'), 'pylint')
+        self.assertEquals(commit_hook._get_lint_type('a.go'), '')
+        engines.configure([('pylint', None), ('golint', '/opt/go/golint')])
+        try:
+            self.assertEquals(commit_hook._get_lint_type('a.go'), 'golint')
+            self.assertEquals(engines.get('golint').command, '/opt/go/golint')
+            self.assertEquals(engines.get('pylint').command, 'pylint')
+            self.assertEquals(engines.engine_for('a.txt'), None)
+            self.assertEquals(engines.configured(), [
+                ('pylint', 'pylint'), ('golint', '/opt/go/golint')])
+        finally:
+            engines.configure([(name, None) for name in
+                               engines.DEFAULT_ENGINES])
+
+        # Engines have to implement scoring
+        self.assertRaises(TypeError, engines.Engine)
+
+    def test_classify(self):
+        """Test classify prefers lint attributes over extensions and #!"""
+
+        os.mkdir('tools')
+        self.write_file('.gitattributes', 'tools/* lint=python\n'
+                        'skip.py -lint\n')
+        self.write_file('tools/deploy', 'X = 1\n')
+        self.write_file('script', '#!/usr/bin/env python\nX = 1\n')
+        self.write_file('notes', 'python notes\n')
+        self.write_file('skip.py', 'X = 1\n')
+        self.write_file('a.py', 'X = 1\n')
+        self.cmd('git add .')
+        self.cmd('git commit -m initial')
+        blobs = dict(reversed(line.split()[2:]) for line in
+                     self.cmd('git ls-tree -r HEAD').splitlines())
+        files = [(path, blobs[path]) for path in sorted(blobs)]
+        expected = {'.gitattributes': '', 'a.py': 'pylint', 'notes': '',
+                    'script': 'pylint', 'skip.py': '',
+                    'tools/deploy': 'pylint'}
+        lint_types = classify.classify(files, 'HEAD')
+        self.assertEquals(dict((path, lint_types[(path, blob)])
+                               for (path, blob) in files), expected)
+        lint_types = classify.classify([(path, None) for (path, _) in files])
+        self.assertEquals(dict((path, lint_types[(path, None)])
+                               for (path, _) in files), expected)
+        reader = git_blobs.blob_reader()
+        try:
+            self.assertEquals(reader.read_head(blobs['script'], 8),
+                              '#!/usr/b')
+            self.assertEquals(reader.read_head(blobs['a.py'], 100),
+                              'X = 1\n')
+            self.assertEquals(reader.read_head('HEAD', 8), None)
+        finally:
+            # The reader runs git in this test's repository
+            reader.close()
+
+    def test_equivalence(self):
+        """Test equivalent versions reuse results with moved lines"""
+
+        old = '"""Doc"""\nX=1\n\ndef f():\n    return 1  # one\n'
+        new = '"""Doc"""\n\n\nX=1\n\ndef f():\n    # two\n    return 1\n'
+        self.assertEquals(equivalence.line_map(old, new), None)
+        lines = equivalence.line_map(old, new, ('comments', ))
+        self.assertEquals([equivalence.remap(lines, line) for line in
+                           (1, 2, 3, 5)], [1, 4, 5, 8])
+        self.assertEquals(equivalence.line_map(old, old.replace(
+            '# one', '# pylint: disable=C0103'), ('comments', )), None)
+        self.assertEquals(equivalence.line_map(old, old + '\n'), None)
+        self.assertEquals(equivalence.line_map(old, '"""Doc."""\nX = 1\n'
+                          'def f():\n    return 1\n', equivalence.POLICIES),
+                          {0: 0, 1: 1, 2: 2, 4: 3, 5: 4, 6: 5})
+        self.assertEquals(equivalence.parse_policy('whitespace, comments'),
+                          ('comments', 'whitespace'))
+        self.assertEquals(equivalence.parse_policy('off'), None)
+        self.assertRaises(ValueError, equivalence.parse_policy, 'code')
+
+        self.write_file('a.py', new)
+        baseline = commit_hook.LintResult(5.0, [commit_hook.LintMessage(
+            'old.py', 2, 'C0103', 'invalid-name', '', 'Invalid name')], 2)
+        commit_hook._configure_equivalence(('comments', ))
+        try:
+            # No pylint runs, the command does not exist
+            result = commit_hook._run_pylint_batch('no-such-pylint',
+                    ['a.py'], baselines={'a.py': (old, baseline)})['a.py']
+        finally:
+            commit_hook._configure_equivalence(equivalence.DEFAULT_POLICY)
+        self.assertEquals(result.score, 5.0)
+        self.assertEquals([(message.path, message.line) for message in
+                           result.messages], [('a.py', 4)])
+
+    def test_score_index(self):
+        """Test score_index keeps the repository average incrementally"""
+
+        path = os.path.join(self.tmp_dir, 'index.sqlite')
+        index = score_index.ScoreIndex(path, 'config')
+        index.add([('a.py', 'a1', 6.0), ('b.py', 'b1', 8.0)])
+        self.assertEquals(index.scores([('a.py', 'a1'), ('a.py', 'a2')]),
+                          {('a.py', 'a1'): 6.0})
+        self.assertEquals(index.average(), None)
+        index.fill([('a.py', 'a1', 6.0), ('b.py', 'b1', 8.0),
+                    ('c.py', 'c1', 0.0)])
+        index.fill([('a.py', 'a0', 2.0)])
+        self.assertEquals(index.average(), 7.0)
+        self.assertEquals(index.average({'a.py': 10.0, 'd.py': 3.0}), 7.0)
+        self.assertEquals(index.update([('a.py', 'a2', 9.0)], 'dev'), 1.5)
+        self.assertEquals(index.average(), 8.5)
+        self.assertEquals(index.author('dev'), (1, 9.0, 1.5))
+        index.close()
+        index = score_index.ScoreIndex(path, 'config')
+        self.assertEquals(index.average(), 8.5)
+        index.close()
+        index = score_index.ScoreIndex(path, 'other config')
+        self.assertEquals(index.average(), None)
+        self.assertEquals(index.scores([('a.py', 'a1')]), {})
+        index.close()
+
+    def test_early_fail(self):
+        """Test _run_pylint_early_fail stops pylint once the file fails"""
+
+        self.write_file('a.py', 'X = 1\nY = 2\n')
+        stats = 'pylint-stats: {}:2'.format(os.path.realpath('a.py'))
+        pylint = self.write_file('pylint', '#!/bin/sh\n'
+                                 'echo "a.py:1: [C0103(invalid-name), ] A"\n'
+                                 'echo "%s:5.00"\n'
+                                 'echo "a.py:2: [C0103(invalid-name), ] B"\n'
+                                 'echo "%s:0.00"\n'
+                                 'echo "a.py:2: [C0103(invalid-name), ] C"\n'
+                                 'echo "%s:-5.00"\n'
+                                 'case "$*" in *RunningStatsReporter*) '
+                                 'exec sleep 30;; esac\n'
+                                 # The previous version, in another tree
+                                 'for arg; do :; done\n'
+                                 'echo "pylint-stats: $(cd $(dirname $arg) '
+                                 '&& pwd -P)/$(basename $arg):2:"\n' %
+                                 (stats, stats, stats))
+        os.chmod(pylint, 0755)
+        pylint = os.path.join(self.tmp_dir, pylint)
+        started = time.time()
+        (result, stopped) = commit_hook._run_pylint_early_fail(pylint,
+                                                               'a.py', 5.0)
+        self.assertTrue(time.time() - started < 10)
+        self.assertTrue(stopped)
+        self.assertEquals([message.text for message in result.messages],
+                          ['A', 'B'])
+        self.assertEquals((result.score, result.statements), (0.0, 2))
+
+        # A file stopped early fails the commit
+        self.cmd('git add a.py')
+        started = time.time()
+        try:
+            passed = commit_hook.check_repo(5.0, pylint, cache_dir=None,
+                                            early_fail=True)
+        finally:
+            commit_hook._configure_early_fail(False)
+            # The reader runs git in this test's repository
+            git_blobs.blob_reader().close()
+        self.assertTrue(time.time() - started < 10)
+        self.assertFalse(passed)
+
+        # Nothing pylint did not rate the file for is cached
+        pylint = self.write_file('unrated', '#!/bin/sh\n'
+                                 'echo "a.py:1: [C0103(invalid-name), ] A"\n')
+        os.chmod(pylint, 0755)
+        pylint = os.path.join(self.tmp_dir, pylint)
+        commit_hook._configure_cache(os.path.join(self.tmp_dir, 'cache'),
+                                     pylint)
+        try:
+            self.assertRaises(SystemExit, commit_hook._run_pylint_early_fail,
+                              pylint, 'a.py', 5.0)
+            self.assertFalse(commit_hook._is_cached(pylint, 'a.py',
+                             'X = 1\nY = 2\n', commit_hook._BATCH))
+        finally:
+            commit_hook._configure_cache(None)
+
+    def test_tiers(self):
+        """Test fast and full tiers are read from the pylintrc"""
+
+        self.assertEquals(commit_hook._read_tiers('.pylintrc', '-j 1', 8.0),
+                          (None, commit_hook.Tier(['-j', '1'], 8.0)))
+        self.write_file('.pylintrc', '[pre-commit-hook]\n'
+                        'fast-params = --disable=R\n'
+                        'fast-limit = 9\n'
+                        'full-params = --load-plugins=heavy\n')
+        (fast, full) = commit_hook._read_tiers('.pylintrc', '-j 1', 8.0)
+        self.assertEquals(fast, commit_hook.Tier(['-j', '1', '--disable=R'],
+                                                 9.0))
+        self.assertEquals(full, commit_hook.Tier(['-j', '1',
+                                                  '--load-plugins=heavy'],
+                                                 8.0))
+
+        # Params are part of the cache key
+
+        commit_hook._configure_cache(self.tmp_dir)
+        try:
+            key = commit_hook._lint_cache_key('pylint', 'a.py', 'X = 1\n')
+            commit_hook._configure_params(fast.params)
+            self.assertNotEquals(commit_hook._lint_cache_key(
+                'pylint', 'a.py', 'X = 1\n'), key)
+        finally:
+            commit_hook._configure_params([])
+            commit_hook._configure_cache(None)
+
+    def test_golint_attribute_warnings(self):
+        """Test golint warnings are attributed to files by path"""
+
+        lines = ['./pkg/a.go:3:1: exported function A should have comment\n',
+                 'pkg/b.go:1:1: should have a package comment\n',
+                 'pkg/a.go:9:1: exported function E should have comment\n',
+                 'main.go:3:1: exported function F should have comment\n']
+        warnings = golint_hook.attributeWarnings(lines, ['pkg/a.go',
+                                                         'main.go', 'c.go'])
+        self.assertEquals(sorted(warnings), ['c.go', 'main.go', 'pkg/a.go'])
+        self.assertEquals(len(warnings['pkg/a.go']), 2)
+        self.assertEquals(warnings['main.go'], [lines[3].rstrip('\n')])
+        self.assertEquals(warnings['c.go'], [])
+
+    def test_profiling(self):
+        """Test profiling writes a Chrome trace and a summary"""
+
+        trace_file = os.path.join(self.tmp_dir, 'trace.json')
+        profiling.enable(trace_file)
+        try:
+            with profiling.span('pylint', 'lint', file='a.py'):
+                pass
+            with profiling.span('git log', 'git'):
+                pass
+        finally:
+            out = StringIO()
+            profiling.finish(out)
+        self.assertFalse(profiling.enabled())
+        with open(trace_file) as file_handle:
+            events = json.load(file_handle)['traceEvents']
+        self.assertEquals(sorted(event['name'] for event in events
+                                 if event['ph'] == 'X'),
+                          ['git log', 'pylint'])
+        self.assertTrue('a.py' in out.getvalue())
+        self.assertFalse(os.path.exists(trace_file + '.parts'))
+
+        # Only the outermost of nested spans counts towards a file
+        events = [{'name': 'lint', 'cat': 'phase', 'ts': 0, 'dur': 900,
+                   'pid': 1, 'tid': 1, 'args': {'file': 'b.py'}},
+                  {'name': 'pylint', 'cat': 'lint', 'ts': 100, 'dur': 800,
+                   'pid': 1, 'tid': 1, 'args': {'file': 'b.py'}},
+                  {'name': 'pylint', 'cat': 'lint', 'ts': 1000, 'dur': 600,
+                   'pid': 1, 'tid': 1, 'args': {'file': 'b.py'}},
+                  {'name': 'pylint', 'cat': 'lint', 'ts': 100, 'dur': 500,
+                   'pid': 2, 'tid': 1, 'args': {'file': 'b.py'}}]
+        out = StringIO()
+        profiling.print_summary(trace_file, events, out)
+        rows = out.getvalue().split('slowest files')[1].splitlines()
+        self.assertEquals(rows[1].split(), ['b.py', '3', '2.0'])